@@ -0,0 +1,40 @@
+"""
+Hooks de gunicorn comunes a WSGI y ASGI
+
+gunicorn lee gunicorn.conf.py del directorio actual si no se pasa -c, así que
+`gunicorn misite.wsgi` también los usa; gunicorn_asgi.conf.py define los mismos.
+"""
+
+
+def on_starting(server):
+    # Con varios workers la caché debe ser compartida (check myapp.E001)
+    from myapp.checks import verificar_arranque
+
+    verificar_arranque(server.cfg.workers)
+
+
+def when_ready(server):
+    # Worker local de la cola de boletines PDF (TRABAJOS_PDF_WORKER_LOCAL)
+    from myapp.trabajos import iniciar_worker_local
+
+    iniciar_worker_local()
+
+
+def on_exit(server):
+    from myapp.trabajos import detener_worker_local
+
+    detener_worker_local()
+
+
+def post_worker_init(worker):
+    # Abre el pool de PostgreSQL ya en el worker (después del fork), para que
+    # la primera petición no espere a conectar
+    from myapp.conexiones import abrir_pools
+
+    abrir_pools()
+
+
+def worker_exit(server, worker):
+    from myapp.conexiones import cerrar_pools
+
+    cerrar_pools()
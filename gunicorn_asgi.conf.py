@@ -0,0 +1,68 @@
+"""
+Perfil gunicorn + uvicorn para servir misite.asgi
+
+    gunicorn misite.asgi:application -c gunicorn_asgi.conf.py
+
+Cada worker es un event loop: las vistas async comparten el proceso y las
+síncronas (staff, PDF) corren en el pool de hilos de asgiref. Con pocos
+workers se atienden muchas conexiones concurrentes, por eso el número de
+workers se dimensiona por memoria, no por conexiones esperadas.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count() * 2)))
+
+# Hilos para las vistas síncronas (sync_to_async) dentro de cada worker
+os.environ.setdefault('ASGI_THREADS', '8')
+
+# Un cliente lento no bloquea el worker, pero una petición que no avanza se corta
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers reparte en el tiempo las fugas de memoria de ReportLab/Pillow
+max_requests = 2000
+max_requests_jitter = 200
+
+# Se carga Django antes de hacer fork para compartir memoria entre workers
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # Con varios workers la caché debe ser compartida (check myapp.E001)
+    from myapp.checks import verificar_arranque
+
+    verificar_arranque(server.cfg.workers)
+
+
+def when_ready(server):
+    # Worker local de la cola de boletines PDF (TRABAJOS_PDF_WORKER_LOCAL)
+    from myapp.trabajos import iniciar_worker_local
+
+    iniciar_worker_local()
+
+
+def on_exit(server):
+    from myapp.trabajos import detener_worker_local
+
+    detener_worker_local()
+
+
+def post_worker_init(worker):
+    # Igual que en gunicorn.conf.py: pool de PostgreSQL abierto tras el fork
+    from myapp.conexiones import abrir_pools
+
+    abrir_pools()
+
+
+def worker_exit(server, worker):
+    from myapp.conexiones import cerrar_pools
+
+    cerrar_pools()
@@ -5,6 +5,25 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Perfil ASGI de SEMARTEC
+-----------------------
+Las páginas públicas (inicio, listados y detalles) son vistas async y todos
+los middleware admiten modo async, así que con un servidor ASGI un solo
+proceso mantiene muchas conexiones de clientes lentos mientras espera a la
+base de datos. Las vistas de staff y los PDF siguen siendo síncronas y Django
+las ejecuta en un hilo.
+
+Producción (gunicorn gestiona los workers uvicorn; ver gunicorn_asgi.conf.py)::
+
+    gunicorn misite.asgi:application -c gunicorn_asgi.conf.py
+
+Un solo proceso, p. ej. en desarrollo o detrás de otro gestor::
+
+    uvicorn misite.asgi:application --host 0.0.0.0 --port 8000
+
+El perfil WSGI anterior (``gunicorn misite.wsgi``) sigue funcionando; en él
+las vistas async se ejecutan con un event loop por petición.
 """
 
 import os
@@ -12,5 +31,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'misite.settings')
+os.environ.setdefault('SERVIDOR_ASGI', 'True')
 
 application = get_asgi_application()
@@ -57,34 +57,62 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'myapp.metricas.MetricasMiddleware',  # Primero: mide toda la cadena
+    'myapp.consultas.DeteccionConsultasMiddleware',  # Solo con DEBUG: avisa de N+1
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'myapp.middleware.WhiteNoiseAsincronoMiddleware',  # WhiteNoise apto para ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.locale.LocaleMiddleware',  # ✅ Después de Session y antes de Common
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.middleware.locale.LocaleMiddleware',  # ✅ DEBE ESTAR AQUÍ
+    'myapp.middleware.CachePaginaAnonimaMiddleware',  # Después de Csrf, Auth y Locale
+    'myapp.middleware.ReplicaLecturaMiddleware',  # Después de la caché: los aciertos no leen la BD
 ]
 
 ROOT_URLCONF = 'misite.urls'
 
+_CONTEXT_PROCESSORS = [
+    'django.template.context_processors.request',
+    'django.contrib.auth.context_processors.auth',
+    'django.contrib.messages.context_processors.messages',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
+            'context_processors': _CONTEXT_PROCESSORS,
         },
     },
 ]
 
+# Páginas públicas con Jinja2 (myapp/jinja2/, entorno en myapp.plantillas_jinja).
+# Apagado por defecto: myapp/jinja2/ es una copia de las plantillas públicas de
+# DTL y cualquier cambio debe hacerse en ambas (PlantillasJinjaTests compara
+# cada URL pública con los dos motores). Encendido, va antes que DTL: las
+# plantillas que no existen en myapp/jinja2/ (admin, formularios, login) siguen
+# saliendo de myapp/templates/. Cada plantilla se compila a bytecode una vez
+# por máquina en JINJA2_BYTECODE_DIR.
+# Comparar ambos motores: `manage.py medir_plantillas`.
+PLANTILLAS_JINJA2 = env.bool('PLANTILLAS_JINJA2', default=False)
+JINJA2_BYTECODE_DIR = env('JINJA2_BYTECODE_DIR', default=str(BASE_DIR / 'var' / 'jinja2'))
+MOTOR_JINJA2 = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [BASE_DIR / 'myapp' / 'jinja2'],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'myapp.plantillas_jinja.entorno',
+        'context_processors': _CONTEXT_PROCESSORS,
+    },
+}
+if PLANTILLAS_JINJA2:
+    TEMPLATES.insert(0, MOTOR_JINJA2)
+
 WSGI_APPLICATION = 'misite.wsgi.application'
 
 
@@ -93,14 +121,134 @@ WSGI_APPLICATION = 'misite.wsgi.application'
 
 #Base de datos por medio de render.
 
+# Bajo ASGI (misite/asgi.py fija SERVIDOR_ASGI) cada petición async usa su
+# propia conexión, así que las conexiones persistentes no se reutilizan y se
+# acumulan: se cierran al terminar cada petición.
+SERVIDOR_ASGI = env.bool('SERVIDOR_ASGI', default=False)
+
 DATABASES = {
     'default': dj_database_url.config(
         # Aquí Render inyectará automáticamente la URL de tu base de datos
         default='sqlite:///db.sqlite3', 
-        conn_max_age=600
+        conn_max_age=0 if SERVIDOR_ASGI else 600,
+        # Comprueba la conexión reutilizada antes de usarla: si el servidor la
+        # cerró (reinicio, failover, inactividad) se abre otra en vez de dar 500
+        conn_health_checks=True,
     )
 }
 
+# Pool de conexiones para PostgreSQL (psycopg 3 + psycopg_pool). Cada worker
+# abre DB_POOL_MIN conexiones al arrancar (gunicorn post_worker_init) y presta
+# una por petición, así que conectar no cuenta en la latencia. Con el pool,
+# CONN_MAX_AGE debe ser 0 y CONN_HEALTH_CHECKS valida cada conexión prestada.
+# DB_POOL_TIMEOUT: segundos que una petición espera una conexión libre antes
+# de fallar (pool saturado); DB_POOL_MAX_LIFETIME recicla conexiones viejas.
+DB_POOL = env.bool('DB_POOL', default=True)
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': env.int('DB_POOL_MIN', default=2),
+        'max_size': env.int('DB_POOL_MAX', default=10),
+        'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+        'max_idle': env.float('DB_POOL_MAX_IDLE', default=300.0),
+        'max_lifetime': env.float('DB_POOL_MAX_LIFETIME', default=1800.0),
+        'reconnect_timeout': env.float('DB_POOL_RECONNECT_TIMEOUT', default=60.0),
+    }
+
+
+# Réplica de lectura (myapp.replicas): las páginas públicas leen de
+# DATABASE_REPLICA_URL mientras esté a menos de REPLICA_RETRASO_MAXIMO segundos
+# del primario y ya tenga el último cambio de contenido; el latido se comprueba
+# cada REPLICA_COMPROBACION segundos por proceso. Quien escribe (usuario
+# autenticado) lee del primario durante REPLICA_ADHERENCIA segundos.
+# En local: DATABASE_REPLICA_URL=sqlite:///var/replica.sqlite3 y
+# `manage.py sincronizar_replica [--cada N]` hace de replicación.
+DATABASE_REPLICA_URL = env('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+        conn_health_checks=True,
+    )
+    if 'pool' in DATABASES['default'].get('OPTIONS', {}) and DATABASES['replica']['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES['replica'].setdefault('OPTIONS', {})['pool'] = dict(DATABASES['default']['OPTIONS']['pool'])
+    # En las pruebas la réplica es la misma base de prueba
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['myapp.replicas.RouterReplica']
+REPLICA_RETRASO_MAXIMO = env.float('REPLICA_RETRASO_MAXIMO', default=30.0)
+REPLICA_COMPROBACION = env.float('REPLICA_COMPROBACION', default=2.0)
+REPLICA_ADHERENCIA = env.int('REPLICA_ADHERENCIA', default=30)
+
+
+# Caché
+# Con varios workers de gunicorn el backend tiene que ser compartido (p. ej.
+# CACHE_URL=rediscache://... o filecache:///ruta): la versión de contenido,
+# los ETag, la caché de páginas y la del boletín viven en ella y la
+# invalidación por señales debe llegar a todos los procesos. El check
+# myapp.E001 lo exige cuando WEB_CONCURRENCY > 1 (gunicorn lo ejecuta al
+# arrancar con su número real de workers).
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+WEB_CONCURRENCY = env.int('WEB_CONCURRENCY', default=1)
+
+# Caché de página completa para anónimos (myapp.middleware): segundos de
+# frescura y ventana en la que se sirve la copia obsoleta mientras se regenera.
+PAGINA_CACHE_TTL = env.int('PAGINA_CACHE_TTL', default=600)
+PAGINA_CACHE_SWR = env.int('PAGINA_CACHE_SWR', default=60)
+
+# Sesiones en la base de datos con la caché delante (cached_db): se pueden
+# revocar (logout, borrado de la sesión) y leerlas no cuesta consultas mientras
+# estén en la caché, que con varios workers es compartida (check myapp.E001).
+# Los anónimos sin cookie de sesión no leen ni escriben sesión (el idioma va
+# en su propia cookie). signed_cookies no permite revocar una cookie robada y
+# con un SECRET_KEY conocido deja falsificar sesiones (check myapp.E002).
+SESSION_ENGINE = env('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+
+
+# Formulario de contacto
+# Límite por IP (ventana fija, myapp.limites): ráfaga máxima y envíos
+# sostenidos por minuto. Necesita una caché compartida y con incr atómico
+# (Redis o Memcached) para contar igual en todos los workers.
+# Detrás del proxy de Render la IP real llega en X-Forwarded-For.
+
+IP_DESDE_X_FORWARDED_FOR = env.bool('IP_DESDE_X_FORWARDED_FOR', default=False)
+CONTACTOS_RAFAGA = env.int('CONTACTOS_RAFAGA', default=5)
+CONTACTOS_POR_MINUTO = env.int('CONTACTOS_POR_MINUTO', default=2)
+
+# Ingesta en buffer: los envíos se anexan a un archivo local y se insertan
+# con bulk_create al superar CONTACTOS_BUFFER_BYTES o con `manage.py vaciar_contactos`.
+CONTACTOS_INGESTA_BUFFER = env.bool('CONTACTOS_INGESTA_BUFFER', default=False)
+CONTACTOS_BUFFER_RUTA = env('CONTACTOS_BUFFER_RUTA', default=str(BASE_DIR / 'var' / 'contactos_pendientes.jsonl'))
+CONTACTOS_BUFFER_BYTES = env.int('CONTACTOS_BUFFER_BYTES', default=64 * 1024)
+CONTACTOS_BUFFER_LOTE = 500
+
+# Cola de boletines PDF (myapp.trabajos): el hook when_ready de gunicorn lanza
+# `manage.py procesar_trabajos_pdf` como subproceso y lo reinicia si termina.
+# En False el worker debe correr aparte. Mientras no haya latido reciente del
+# worker, el panel genera el boletín con la descarga directa.
+TRABAJOS_PDF_WORKER_LOCAL = env.bool('TRABAJOS_PDF_WORKER_LOCAL', default=True)
+TRABAJOS_PDF_LATIDO_RUTA = env('TRABAJOS_PDF_LATIDO_RUTA', default=str(BASE_DIR / 'var' / 'trabajos_pdf.latido'))
+
+# Login (myapp.limites): tras LOGIN_FALLOS_LIBRES fallos de un usuario (o
+# LOGIN_FALLOS_LIBRES_IP de una IP, más alto por las IP compartidas) cada
+# intento espera el doble que el anterior, empezando en LOGIN_ESPERA_BASE y
+# hasta un bloqueo de LOGIN_BLOQUEO_MAXIMO segundos. Los intentos bloqueados
+# se rechazan sin calcular el hash de la contraseña.
+LOGIN_FALLOS_LIBRES = env.int('LOGIN_FALLOS_LIBRES', default=5)
+LOGIN_FALLOS_LIBRES_IP = env.int('LOGIN_FALLOS_LIBRES_IP', default=20)
+LOGIN_ESPERA_BASE = env.int('LOGIN_ESPERA_BASE', default=1)
+LOGIN_BLOQUEO_MAXIMO = env.int('LOGIN_BLOQUEO_MAXIMO', default=15 * 60)
+LOGIN_FALLOS_VENTANA = env.int('LOGIN_FALLOS_VENTANA', default=60 * 60)
+
+# Métricas por vista (myapp.metricas): cada worker vuelca sus contadores en un
+# SQLite compartido cada METRICAS_INTERVALO segundos. /metrics es solo para staff
+# o para un scraper que envíe "Authorization: Bearer <METRICAS_TOKEN>".
+METRICAS_RUTA = env('METRICAS_RUTA', default=str(BASE_DIR / 'var' / 'metricas.sqlite3'))
+METRICAS_INTERVALO = env.int('METRICAS_INTERVALO', default=5)
+METRICAS_TOKEN = env('METRICAS_TOKEN', default='')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,7 +292,13 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# STATICFILES_STORAGE ya no existe en Django 5.1+: el storage va en STORAGES.
+# myapp.estaticos añade a WhiteNoise (manifiesto + .br/.gz) la minificación de
+# CSS y las variantes AVIF/WebP de img/ al ejecutar collectstatic.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'myapp.estaticos.EstaticosOptimizados'},
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -155,3 +309,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Entrega de media en producción (myapp.media). MEDIA_ENTREGA:
+# 'django' (FileResponse + sendfile de gunicorn), 'x-accel-redirect' (nginx,
+# con una location internal en MEDIA_ACCEL_PREFIJO que apunte a MEDIA_ROOT) o
+# 'x-sendfile' (Apache/lighttpd). Los nombres con huella de contenido se
+# cachean un año como immutable; el resto, MEDIA_MAX_AGE segundos con ETag.
+MEDIA_ENTREGA = env('MEDIA_ENTREGA', default='django')
+MEDIA_ACCEL_PREFIJO = env('MEDIA_ACCEL_PREFIJO', default='/media-interna/')
+MEDIA_MAX_AGE = env.int('MEDIA_MAX_AGE', default=60 * 60)
+MEDIA_PUBLICO = ['contenido/', 'noticias/', 'colaboradores/', 'derivados/']
+
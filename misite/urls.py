@@ -19,7 +19,8 @@ from django.conf.urls.i18n import i18n_patterns
 from django.urls import path, include
 from django.views.i18n import set_language
 from django.conf import settings
-from django.conf.urls.static import static
+
+from myapp.media import servir_media
 
 urlpatterns = [
     # ✅ RUTAS DE IDIOMA
@@ -33,6 +34,7 @@ urlpatterns = [
     path('', include('myapp.urls')),
 ]
 
-# ✅ MEDIA FILES (para desarrollo)
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# ✅ MEDIA FILES (también en producción, con Range, ETag y sendfile)
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:ruta>", servir_media, name='media'),
+]
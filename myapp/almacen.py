@@ -0,0 +1,132 @@
+"""
+ALMACÉN POR CONTENIDO - SEMARTEC
+Guarda cada fotografía subida una sola vez, con el nombre de su hash SHA-256
+
+Las fotografías de Noticia y Colaborador se escriben en
+contenido/<2 primeros>/<sha256>.<ext>: dos subidas iguales (la misma imagen en
+una noticia y en un colaborador, o la misma foto al editar) comparten archivo,
+y como el nombre depende del contenido su URL se puede cachear para siempre.
+
+El conteo de referencias es el número de filas que apuntan a cada archivo; se
+calcula con consultas en vez de guardarse, así que no se puede desincronizar.
+Al editar o borrar una fila el archivo se libera si nadie más lo usa; lo que
+quede huérfano (p. ej. subidas de transacciones revertidas) lo elimina
+`manage.py limpiar_media`.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+
+from .imagenes import olvidar_anchos, ruta_manifiesto, rutas_derivados
+
+
+CARPETA_CONTENIDO = 'contenido'
+TROZO = 64 * 1024
+# Un archivo tocado hace menos de esto puede pertenecer a una fila aún sin
+# confirmar (subida en curso), así que no se borra
+GRACIA_SEGUNDOS = 10 * 60
+
+
+class AlmacenContenido(FileSystemStorage):
+    """FileSystemStorage que nombra cada archivo por el hash de su contenido"""
+
+    def save(self, name, content, max_length=None):
+        """
+        Copia `content` por trozos calculando su SHA-256 y lo deja en su ruta
+        de contenido; si ya existía, descarta la copia y reutiliza el archivo
+        """
+        if name is None:
+            name = content.name
+        extension = os.path.splitext(name)[1].lower()
+
+        carpeta = self.path(CARPETA_CONTENIDO)
+        os.makedirs(carpeta, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix='.subida-', suffix='.tmp')
+        huella = hashlib.sha256()
+        try:
+            with os.fdopen(descriptor, 'wb') as destino:
+                for trozo in content.chunks(TROZO):
+                    huella.update(trozo)
+                    destino.write(trozo)
+
+            digest = huella.hexdigest()
+            nombre = f'{CARPETA_CONTENIDO}/{digest[:2]}/{digest}{extension}'
+            final = self.path(nombre)
+            if os.path.exists(final):
+                # Ya guardado: se renueva la fecha para que nadie lo libere ahora
+                os.utime(final)
+            else:
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporal, self.file_permissions_mode)
+                os.replace(temporal, final)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        return nombre
+
+
+def almacen_contenido():
+    """Storage de las fotografías (callable para que la migración no fije rutas)"""
+    return AlmacenContenido()
+
+
+def campos_con_fotografia():
+    """Pares (modelo, campo) que guardan en este almacén"""
+    from .models import Colaborador, Noticia
+
+    return ((Noticia, 'fotografia'), (Colaborador, 'fotografia'))
+
+
+def referencias(nombre):
+    """Número de filas que usan el archivo `nombre`"""
+    return sum(model.objects.filter(**{campo: nombre}).count() for model, campo in campos_con_fotografia())
+
+
+def nombres_referenciados():
+    """Conjunto de nombres de archivo usados por alguna fila"""
+    nombres = set()
+    for model, campo in campos_con_fotografia():
+        nombres.update(
+            model.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True})
+            .values_list(campo, flat=True)
+        )
+    return nombres
+
+
+def es_de_contenido(nombre):
+    """Indica si `nombre` es un archivo del almacén (y no un nombre antiguo)"""
+    return bool(nombre) and nombre.startswith(f'{CARPETA_CONTENIDO}/')
+
+
+def eliminar_archivo(almacen, nombre):
+    """Borra el archivo, sus derivados y su manifiesto"""
+    for ruta in [almacen.path(nombre), *rutas_derivados(nombre).values(), ruta_manifiesto(nombre)]:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+    olvidar_anchos(nombre)
+
+
+def liberar(nombre):
+    """
+    Borra el archivo de contenido `nombre` si ya no lo usa ninguna fila
+
+    Returns:
+        bool: True si se eliminó
+    """
+    if not es_de_contenido(nombre) or referencias(nombre):
+        return False
+    almacen = almacen_contenido()
+    try:
+        if time.time() - os.path.getmtime(almacen.path(nombre)) < GRACIA_SEGUNDOS:
+            return False
+    except FileNotFoundError:
+        return False
+    eliminar_archivo(almacen, nombre)
+    return True
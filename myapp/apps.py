@@ -4,4 +4,9 @@ from django.apps import AppConfig
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
-    
+
+    def ready(self):
+        # Registra los receptores de señales de invalidación de caché
+        from . import signals  # noqa: F401
+        # Y las comprobaciones de configuración (myapp.E...)
+        from . import checks  # noqa: F401
@@ -0,0 +1,103 @@
+"""
+BÚSQUEDA DE TEXTO COMPLETO - SEMARTEC
+Busca en título y descripción de avisos y noticias usando el motor de la base de datos
+(tsvector + GIN en PostgreSQL, FTS5 en SQLite; ver migración 0006)
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Aviso, Noticia
+
+
+MODELOS = {
+    'avisos': Aviso,
+    'noticias': Noticia,
+}
+TAMANO_PAGINA = 12
+# Nadie pasa de aquí a mano; sin tope, ?pagina=99999999999999999999 desborda
+# el OFFSET del motor (OverflowError, error 500)
+PAGINA_MAXIMA = 1000
+
+
+def _consulta_fts5(texto):
+    """Convierte el texto del usuario en una consulta FTS5 segura (términos con prefijo)"""
+    terminos = re.findall(r'\w+', texto)
+    return ' '.join(f'"{termino}"*' for termino in terminos)
+
+
+def _ids_postgresql(tabla, pk, texto, limite, desplazamiento):
+    sql = f"""
+        SELECT {pk} FROM {tabla}
+        WHERE busqueda @@ websearch_to_tsquery('spanish', %s)
+        ORDER BY ts_rank_cd(busqueda, websearch_to_tsquery('spanish', %s)) DESC, {pk} DESC
+        LIMIT %s OFFSET %s
+    """
+    return sql, [texto, texto, limite, desplazamiento]
+
+
+def _ids_sqlite(tabla, pk, texto, limite, desplazamiento):
+    consulta = _consulta_fts5(texto)
+    if not consulta:
+        return None, None
+    # bm25 es menor cuanto más relevante; el título pesa 10 veces más
+    sql = f"""
+        SELECT rowid FROM {tabla}_fts
+        WHERE {tabla}_fts MATCH %s
+        ORDER BY bm25({tabla}_fts, 10.0, 1.0), rowid DESC
+        LIMIT %s OFFSET %s
+    """
+    return sql, [consulta, limite, desplazamiento]
+
+
+def _ids_generico(model, texto, limite, desplazamiento):
+    """Respaldo para otros motores: icontains sin ranking"""
+    return list(
+        model.objects.filter(Q(titulo__icontains=texto) | Q(descripcion__icontains=texto))
+        .order_by('-fecha_publicacion', '-pk')
+        .values_list('pk', flat=True)[desplazamiento:desplazamiento + limite]
+    )
+
+
+def buscar(tipo, texto, pagina=1, tamano=TAMANO_PAGINA):
+    """
+    Busca `texto` en los registros de `tipo` ('avisos' o 'noticias')
+
+    Primero obtiene del índice de texto los pk ordenados por relevancia y
+    después carga solo esos registros, conservando el orden.
+
+    Returns:
+        tuple: (lista de resultados, hay página siguiente)
+    """
+    model = MODELOS[tipo]
+    texto = texto.strip()
+    if not texto or not 1 <= pagina <= PAGINA_MAXIMA:
+        return [], False
+
+    tabla = model._meta.db_table
+    pk = model._meta.pk.column
+    desplazamiento = (pagina - 1) * tamano
+    limite = tamano + 1
+
+    if connection.vendor == 'postgresql':
+        sql, params = _ids_postgresql(tabla, pk, texto, limite, desplazamiento)
+    elif connection.vendor == 'sqlite':
+        sql, params = _ids_sqlite(tabla, pk, texto, limite, desplazamiento)
+        if sql is None:
+            return [], False
+    else:
+        sql = None
+
+    if sql is None:
+        ids = _ids_generico(model, texto, limite, desplazamiento)
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ids = [fila[0] for fila in cursor.fetchall()]
+
+    hay_siguiente = len(ids) > tamano
+    ids = ids[:tamano]
+    por_id = model.objects.in_bulk(ids)
+    return [por_id[i] for i in ids if i in por_id], hay_siguiente
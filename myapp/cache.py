@@ -0,0 +1,126 @@
+"""
+CACHÉ DE CONTENIDO - SEMARTEC
+Caché versionada para los fragmentos públicos que solo cambian cuando el staff edita
+"""
+
+import asyncio
+import hashlib
+import time
+from io import BytesIO
+
+from django.core.cache import cache
+from django.db.models import CharField, Count, DateTimeField, Max, Value
+
+from .models import Aviso, Noticia, Colaborador
+
+
+CLAVE_VERSION = 'contenido:version'
+TIEMPO_CACHE = 60 * 60  # Respaldo por si otro proceso no recibe la invalidación
+TIEMPO_CACHE_PDF = 60 * 60 * 24
+ULTIMOS_INICIO = 4
+
+
+def version_contenido():
+    """Devuelve la versión vigente del contenido público, creándola si no existe"""
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        version = time.time_ns()
+        cache.add(CLAVE_VERSION, version, None)
+        version = cache.get(CLAVE_VERSION, version)
+    return version
+
+
+async def aversion_contenido():
+    """Versión asíncrona de version_contenido"""
+    version = await cache.aget(CLAVE_VERSION)
+    if version is None:
+        version = time.time_ns()
+        await cache.aadd(CLAVE_VERSION, version, None)
+        version = await cache.aget(CLAVE_VERSION, version)
+    return version
+
+
+def invalidar_contenido():
+    """Invalida todas las entradas versionadas cambiando la versión vigente"""
+    cache.set(CLAVE_VERSION, time.time_ns(), None)
+
+
+def _consultas_inicio():
+    return {
+        'avisos': Aviso.objects.order_by('-fecha_publicacion')[:ULTIMOS_INICIO],
+        'noticias': Noticia.objects.order_by('-fecha_publicacion')[:ULTIMOS_INICIO],
+        'colaboradores': Colaborador.objects.all()[:ULTIMOS_INICIO],
+    }
+
+
+async def _alista(queryset):
+    return [obj async for obj in queryset]
+
+
+async def aultimos_inicio():
+    """
+    Últimos avisos, noticias y colaboradores de la página de inicio
+
+    Las listas se guardan ya evaluadas bajo la versión vigente, por lo que en
+    estado estable la página de inicio no ejecuta ninguna consulta. Sin la
+    versión vigente en caché, las tres consultas se lanzan a la vez con
+    asyncio.gather.
+    """
+    clave = f'inicio:ultimos:{await aversion_contenido()}'
+    datos = await cache.aget(clave)
+    if datos is None:
+        consultas = _consultas_inicio()
+        listas = await asyncio.gather(*(_alista(qs) for qs in consultas.values()))
+        datos = dict(zip(consultas, listas))
+        await cache.aset(clave, datos, TIEMPO_CACHE)
+    return datos
+
+
+def resumen_tabla(queryset, etiqueta, campo_fecha=None):
+    """Conteo, último pk y última fecha de una tabla en una sola fila"""
+    fecha = Max(campo_fecha) if campo_fecha else Value(None, output_field=DateTimeField())
+    return (
+        queryset.order_by()
+        .annotate(tabla=Value(etiqueta, output_field=CharField()))
+        .values('tabla')
+        .annotate(n=Count('pk'), ultimo=Max('pk'), fecha=fecha)
+    )
+
+
+def huella_boletin():
+    """
+    Huella del contenido del boletín
+
+    Combina, en una sola consulta UNION ALL, el número de filas y los máximos
+    de pk y fecha de avisos, noticias y colaboradores, más la versión de
+    contenido (que cambia también al editar un registro existente).
+    """
+    filas = resumen_tabla(Aviso.objects, 'avisos', 'fecha_publicacion').union(
+        resumen_tabla(Noticia.objects, 'noticias', 'fecha_publicacion'),
+        resumen_tabla(Colaborador.objects, 'colaboradores'),
+        all=True,
+    )
+    crudo = '|'.join(
+        f"{f['tabla']}:{f['n']}:{f['ultimo']}:{f['fecha'].isoformat() if f['fecha'] else ''}"
+        for f in filas
+    )
+    crudo += f'|v:{version_contenido()}'
+    return hashlib.sha256(crudo.encode()).hexdigest()[:32]
+
+
+def boletin_cacheado(huella, construir):
+    """
+    Devuelve los bytes del boletín para `huella`, construyéndolo solo si no están en caché
+
+    Args:
+        huella (str): resultado de huella_boletin()
+        construir (callable): función que escribe el PDF en un buffer
+    """
+    clave = f'boletin:pdf:{huella}'
+    contenido = cache.get(clave)
+    if contenido is None:
+        buffer = BytesIO()
+        construir(buffer)
+        contenido = buffer.getvalue()
+        cache.set(clave, contenido, TIEMPO_CACHE_PDF)
+    return contenido
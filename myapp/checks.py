@@ -0,0 +1,68 @@
+"""
+COMPROBACIONES - SEMARTEC
+System checks de configuración que de otro modo fallarían en silencio
+
+Django solo los ejecuta con manage.py (runserver, migrate, check); bajo
+gunicorn los lanza el hook on_starting de gunicorn.conf.py y
+gunicorn_asgi.conf.py con el número real de workers (verificar_arranque).
+"""
+
+import os
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+CACHES_POR_PROCESO = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+# Valores de SECRET_KEY publicados en el repositorio (misite/environ.env y el
+# respaldo de settings.py)
+CLAVES_CONOCIDAS = {'my_secret_key', 'replace-me'}
+
+
+@register(Tags.caches)
+def cache_compartida(app_configs, **kwargs):
+    """
+    La versión de contenido (myapp.cache) vive en la caché: con una caché por
+    proceso la invalidación de un worker no llega a los demás, que siguen
+    respondiendo 304 y sirviendo páginas y boletines viejos
+    """
+    if settings.WEB_CONCURRENCY <= 1 or settings.CACHES['default']['BACKEND'] not in CACHES_POR_PROCESO:
+        return []
+    return [Error(
+        f"La caché 'default' es propia de cada proceso y hay {settings.WEB_CONCURRENCY} workers.",
+        hint='Define CACHE_URL con una caché compartida (rediscache://... o filecache:///ruta).',
+        id='myapp.E001',
+    )]
+
+
+@register(Tags.security)
+def sesiones_firmadas(app_configs, **kwargs):
+    """
+    Con signed_cookies la sesión entera va firmada en la cookie: quien conozca
+    SECRET_KEY puede fabricar la de cualquier usuario de staff
+    """
+    if settings.SESSION_ENGINE != 'django.contrib.sessions.backends.signed_cookies':
+        return []
+    clave = settings.SECRET_KEY
+    if clave not in CLAVES_CONOCIDAS and not clave.startswith('django-insecure-') and len(clave) >= 50:
+        return []
+    return [Error(
+        'SESSION_ENGINE=signed_cookies con un SECRET_KEY conocido o débil permite falsificar sesiones.',
+        hint='Usa el motor por defecto (cached_db) o define un SECRET_KEY propio de al menos 50 caracteres.',
+        id='myapp.E002',
+    )]
+
+
+def verificar_arranque(workers):
+    """Hook on_starting de gunicorn: ejecuta los checks y no arranca si alguno falla"""
+    import django
+    from django.core.management import call_command
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'misite.settings')
+    django.setup()
+    # gunicorn puede recibir -w sin WEB_CONCURRENCY: manda lo que va a arrancar
+    settings.WEB_CONCURRENCY = workers
+    call_command('check', fail_level='ERROR')
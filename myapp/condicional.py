@@ -0,0 +1,107 @@
+"""
+GET CONDICIONAL - SEMARTEC
+Validadores ETag/Last-Modified baratos para las vistas públicas
+"""
+
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.translation import get_language
+
+from .cache import resumen_tabla, version_contenido
+
+
+def _fecha_version(version):
+    """Instante (UTC) en que se fijó la versión de contenido vigente"""
+    return datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
+
+
+def _etag(request, *partes):
+    """ETag fuerte que incluye idioma y usuario, porque la plantilla base depende de ambos"""
+    usuario = request.user.pk if request.user.is_authenticated else 'anon'
+    crudo = '|'.join(str(p) for p in (*partes, get_language(), usuario))
+    return '"%s"' % hashlib.sha256(crudo.encode()).hexdigest()[:32]
+
+
+def validadores_lista(model, campo_fecha=None):
+    """
+    Validadores de un listado: conteo, último pk y fecha máxima de la tabla
+    (una consulta agregada) más la versión de contenido, que cambia al editar
+    """
+    def calcular(request, *args, **kwargs):
+        resumen = resumen_tabla(model.objects, model._meta.model_name, campo_fecha).get()
+        version = version_contenido()
+        ultima = _fecha_version(version)
+        if resumen['fecha'] and resumen['fecha'] > ultima:
+            ultima = resumen['fecha']
+        etag = _etag(request, resumen['n'], resumen['ultimo'], resumen['fecha'], version)
+        return etag, ultima
+    return calcular
+
+
+def validadores_detalle(request, *args, **kwargs):
+    """
+    Validadores de una vista de detalle sin consultar la base de datos
+
+    Cualquier alta, edición o baja cambia la versión de contenido, así que
+    (versión, pk) identifica de forma única el estado del registro. Depende
+    de que todos los workers compartan la caché (check myapp.E001).
+    """
+    version = version_contenido()
+    return _etag(request, version, kwargs.get('pk')), _fecha_version(version)
+
+
+def _completar(request, response, etag, ultima_ts):
+    response.headers.setdefault('ETag', etag)
+    response.headers.setdefault('Last-Modified', http_date(ultima_ts))
+    patch_cache_control(response, no_cache=True)
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True)
+    return response
+
+
+def respuesta_condicional(validadores):
+    """
+    Decorador que responde 304 si el cliente ya tiene la versión vigente
+
+    A diferencia de django.views.decorators.http.condition, los validadores
+    se calculan una sola vez por petición. Acepta vistas síncronas y async; en
+    las async los validadores (que consultan la base y request.user) corren en
+    un hilo con sync_to_async.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_async(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await vista(request, *args, **kwargs)
+
+                etag, ultima = await sync_to_async(validadores)(request, *args, **kwargs)
+                ultima_ts = int(ultima.timestamp())
+                response = get_conditional_response(request, etag=etag, last_modified=ultima_ts)
+                if response is None:
+                    response = await vista(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                return _completar(request, response, etag, ultima_ts)
+            return envoltura_async
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return vista(request, *args, **kwargs)
+
+            etag, ultima = validadores(request, *args, **kwargs)
+            ultima_ts = int(ultima.timestamp())
+            response = get_conditional_response(request, etag=etag, last_modified=ultima_ts)
+            if response is None:
+                response = vista(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return _completar(request, response, etag, ultima_ts)
+        return envoltura
+    return decorador
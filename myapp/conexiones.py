@@ -0,0 +1,49 @@
+"""
+CONEXIONES - SEMARTEC
+Pool de conexiones de PostgreSQL: apertura al arrancar el worker y estadísticas
+
+Django crea el pool (OPTIONS['pool']) sin abrirlo y lo abre con la primera
+petición, que pagaría el coste de conectar. Los hooks de gunicorn llaman a
+abrir_pools() después del fork para que cada worker empiece con DB_POOL_MIN
+conexiones listas; antes del fork no se abre nada porque los hilos del pool
+no sobreviven a él.
+"""
+
+from django.conf import settings
+from django.db import connections
+
+
+def pools():
+    """Pares (alias, pool) de las bases de datos configuradas con pool"""
+    resultado = []
+    for alias, datos in settings.DATABASES.items():
+        if datos.get('OPTIONS', {}).get('pool'):
+            resultado.append((alias, connections[alias].pool))
+    return resultado
+
+
+def abrir_pools(espera=30.0):
+    """
+    Abre los pools y espera a que tengan min_size conexiones
+
+    Si la base de datos no responde en `espera` segundos el worker arranca
+    igualmente; psycopg_pool cierra el pool que no llegó a llenarse, así que se
+    descarta y Django crea otro con la primera petición.
+    """
+    from psycopg_pool import PoolTimeout
+
+    for alias, pool in pools():
+        try:
+            pool.open(wait=True, timeout=espera)
+        except PoolTimeout:
+            connections[alias].close_pool()
+
+
+def cerrar_pools():
+    """Cierra los pools al terminar el worker para no dejar conexiones colgadas"""
+    from .metricas import volcar
+
+    # Antes de cerrar, para no perder las estadísticas del pool
+    volcar()
+    for alias, _ in pools():
+        connections[alias].close_pool()
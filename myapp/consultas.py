@@ -0,0 +1,241 @@
+"""
+REGISTRO DE CONSULTAS - SEMARTEC
+Detecta consultas duplicadas y patrones N+1 y limita las consultas por vista
+
+Se usa en las pruebas (limite_consultas) y, con DEBUG activo, en cada petición
+mediante DeteccionConsultasMiddleware, que registra los hallazgos en el log.
+
+Las consultas se observan por contexto (observar_consultas) y no con un
+execute_wrapper sobre `connection`: bajo ASGI la vista async consulta desde el
+hilo de sync_to_async, que tiene su propia conexión, y el wrapper instalado en
+la del event loop no vería nada.
+"""
+
+import logging
+import os
+import sys
+import time
+from collections import Counter, defaultdict, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import django
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+
+# Repeticiones de una misma consulta con distintos parámetros que se
+# consideran un N+1 (p. ej. una consulta por fila dentro de un {% for %})
+UMBRAL_N_MAS_1 = 3
+
+Consulta = namedtuple('Consulta', 'sql params segundos origen plantilla')
+Hallazgo = namedtuple('Hallazgo', 'tipo sql veces origen plantilla')
+
+_RAIZ = str(settings.BASE_DIR) + os.sep
+_DJANGO = os.path.dirname(os.path.abspath(django.__file__)) + os.sep
+_ESTE_ARCHIVO = os.path.abspath(__file__)
+_CONTROL_TRANSACCION = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+# Observadores activos en el contexto actual; asgiref copia el contexto al
+# hilo de sync_to_async, así que ven también las consultas de las vistas async
+_observadores = ContextVar('observadores_consultas', default=())
+
+
+def _envoltura(execute, sql, params, many, context):
+    """execute_wrapper fijo de cada conexión: avisa a los observadores del contexto"""
+    observadores = _observadores.get()
+    if not observadores:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        segundos = time.perf_counter() - inicio
+        for observador in observadores:
+            observador.anotar(sql, params, many, segundos)
+
+
+def _instalar_envoltura(connection, **kwargs):
+    if _envoltura not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_envoltura)
+
+
+connection_created.connect(_instalar_envoltura)
+
+
+@contextmanager
+def observar_consultas(observador):
+    """
+    Llama a observador.anotar(sql, params, many, segundos) por cada consulta
+    del bloque, en cualquier conexión y en los hilos de sync_to_async
+    """
+    # Las conexiones ya abiertas antes de importar este módulo no pasaron por
+    # connection_created
+    for conexion in connections.all(initialized_only=True):
+        _instalar_envoltura(conexion)
+    token = _observadores.set((*_observadores.get(), observador))
+    try:
+        yield observador
+    finally:
+        _observadores.reset(token)
+
+
+def _origen():
+    """
+    Línea de código del proyecto y nodo de plantilla que lanzaron la consulta
+
+    Returns:
+        tuple: ('myapp/views.py:42 en admin_avisos', 'admin_avisos.html:30') o None
+    """
+    origen = plantilla = None
+    frame = sys._getframe(2)
+    while frame is not None and (origen is None or plantilla is None):
+        archivo = frame.f_code.co_filename
+        if (
+            plantilla is None
+            and frame.f_code.co_name == 'render_annotated'
+            and archivo.startswith(_DJANGO)
+        ):
+            nodo = frame.f_locals.get('self')
+            token = getattr(nodo, 'token', None)
+            if token is not None and getattr(nodo, 'origin', None) is not None:
+                plantilla = f'{nodo.origin.template_name or nodo.origin.name}:{token.lineno}'
+        elif (
+            origen is None
+            and archivo.startswith(_RAIZ)
+            and os.path.abspath(archivo) != _ESTE_ARCHIVO
+            and 'site-packages' not in archivo
+        ):
+            origen = f'{os.path.relpath(archivo, _RAIZ)}:{frame.f_lineno} en {frame.f_code.co_name}'
+        frame = frame.f_back
+    return origen, plantilla
+
+
+class RegistroConsultas:
+    """
+    Observador que guarda cada consulta con su origen
+
+    Uso:
+        with RegistroConsultas() as registro:
+            ...
+        registro.hallazgos()
+    """
+
+    def __init__(self):
+        self.consultas = []
+
+    def anotar(self, sql, params, many, segundos):
+        # Los savepoints dependen de si ya hay una transacción abierta (p. ej.
+        # en TestCase) y no del código de la vista, así que no se cuentan
+        if sql.lstrip().upper().startswith(_CONTROL_TRANSACCION):
+            return
+        origen, plantilla = _origen()
+        self.consultas.append(Consulta(sql, None if many else params, segundos, origen, plantilla))
+
+    def __enter__(self):
+        self._observacion = observar_consultas(self)
+        self._observacion.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._observacion.__exit__(*exc)
+
+    def __len__(self):
+        return len(self.consultas)
+
+    def hallazgos(self, umbral=UMBRAL_N_MAS_1):
+        """
+        Consultas repetidas dentro del registro
+
+        - 'duplicada': misma SQL con los mismos parámetros más de una vez
+        - 'n+1': misma SQL con parámetros distintos al menos `umbral` veces
+        """
+        por_sql = defaultdict(list)
+        for consulta in self.consultas:
+            por_sql[consulta.sql].append(consulta)
+
+        resultado = []
+        for sql, grupo in por_sql.items():
+            primera = grupo[0]
+            repetidas = Counter(repr(c.params) for c in grupo)
+            veces_duplicada = max(repetidas.values())
+            if len(repetidas) >= umbral:
+                resultado.append(Hallazgo('n+1', sql, len(grupo), primera.origen, primera.plantilla))
+            elif veces_duplicada > 1:
+                resultado.append(Hallazgo('duplicada', sql, veces_duplicada, primera.origen, primera.plantilla))
+        return resultado
+
+    def reporte(self):
+        """Texto con cada consulta numerada y los hallazgos, para mensajes de error"""
+        lineas = []
+        for i, c in enumerate(self.consultas, 1):
+            lugar = ' | '.join(filter(None, (c.origen, c.plantilla))) or 'origen desconocido'
+            lineas.append(f'{i}. [{lugar}] {c.sql}')
+        for h in self.hallazgos():
+            lugar = ' | '.join(filter(None, (h.origen, h.plantilla))) or 'origen desconocido'
+            lineas.append(f'** {h.tipo} x{h.veces} [{lugar}] {h.sql}')
+        return '\n'.join(lineas)
+
+
+@contextmanager
+def limite_consultas(maximo, permitir_repetidas=False):
+    """
+    Falla con AssertionError si el bloque hace más de `maximo` consultas o,
+    salvo `permitir_repetidas`, si contiene consultas duplicadas o N+1
+    """
+    with RegistroConsultas() as registro:
+        yield registro
+
+    errores = []
+    if len(registro) > maximo:
+        errores.append(f'{len(registro)} consultas, el máximo es {maximo}')
+    if not permitir_repetidas and registro.hallazgos():
+        errores.append('consultas repetidas')
+    if errores:
+        raise AssertionError(f"{', '.join(errores)}:\n{registro.reporte()}")
+
+
+class DeteccionConsultasMiddleware:
+    """
+    Solo con DEBUG: registra en el log las consultas duplicadas o N+1 de cada
+    petición y añade la cabecera X-Consultas con el total
+
+    Las consultas de respuestas en streaming ocurren después de salir del
+    middleware y no se cuentan.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with RegistroConsultas() as registro:
+            response = self.get_response(request)
+        return self._informar(request, response, registro)
+
+    async def __acall__(self, request):
+        with RegistroConsultas() as registro:
+            response = await self.get_response(request)
+        return self._informar(request, response, registro)
+
+    def _informar(self, request, response, registro):
+        for h in registro.hallazgos():
+            logger.warning(
+                'Consulta %s x%d en %s (%s): %s',
+                h.tipo, h.veces, request.path, ' | '.join(filter(None, (h.origen, h.plantilla))), h.sql,
+            )
+        response['X-Consultas'] = str(len(registro))
+        return response
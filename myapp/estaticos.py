@@ -0,0 +1,175 @@
+"""
+ESTÁTICOS OPTIMIZADOS - SEMARTEC
+Post-proceso de collectstatic: CSS minificado, imágenes recomprimidas con
+variantes AVIF/WebP por ancho y copias precomprimidas Brotli/gzip
+
+Se apoya en CompressedManifestStaticFilesStorage de WhiteNoise: primero se
+reescriben en STATIC_ROOT, a partir de su origen, los CSS e imágenes de img/
+(y se añaden las variantes), después el manifiesto les pone huella y
+WhiteNoise genera los .br/.gz.
+La etiqueta {% imagen_estatica %} (templatetags/imagenes.py) usa las variantes
+que estén en el manifiesto.
+"""
+
+import os
+import re
+from io import BytesIO
+
+from whitenoise.compress import Compressor
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+# Anchos de las variantes; las imágenes más estrechas solo tienen la de su ancho
+ANCHOS = (360, 720, 1280)
+FORMATOS_VARIANTE = {
+    'avif': {'format': 'AVIF', 'quality': 55},
+    'webp': {'format': 'WEBP', 'quality': 78, 'method': 6},
+}
+# Recompresión del original, que conserva su formato y nombre (lo usan CSS y plantillas)
+RECOMPRESION = {
+    '.jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    '.jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    '.png': {'format': 'PNG', 'optimize': True},
+    '.webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+}
+CARPETA_IMAGENES = 'img/'
+
+RE_CSS_TOKEN = re.compile(
+    r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')'  # cadenas: se conservan
+    r'|(/\*.*?\*/)',                             # comentarios: se eliminan
+    re.S,
+)
+RE_CSS_ESPACIOS = re.compile(r'\s+')
+RE_CSS_SEPARADORES = re.compile(r'\s*([{};,])\s*')
+
+
+def nombre_variante(nombre, ancho, formato):
+    """img/valores.jpg -> img/valores-720.avif"""
+    base, _ = os.path.splitext(nombre)
+    return f'{base}-{ancho}.{formato}'
+
+
+def anchos_variantes(ancho_original):
+    """Anchos de variante para una imagen de `ancho_original` píxeles"""
+    anchos = [a for a in ANCHOS if a < ancho_original]
+    return anchos + [min(ancho_original, ANCHOS[-1])]
+
+
+def minificar_css(css):
+    """
+    Minificación conservadora: quita comentarios y espacios sobrantes sin
+    tocar el contenido de las cadenas ni los espacios que separan selectores
+    (`a :hover` no es lo mismo que `a:hover`) o términos de calc()
+    """
+    partes = []
+    posicion = 0
+    for token in RE_CSS_TOKEN.finditer(css):
+        partes.append(_compactar(css[posicion:token.start()]))
+        if token.group(1):
+            partes.append(token.group(1))
+        posicion = token.end()
+    partes.append(_compactar(css[posicion:]))
+    return ''.join(partes).strip()
+
+
+def _compactar(fragmento):
+    fragmento = RE_CSS_ESPACIOS.sub(' ', fragmento)
+    return RE_CSS_SEPARADORES.sub(r'\1', fragmento).replace(';}', '}')
+
+
+class EstaticosOptimizados(CompressedManifestStaticFilesStorage):
+    """Storage de estáticos con la optimización de imágenes y CSS al recolectar"""
+
+    def stored_name(self, name):
+        # Sin manifiesto (pruebas o desarrollo sin collectstatic) se usa el
+        # nombre tal cual en vez de fallar por la entrada que falta
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = dict(paths)
+            # Se lee siempre el archivo de origen: collectstatic no vuelve a
+            # copiar los que no cambiaron y recomprimir la copia ya optimizada
+            # degradaría la imagen en cada despliegue
+            for nombre, (origen, ruta_origen) in list(paths.items()):
+                if nombre.endswith('.css'):
+                    self._minificar(nombre, origen, ruta_origen)
+                    paths[nombre] = (self, nombre)
+                elif nombre.startswith(CARPETA_IMAGENES) and os.path.splitext(nombre)[1].lower() in RECOMPRESION:
+                    for nuevo in self._optimizar_imagen(nombre, origen, ruta_origen):
+                        paths[nuevo] = (self, nuevo)
+                    paths[nombre] = (self, nombre)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def create_compressor(self, extensions=None, **kwargs):
+        # AVIF ya está comprimido: no vale la pena intentar .br/.gz
+        # (salvo que WHITENOISE_SKIP_COMPRESS_EXTENSIONS fije otra lista)
+        if extensions is None:
+            extensions = (*Compressor.SKIP_COMPRESS_EXTENSIONS, 'avif')
+        return Compressor(extensions=extensions, **kwargs)
+
+    def _minificar(self, nombre, origen, ruta_origen):
+        with origen.open(ruta_origen) as archivo:
+            css = archivo.read().decode('utf-8')
+        with open(self.path(nombre), 'w', encoding='utf-8') as archivo:
+            archivo.write(minificar_css(css))
+
+    def _optimizar_imagen(self, nombre, origen, ruta_origen):
+        """Recomprime el original si gana tamaño y escribe sus variantes"""
+        from PIL import Image
+
+        ruta = self.path(nombre)
+        extension = os.path.splitext(nombre)[1].lower()
+        nuevos = []
+        with origen.open(ruta_origen) as archivo:
+            datos = archivo.read()
+        with Image.open(BytesIO(datos)) as original:
+            original.load()
+
+        temporal = f'{ruta}.tmp'
+        original.save(temporal, **RECOMPRESION[extension])
+        if os.path.getsize(temporal) < len(datos):
+            os.replace(temporal, ruta)
+        else:
+            os.remove(temporal)
+            with open(ruta, 'wb') as archivo:
+                archivo.write(datos)
+
+        for ancho in anchos_variantes(original.width):
+            imagen = original.copy()
+            imagen.thumbnail((ancho, ancho * 4), Image.LANCZOS)
+            if imagen.mode not in ('RGB', 'RGBA'):
+                imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() else 'RGB')
+            for formato, opciones in FORMATOS_VARIANTE.items():
+                variante = nombre_variante(nombre, ancho, formato)
+                imagen.save(self.path(variante), **opciones)
+                nuevos.append(variante)
+        return nuevos
+
+
+def variantes(nombre, storage=None):
+    """
+    Variantes de `nombre` presentes en el manifiesto de estáticos
+
+    Returns:
+        dict: {formato: [(ancho, nombre de la variante), ...]} por ancho
+        creciente; vacío sin collectstatic o si la imagen no tiene variantes
+    """
+    if storage is None:
+        from django.contrib.staticfiles.storage import staticfiles_storage as storage
+
+    manifiesto = getattr(storage, 'hashed_files', None) or {}
+    base = re.escape(os.path.splitext(nombre)[0])
+    resultado = {}
+    for formato in FORMATOS_VARIANTE:
+        patron = re.compile(rf'^{base}-(\d+)\.{formato}$')
+        encontradas = sorted(
+            (int(coincidencia.group(1)), clave)
+            for clave in manifiesto
+            if (coincidencia := patron.match(clave))
+        )
+        if encontradas:
+            resultado[formato] = encontradas
+    return resultado
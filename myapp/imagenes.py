@@ -0,0 +1,177 @@
+"""
+DERIVADOS DE IMÁGENES - SEMARTEC
+Genera versiones reducidas (WebP + JPEG) de las fotografías subidas
+"""
+
+import atexit
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+# Ancho máximo en píxeles de cada derivado
+TAMANOS = {
+    'miniatura': 320,
+    'tarjeta': 640,
+    'completa': 1280,
+}
+FORMATOS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+CARPETA_DERIVADOS = 'derivados'
+# Sin manifiesto todavía (el pool no ha terminado): se vuelve a mirar el storage tras este tiempo
+TIEMPO_SIN_DERIVADOS = 60
+
+_pool = None
+
+
+def nombre_derivado(nombre, tamano, extension):
+    """Ruta en el storage del derivado, p. ej. derivados/noticias/logo_tarjeta.webp"""
+    base, _ = os.path.splitext(nombre)
+    return f'{CARPETA_DERIVADOS}/{base}_{tamano}.{extension}'
+
+
+def nombre_manifiesto(nombre):
+    """Ruta en el storage del manifiesto con el ancho real de cada derivado"""
+    base, _ = os.path.splitext(nombre)
+    return f'{CARPETA_DERIVADOS}/{base}.json'
+
+
+def ruta_manifiesto(nombre):
+    """Ruta absoluta del manifiesto de la imagen `nombre`"""
+    return default_storage.path(nombre_manifiesto(nombre))
+
+
+def tiene_derivados(nombre):
+    """Indica si ya existen los derivados de una imagen (el manifiesto se escribe al final)"""
+    return default_storage.exists(nombre_manifiesto(nombre))
+
+
+def _clave_anchos(nombre):
+    return f'derivados:anchos:{nombre}'
+
+
+def recordar_anchos(nombre, anchos):
+    """Guarda en caché los anchos reales de los derivados de `nombre`"""
+    cache.set(_clave_anchos(nombre), anchos, None)
+
+
+def olvidar_anchos(nombre):
+    cache.delete(_clave_anchos(nombre))
+
+
+def anchos_derivados(nombre):
+    """
+    Ancho real en píxeles de cada derivado de `nombre`, o {} si aún no existen
+
+    Se lee de la caché; solo si falta se abre el manifiesto. Los nombres del
+    almacén llevan el hash del contenido, así que la entrada no caduca: otra
+    imagen tendría otro nombre.
+    """
+    clave = _clave_anchos(nombre)
+    anchos = cache.get(clave)
+    if anchos is None:
+        try:
+            with default_storage.open(nombre_manifiesto(nombre)) as archivo:
+                anchos = json.load(archivo)
+        except (FileNotFoundError, ValueError):
+            cache.set(clave, {}, TIEMPO_SIN_DERIVADOS)
+            return {}
+        recordar_anchos(nombre, anchos)
+    return anchos
+
+
+def generar_archivos(origen, destinos, manifiesto):
+    """
+    Escribe los derivados de `origen` en las rutas de `destinos` y, al final,
+    el manifiesto con el ancho real de cada tamaño
+
+    Una imagen más angosta que un tamaño no se amplía, por eso el ancho real
+    puede ser menor que el de TAMANOS. Se ejecuta en un proceso del pool, por
+    lo que solo usa Pillow y rutas absolutas (sin ORM ni storage de Django).
+
+    Returns:
+        dict: ancho real por tamaño
+    """
+    from PIL import Image, ImageOps
+
+    anchos = {}
+    with Image.open(origen) as original:
+        original = ImageOps.exif_transpose(original)
+        for (tamano, extension), destino in destinos.items():
+            ancho = TAMANOS[tamano]
+            imagen = original.copy()
+            imagen.thumbnail((ancho, ancho * 4), Image.LANCZOS)
+            if extension == 'jpg' and imagen.mode not in ('RGB', 'L'):
+                imagen = imagen.convert('RGB')
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            temporal = f'{destino}.tmp'
+            imagen.save(temporal, **FORMATOS[extension])
+            os.replace(temporal, destino)
+            anchos[tamano] = imagen.width
+
+    os.makedirs(os.path.dirname(manifiesto), exist_ok=True)
+    with open(f'{manifiesto}.tmp', 'w') as archivo:
+        json.dump(anchos, archivo)
+    os.replace(f'{manifiesto}.tmp', manifiesto)
+    return anchos
+
+
+def rutas_derivados(nombre):
+    """Rutas absolutas de todos los derivados de la imagen `nombre`"""
+    return {
+        (tamano, extension): default_storage.path(nombre_derivado(nombre, tamano, extension))
+        for tamano in TAMANOS
+        for extension in FORMATOS
+    }
+
+
+def generar_derivados(nombre):
+    """Genera de forma síncrona los derivados de la imagen `nombre` del storage"""
+    anchos = generar_archivos(default_storage.path(nombre), rutas_derivados(nombre), ruta_manifiesto(nombre))
+    recordar_anchos(nombre, anchos)
+    return anchos
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=2)
+        atexit.register(_pool.shutdown, wait=False)
+    return _pool
+
+
+def _terminado(nombre, futuro):
+    error = futuro.exception()
+    if error is not None:
+        logger.error('Error al generar derivados de imagen: %s', error)
+    else:
+        recordar_anchos(nombre, futuro.result())
+
+
+def encolar_derivados(nombre):
+    """
+    Programa la generación de derivados en el pool de procesos
+
+    Se envía al confirmar la transacción para que el archivo y el registro
+    ya existan cuando el proceso hijo lo lea.
+    """
+    if not nombre:
+        return
+
+    def enviar():
+        futuro = _obtener_pool().submit(
+            generar_archivos, default_storage.path(nombre), rutas_derivados(nombre), ruta_manifiesto(nombre),
+        )
+        futuro.add_done_callback(partial(_terminado, nombre))
+
+    transaction.on_commit(enviar)
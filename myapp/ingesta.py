@@ -0,0 +1,193 @@
+"""
+INGESTA DE CONTACTOS EN BUFFER - SEMARTEC
+Cola local de solo-anexar que se vacía a la base de datos con bulk_create
+
+Las líneas que no se pueden insertar (JSON roto, campos desconocidos o una
+fila que la base rechaza) se apartan en <buffer>.rechazados para revisarlas a
+mano; el resto del lote se inserta igual, así una línea mala no bloquea la cola.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, connection, transaction
+
+from .metricas import incrementar
+from .models import Contactos
+
+logger = logging.getLogger(__name__)
+
+
+CAMPOS = ['nombre', 'numero', 'email', 'mensaje']
+
+_pool = None
+
+
+def _ruta_buffer():
+    return str(settings.CONTACTOS_BUFFER_RUTA)
+
+
+def encolar_contacto(datos):
+    """
+    Anexa un contacto validado a la cola local
+
+    Cada envío es una línea JSON escrita bajo un candado exclusivo, por lo que
+    varios workers pueden anexar al mismo archivo sin mezclar líneas.
+
+    Returns:
+        int: tamaño del buffer en bytes después de anexar
+    """
+    ruta = _ruta_buffer()
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    linea = json.dumps({campo: datos.get(campo) for campo in CAMPOS}, ensure_ascii=False) + '\n'
+    while True:
+        with open(ruta, 'a', encoding='utf-8') as archivo:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+            try:
+                # Si el archivo fue renombrado para vaciarlo mientras se esperaba
+                # el candado, se vuelve a abrir la ruta para no escribir en él
+                try:
+                    vigente = os.stat(ruta).st_ino == os.fstat(archivo.fileno()).st_ino
+                except FileNotFoundError:
+                    vigente = False
+                if vigente:
+                    archivo.write(linea)
+                    archivo.flush()
+                    return archivo.tell()
+            finally:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def _contacto(linea):
+    """Contactos sin guardar a partir de una línea de la cola, o ValueError si no es válida"""
+    datos = json.loads(linea)
+    if not isinstance(datos, dict) or set(datos) - set(CAMPOS):
+        raise ValueError('campos inesperados')
+    return Contactos(**datos)
+
+
+def _insertar(lote, rechazados):
+    """
+    bulk_create del lote dentro de un savepoint; si la base rechaza alguna
+    fila (IntegrityError, DataError), se insertan una a una y se apartan las malas
+
+    Los errores de conexión no se atrapan: la cola entera se reintenta después.
+    """
+    try:
+        with transaction.atomic():
+            Contactos.objects.bulk_create([contacto for _, contacto in lote])
+        return len(lote)
+    except (IntegrityError, DataError):
+        pass
+    insertados = 0
+    for linea, contacto in lote:
+        try:
+            with transaction.atomic():
+                contacto.save(force_insert=True)
+            insertados += 1
+        except (IntegrityError, DataError) as e:
+            rechazados.append((linea, e))
+    return insertados
+
+
+def _apartar(ruta, rechazados):
+    """Anexa las líneas rechazadas a <buffer>.rechazados y las registra"""
+    with open(ruta + '.rechazados', 'a', encoding='utf-8') as archivo:
+        for linea, error in rechazados:
+            archivo.write(linea if linea.endswith('\n') else linea + '\n')
+            logger.warning('Contacto apartado en %s.rechazados: %s', ruta, error)
+    incrementar('semartec_contactos_rechazados_total', len(rechazados))
+
+
+def vaciar_buffer(tamano_lote=None):
+    """
+    Inserta en la base de datos los contactos pendientes de la cola local
+
+    El archivo se renombra de forma atómica antes de leerlo, así los envíos
+    que llegan mientras tanto van a un archivo nuevo. La inserción se hace en
+    una sola transacción: si falla la base de datos, el archivo renombrado se
+    conserva completo y se reintenta en la siguiente llamada. Las líneas
+    inválidas no la hacen fallar: se apartan (ver el docstring del módulo).
+    Si otro proceso ya está vaciando la cola, la llamada no hace nada.
+
+    Returns:
+        int: número de contactos insertados
+    """
+    tamano_lote = tamano_lote or settings.CONTACTOS_BUFFER_LOTE
+    ruta = _ruta_buffer()
+    en_proceso = ruta + '.procesando'
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    with open(ruta + '.lock', 'w') as candado:
+        try:
+            fcntl.flock(candado, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0
+
+        if not os.path.exists(en_proceso):
+            try:
+                with open(ruta, encoding='utf-8') as archivo:
+                    # Espera a que termine cualquier escritura en curso
+                    fcntl.flock(archivo, fcntl.LOCK_EX)
+                    os.replace(ruta, en_proceso)
+                    fcntl.flock(archivo, fcntl.LOCK_UN)
+            except FileNotFoundError:
+                return 0
+
+        insertados = 0
+        lote = []
+        rechazados = []
+        with open(en_proceso, encoding='utf-8', errors='replace') as archivo, transaction.atomic():
+            for linea in archivo:
+                if not linea.strip():
+                    continue
+                try:
+                    lote.append((linea, _contacto(linea)))
+                except (ValueError, TypeError) as e:
+                    rechazados.append((linea, e))
+                    continue
+                if len(lote) >= tamano_lote:
+                    insertados += _insertar(lote, rechazados)
+                    lote = []
+            if lote:
+                insertados += _insertar(lote, rechazados)
+
+        # Después del COMMIT: si la transacción fallara, el archivo se
+        # reintenta entero y las líneas no se apartarían dos veces
+        if rechazados:
+            _apartar(ruta, rechazados)
+        os.remove(en_proceso)
+        return insertados
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vaciado-contactos')
+        atexit.register(_pool.shutdown, wait=True)
+    return _pool
+
+
+def _vaciar_en_segundo_plano():
+    try:
+        vaciar_buffer()
+    except Exception:
+        logger.exception('Error al vaciar el buffer de contactos')
+    finally:
+        # La conexión es de este hilo del pool: no se deja abierta
+        connection.close()
+
+
+def programar_vaciado():
+    """
+    Vacía la cola en un hilo aparte
+
+    La petición que cruza CONTACTOS_BUFFER_BYTES no espera al candado ni al
+    bulk_create (bajo ASGI ocuparía el hilo compartido de las vistas síncronas).
+    """
+    _obtener_pool().submit(_vaciar_en_segundo_plano)
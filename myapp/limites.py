@@ -0,0 +1,131 @@
+"""
+LÍMITES DE TASA - SEMARTEC
+Límite de envíos por cliente y contadores de fallos de login en la caché de Django
+
+Los contadores se crean con cache.add() y se suben con cache.incr(), sin leer
+y volver a escribir: en Redis y Memcached ambas operaciones son atómicas y
+las peticiones concurrentes de un mismo cliente no se pisan (locmem solo lo
+es dentro de un proceso; FileBasedCache y DatabaseCache no lo garantizan).
+El límite solo es global si todos los workers comparten la caché (check
+myapp.E001); con una caché por proceso cada worker llevaría su propia cuenta.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def ip_cliente(request):
+    """
+    IP del cliente que hace la petición
+
+    Detrás del proxy de la plataforma (IP_DESDE_X_FORWARDED_FOR=True) se toma
+    la primera IP de X-Forwarded-For; si no, REMOTE_ADDR, que no se puede falsificar.
+    """
+    if getattr(settings, 'IP_DESDE_X_FORWARDED_FOR', False):
+        reenviada = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if reenviada:
+            return reenviada.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _incrementar(clave, expiracion):
+    """Suma 1 al contador `clave` (creándolo con caducidad `expiracion`) y devuelve el valor nuevo"""
+    cache.add(clave, 0, expiracion)
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # Caducó entre add() e incr(): este es el primero de la ventana nueva
+        cache.add(clave, 1, expiracion)
+        return 1
+
+
+def consumir_token(clave, capacidad, por_minuto):
+    """
+    Cuenta una petición de `clave` en la ventana fija actual
+
+    Cada ventana dura lo que tardaría en recargarse una ráfaga completa
+    (capacidad / por_minuto minutos) y admite `capacidad` peticiones: ráfagas
+    de hasta `capacidad` y, sostenido, `por_minuto` por minuto. En el cambio
+    de ventana pueden pasar hasta 2 × capacidad seguidas.
+
+    Returns:
+        tuple: (permitido, segundos de espera sugeridos)
+    """
+    duracion = max(1, round(capacidad * 60 / por_minuto))
+    ahora = time.time()
+    ventana = int(ahora // duracion)
+    usadas = _incrementar(f'{clave}:{ventana}', duracion + 1)
+    if usadas > capacidad:
+        return False, int((ventana + 1) * duracion - ahora) + 1
+    return True, 0
+
+
+def _claves_login(ip, usuario):
+    """Llaves de los contadores por IP y por usuario (en minúsculas y con hash)"""
+    usuario = hashlib.sha256((usuario or '').strip().lower().encode()).hexdigest()[:32]
+    return {
+        'ip': (f'login:ip:{ip}', settings.LOGIN_FALLOS_LIBRES_IP),
+        'usuario': (f'login:usuario:{usuario}', settings.LOGIN_FALLOS_LIBRES),
+    }
+
+
+def _retardo_login(fallos, libres):
+    """Segundos de bloqueo tras `fallos` intentos: se dobla con cada fallo extra"""
+    if fallos < libres:
+        return 0
+    return min(settings.LOGIN_BLOQUEO_MAXIMO, settings.LOGIN_ESPERA_BASE * 2 ** (fallos - libres))
+
+
+def espera_login(ip, usuario):
+    """
+    Comprueba si se permite un intento de login antes de verificar la contraseña
+
+    Returns:
+        tuple: (motivo, segundos de espera) con motivo 'ip' o 'usuario' si está
+        bloqueado, o (None, 0) si se permite
+    """
+    claves = _claves_login(ip, usuario)
+    estados = cache.get_many([f'{clave}:{campo}' for clave, _ in claves.values() for campo in ('fallos', 'ultimo')])
+    ahora = time.time()
+    motivo, espera = None, 0
+    for nombre, (clave, libres) in claves.items():
+        fallos = estados.get(f'{clave}:fallos')
+        if not fallos:
+            continue
+        ultimo = estados.get(f'{clave}:ultimo', ahora)
+        restante = ultimo + _retardo_login(fallos, libres) - ahora
+        if restante > espera:
+            motivo, espera = nombre, restante
+    return motivo, int(espera) + 1 if motivo else 0
+
+
+def registrar_fallo_login(ip, usuario):
+    """
+    Suma un fallo a los contadores de la IP y del usuario
+
+    El número de fallos se sube con incr (atómico): cincuenta intentos
+    simultáneos cuentan como cincuenta. El instante del último fallo va en
+    otra clave; si dos lo escriben a la vez, cualquiera de los dos vale.
+    """
+    ahora = time.time()
+    # Los contadores caducan LOGIN_FALLOS_VENTANA segundos después del bloqueo
+    expiracion = settings.LOGIN_BLOQUEO_MAXIMO + settings.LOGIN_FALLOS_VENTANA
+    for clave, _ in _claves_login(ip, usuario).values():
+        _incrementar(f'{clave}:fallos', expiracion)
+        # incr conserva la caducidad del primer fallo: se alarga desde este
+        cache.touch(f'{clave}:fallos', expiracion)
+        cache.set(f'{clave}:ultimo', ahora, expiracion)
+
+
+def limpiar_fallos_login(usuario):
+    """
+    Reinicia el contador del usuario tras un login correcto
+
+    El de la IP no se reinicia: con una cuenta válida se podría seguir probando
+    contraseñas de otras cuentas desde la misma IP.
+    """
+    clave = _claves_login('', usuario)['usuario'][0]
+    cache.delete_many([f'{clave}:fallos', f'{clave}:ultimo'])
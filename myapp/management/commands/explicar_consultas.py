@@ -0,0 +1,87 @@
+"""
+Imprime el plan de ejecución (EXPLAIN) de las consultas de cada vista
+Sirve para confirmar el uso de índices después de cambios de esquema
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from myapp.models import Aviso, Noticia, Colaborador, Contactos
+from myapp.paginacion import TAMANO_PAGINA, filtro_keyset
+
+
+def _consultas_por_vista():
+    """Lista de (vista, descripción, queryset) con las consultas calientes del sitio"""
+    ahora = timezone.now()
+    fecha_limite = ahora - timedelta(days=30)
+    cursor_fecha = ('fecha_publicacion', 'pk')
+    cursor_envio = ('fecha_envio', 'pk')
+
+    return [
+        ('inicio', 'últimos avisos',
+         Aviso.objects.order_by('-fecha_publicacion')[:4]),
+        ('inicio', 'últimas noticias',
+         Noticia.objects.order_by('-fecha_publicacion')[:4]),
+        ('inicio', 'colaboradores',
+         Colaborador.objects.all()[:4]),
+        ('avisos', 'primera página',
+         Aviso.objects.order_by('-fecha_publicacion', '-pk')[:TAMANO_PAGINA + 1]),
+        ('avisos', 'página siguiente (cursor)',
+         Aviso.objects.filter(filtro_keyset(cursor_fecha, (ahora, 0), 'lt'))
+         .order_by('-fecha_publicacion', '-pk')[:TAMANO_PAGINA + 1]),
+        ('noticias', 'primera página',
+         Noticia.objects.order_by('-fecha_publicacion', '-pk')[:TAMANO_PAGINA + 1]),
+        ('noticias', 'página siguiente (cursor)',
+         Noticia.objects.filter(filtro_keyset(cursor_fecha, (ahora, 0), 'lt'))
+         .order_by('-fecha_publicacion', '-pk')[:TAMANO_PAGINA + 1]),
+        ('admin_contactos', 'primera página',
+         Contactos.objects.order_by('-fecha_envio', '-pk')[:26]),
+        ('admin_contactos', 'página siguiente (cursor)',
+         Contactos.objects.filter(filtro_keyset(cursor_envio, (ahora, 0), 'lt'))
+         .order_by('-fecha_envio', '-pk')[:26]),
+        ('admin_contactos', 'contactos por eliminar',
+         Contactos.objects.filter(fecha_envio__lt=fecha_limite)),
+        ('limpiar_contactos_manual', 'contactos antiguos',
+         Contactos.objects.filter(fecha_envio__lt=fecha_limite).order_by()),
+        ('generar_boletin_pdf', 'últimos 10 avisos',
+         Aviso.objects.order_by('-fecha_publicacion')[:10]),
+        ('generar_boletin_pdf', 'últimas 10 noticias',
+         Noticia.objects.order_by('-fecha_publicacion')[:10]),
+        ('generar_contactos_pdf', 'todos los contactos',
+         Contactos.objects.order_by('-fecha_envio')),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Muestra el plan EXPLAIN de las consultas de cada vista (SQLite y PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Ejecuta EXPLAIN ANALYZE (solo PostgreSQL)',
+        )
+        parser.add_argument(
+            '--vista', default=None,
+            help='Limita la salida a una sola vista, p. ej. "avisos"',
+        )
+
+    def handle(self, *args, **options):
+        opciones = {}
+        if connection.vendor == 'postgresql' and options['analyze']:
+            opciones = {'analyze': True, 'buffers': True}
+        elif options['analyze']:
+            self.stderr.write(self.style.WARNING(
+                f'--analyze no está disponible en {connection.vendor}; se omite'
+            ))
+
+        self.stdout.write(f'Motor de base de datos: {connection.vendor}\n')
+        for vista, descripcion, queryset in _consultas_por_vista():
+            if options['vista'] and options['vista'] != vista:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{vista} - {descripcion}'))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**opciones))
+            self.stdout.write('')
@@ -0,0 +1,66 @@
+"""
+Genera un conjunto de datos sintético y reproducible para pruebas de carga
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.imagenes import generar_derivados
+from myapp.models import Aviso, Noticia, Colaborador, Contactos
+from myapp.rendimiento import ESCALAS, generar_datos, generar_imagenes_muestra
+
+
+class Command(BaseCommand):
+    help = 'Inserta avisos, noticias, colaboradores y contactos sintéticos con bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala', choices=sorted(ESCALAS), default='1k',
+            help='Registros de avisos, noticias y contactos (colaboradores: 1%%)',
+        )
+        for modelo in ('avisos', 'noticias', 'contactos', 'colaboradores'):
+            parser.add_argument(
+                f'--{modelo}', type=int, default=None,
+                help=f'Cantidad exacta de {modelo} (ignora --escala)',
+            )
+        parser.add_argument(
+            '--semilla', type=int, default=2024,
+            help='Semilla del generador; la misma semilla produce los mismos datos',
+        )
+        parser.add_argument(
+            '--imagenes', type=int, default=8,
+            help='Fotografías de muestra para noticias y colaboradores (0 para ninguna)',
+        )
+        parser.add_argument(
+            '--limpiar', action='store_true',
+            help='Elimina los registros existentes antes de generar',
+        )
+
+    def handle(self, *args, **options):
+        n = ESCALAS[options['escala']]
+        cantidades = {
+            'avisos': n,
+            'noticias': n,
+            'contactos': n,
+            'colaboradores': max(10, n // 100),
+        }
+        for modelo in cantidades:
+            if options[modelo] is not None:
+                if options[modelo] < 0:
+                    raise CommandError(f'--{modelo} debe ser mayor o igual a 0')
+                cantidades[modelo] = options[modelo]
+
+        if options['limpiar']:
+            for model in (Aviso, Noticia, Colaborador, Contactos):
+                model.objects.all().delete()
+            self.stdout.write('Registros existentes eliminados')
+
+        imagenes = []
+        if options['imagenes'] > 0:
+            imagenes = generar_imagenes_muestra(options['imagenes'], options['semilla'])
+            for nombre in imagenes:
+                generar_derivados(nombre)
+            self.stdout.write(f'Imágenes de muestra: {len(imagenes)} (con derivados)')
+
+        insertados = generar_datos(semilla=options['semilla'], imagenes=imagenes, **cantidades)
+        resumen = ', '.join(f'{cantidad} {modelo}' for modelo, cantidad in insertados.items())
+        self.stdout.write(self.style.SUCCESS(f'Datos generados: {resumen}'))
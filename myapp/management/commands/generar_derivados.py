@@ -0,0 +1,59 @@
+"""
+Genera los derivados responsivos de las fotografías ya existentes
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from myapp.imagenes import generar_archivos, recordar_anchos, ruta_manifiesto, rutas_derivados, tiene_derivados
+from myapp.models import Noticia, Colaborador
+
+
+class Command(BaseCommand):
+    help = 'Genera miniaturas WebP/JPEG de las fotografías de noticias y colaboradores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help='Regenera también las imágenes que ya tienen derivados',
+        )
+        parser.add_argument(
+            '--procesos', type=int, default=None,
+            help='Número de procesos del pool (por defecto, uno por CPU)',
+        )
+
+    def handle(self, *args, **options):
+        nombres = set()
+        for model in (Noticia, Colaborador):
+            nombres.update(
+                model.objects.exclude(fotografia='').exclude(fotografia__isnull=True)
+                .values_list('fotografia', flat=True)
+            )
+
+        pendientes = sorted(
+            nombre for nombre in nombres
+            if default_storage.exists(nombre) and (options['forzar'] or not tiene_derivados(nombre))
+        )
+        self.stdout.write(f'Imágenes por procesar: {len(pendientes)} de {len(nombres)}')
+
+        errores = 0
+        with ProcessPoolExecutor(max_workers=options['procesos']) as pool:
+            futuros = {
+                pool.submit(
+                    generar_archivos, default_storage.path(nombre), rutas_derivados(nombre), ruta_manifiesto(nombre),
+                ): nombre
+                for nombre in pendientes
+            }
+            for futuro in as_completed(futuros):
+                try:
+                    recordar_anchos(futuros[futuro], futuro.result())
+                    self.stdout.write(f'  ✓ {futuros[futuro]}')
+                except Exception as e:
+                    errores += 1
+                    self.stderr.write(f'  ✗ {futuros[futuro]}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Derivados generados: {len(pendientes) - errores}, errores: {errores}'
+        ))
@@ -0,0 +1,73 @@
+"""
+Retención de contactos: elimina en lotes los registros más antiguos que --dias
+y los boletines PDF generados hace más de --dias-boletines (fila y archivo)
+Pensado para cron o para quedar corriendo con --cada
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myapp.models import Contactos, TrabajoPDF
+from myapp.retencion import TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = 'Elimina en lotes los contactos y boletines PDF más antiguos que su periodo de retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=30,
+            help='Días de contactos a conservar (por defecto 30)',
+        )
+        parser.add_argument(
+            '--dias-boletines', type=int, default=7,
+            help='Días de boletines PDF generados a conservar (por defecto 7)',
+        )
+        parser.add_argument(
+            '--lote', type=int, default=TAMANO_LOTE,
+            help=f'Registros eliminados por transacción (por defecto {TAMANO_LOTE})',
+        )
+        parser.add_argument(
+            '--pausa', type=float, default=0.0,
+            help='Segundos de espera entre lotes',
+        )
+        parser.add_argument(
+            '--simular', action='store_true',
+            help='Solo cuenta los registros que se eliminarían',
+        )
+        parser.add_argument(
+            '--cada', type=float, default=None,
+            help='Repite la limpieza cada N segundos en lugar de terminar',
+        )
+
+    def handle(self, *args, **options):
+        if options['cada'] is None:
+            self._limpiar(options)
+            return
+
+        try:
+            while True:
+                close_old_connections()
+                self._limpiar(options)
+                time.sleep(options['cada'])
+        except KeyboardInterrupt:
+            self.stdout.write('Retención detenida')
+
+    def _limpiar(self, options):
+        accion = 'por eliminar' if options['simular'] else 'eliminados'
+        for etiqueta, model, dias in (
+            ('Contactos', Contactos, options['dias']),
+            ('Boletines', TrabajoPDF, options['dias_boletines']),
+        ):
+            detalle = model.limpiar_antiguos_detalle(
+                dias=dias,
+                tamano_lote=options['lote'],
+                pausa=options['pausa'],
+                simular=options['simular'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{etiqueta} {accion}: {detalle['eliminados']} en {detalle['lotes']} lote(s), "
+                f"{detalle['segundos']:.2f} s ({detalle['por_segundo']:.0f} registros/s)"
+            ))
@@ -0,0 +1,117 @@
+"""
+Recolección de basura del almacén por contenido (myapp.almacen)
+
+Borra los archivos de contenido/ que ninguna fila usa (y sus derivados). Con
+--migrar, antes pasa al almacén las fotografías con nombre antiguo
+(noticias/..., colaboradores/...), de modo que las copias repetidas quedan en
+un solo archivo.
+"""
+
+import os
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from myapp.almacen import (
+    CARPETA_CONTENIDO, GRACIA_SEGUNDOS, almacen_contenido, campos_con_fotografia, eliminar_archivo,
+    es_de_contenido, nombres_referenciados,
+)
+from myapp.cache import invalidar_contenido
+from myapp.imagenes import CARPETA_DERIVADOS, generar_derivados, tiene_derivados
+
+
+class Command(BaseCommand):
+    help = 'Elimina los archivos del almacén por contenido que ya no usa ninguna fila'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--migrar', action='store_true',
+            help='Pasa antes al almacén las fotografías guardadas con su nombre original',
+        )
+        parser.add_argument(
+            '--gracia', type=int, default=GRACIA_SEGUNDOS // 60,
+            help=f'No borra archivos tocados en los últimos N minutos (por defecto {GRACIA_SEGUNDOS // 60})',
+        )
+        parser.add_argument(
+            '--simular', action='store_true',
+            help='Solo informa de lo que se haría',
+        )
+
+    def handle(self, *args, **options):
+        almacen = almacen_contenido()
+        if options['migrar']:
+            self._migrar(almacen, options['simular'])
+
+        referenciados = nombres_referenciados()
+        limite = time.time() - options['gracia'] * 60
+        raiz = almacen.path(CARPETA_CONTENIDO)
+        huerfanos, liberados = 0, 0
+
+        for carpeta, _, archivos in os.walk(raiz):
+            for archivo in archivos:
+                ruta = os.path.join(carpeta, archivo)
+                nombre = os.path.relpath(ruta, almacen.location).replace(os.sep, '/')
+                if nombre in referenciados or os.path.getmtime(ruta) > limite:
+                    continue
+                huerfanos += 1
+                liberados += os.path.getsize(ruta)
+                self.stdout.write(f'  - {nombre}')
+                if not options['simular']:
+                    # Las subidas a medias (.subida-*.tmp) no tienen derivados
+                    eliminar_archivo(almacen, nombre)
+
+        # Derivados (<sha256>_<tamaño>.<ext>) cuyo original ya no existe
+        existentes = {os.path.splitext(a)[0] for _, _, archivos in os.walk(raiz) for a in archivos}
+        derivados = 0
+        for carpeta, _, archivos in os.walk(almacen.path(f'{CARPETA_DERIVADOS}/{CARPETA_CONTENIDO}')):
+            for archivo in archivos:
+                if archivo.split('_')[0] in existentes:
+                    continue
+                derivados += 1
+                liberados += os.path.getsize(os.path.join(carpeta, archivo))
+                if not options['simular']:
+                    os.remove(os.path.join(carpeta, archivo))
+
+        accion = 'Se liberarían' if options['simular'] else 'Liberados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{accion} {liberados / 1024:.0f} KiB: {huerfanos} archivos huérfanos, {derivados} derivados sueltos'
+        ))
+
+    def _migrar(self, almacen, simular):
+        """Guarda en el almacén cada fotografía con nombre antiguo y actualiza sus filas"""
+        migrados = {}
+        for model, campo in campos_con_fotografia():
+            nombres = (
+                model.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True})
+                .values_list(campo, flat=True).distinct()
+            )
+            for viejo in nombres:
+                if es_de_contenido(viejo) or not almacen.exists(viejo):
+                    continue
+                if viejo not in migrados:
+                    if simular:
+                        migrados[viejo] = None
+                    else:
+                        with almacen.open(viejo) as archivo:
+                            migrados[viejo] = almacen.save(viejo, File(archivo))
+                        if tiene_derivados(viejo) and not tiene_derivados(migrados[viejo]):
+                            generar_derivados(migrados[viejo])
+                if not simular:
+                    model.objects.filter(**{campo: viejo}).update(**{campo: migrados[viejo]})
+
+        if simular:
+            self.stdout.write(f'Se migrarían {len(migrados)} fotografías')
+            return
+
+        unicos = set(migrados.values())
+        antes = sum(almacen.size(viejo) for viejo in migrados)
+        despues = sum(almacen.size(nuevo) for nuevo in unicos)
+        for viejo in migrados:
+            eliminar_archivo(almacen, viejo)
+        # update() no dispara señales: las páginas cacheadas apuntan a los nombres viejos
+        invalidar_contenido()
+        self.stdout.write(
+            f'Migradas {len(migrados)} fotografías a {len(unicos)} archivos de contenido '
+            f'({antes / 1024:.0f} KiB -> {despues / 1024:.0f} KiB)'
+        )
@@ -0,0 +1,151 @@
+"""
+Mide el costo de arranque de un worker: tiempo de importación por paquete y
+memoria residente tras django.setup() y la carga de todas las URLs
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.rendimiento import cargar_base, guardar_base
+
+
+# Se ejecuta en un intérprete nuevo para medir un arranque en frío real
+SCRIPT_ARRANQUE = '''
+import json, os, sys, time
+inicio = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver, resolve
+get_resolver().url_patterns
+resolve('/')
+segundos = time.perf_counter() - inicio
+rss_kb = 0
+try:
+    with open('/proc/self/status') as status:
+        for linea in status:
+            if linea.startswith('VmRSS:'):
+                rss_kb = int(linea.split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'segundos': segundos,
+    'rss_kb': rss_kb,
+    'modulos': len(sys.modules),
+    'reportlab': 'reportlab' in sys.modules,
+    'pil': 'PIL.Image' in sys.modules,
+}))
+'''
+
+
+def ejecutar_arranque(importtime=False):
+    """Arranca un intérprete nuevo y devuelve (medición, salida de -X importtime)"""
+    comando = [sys.executable]
+    if importtime:
+        comando += ['-X', 'importtime']
+    comando += ['-c', SCRIPT_ARRANQUE]
+    entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'misite.settings')}
+    proceso = subprocess.run(
+        comando, cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+    )
+    if proceso.returncode != 0:
+        raise CommandError(f'El arranque falló:\n{proceso.stderr[-2000:]}')
+    return json.loads(proceso.stdout.strip().splitlines()[-1]), proceso.stderr
+
+
+def desglose_importaciones(salida):
+    """
+    Suma el tiempo acumulado (ms) de las importaciones de primer nivel por
+    paquete raíz a partir de la salida de `python -X importtime`
+    """
+    por_paquete = defaultdict(float)
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        if nombre.startswith('  '):
+            continue  # importación anidada: ya está en el acumulado de su padre
+        por_paquete[nombre.strip().split('.')[0]] += int(acumulado) / 1000
+    return dict(sorted(por_paquete.items(), key=lambda x: -x[1]))
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo de importación y memoria de un arranque en frío (django.setup() + URLs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticiones', type=int, default=5,
+            help='Arranques medidos; se reporta la mediana (por defecto 5)',
+        )
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Paquetes a mostrar en el desglose de importación',
+        )
+        parser.add_argument(
+            '--base', default=str(Path(settings.BASE_DIR) / 'var' / 'arranque_base.json'),
+            help='Archivo JSON con la línea base',
+        )
+        parser.add_argument(
+            '--guardar-base', action='store_true',
+            help='Guarda este resultado como la nueva línea base',
+        )
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.2,
+            help='Crecimiento relativo permitido de tiempo y memoria (por defecto 0.2)',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+
+        mediciones = [ejecutar_arranque()[0] for _ in range(options['repeticiones'])]
+        ultima, salida = ejecutar_arranque(importtime=True)
+        desglose = desglose_importaciones(salida)
+
+        resultado = {
+            'ms': round(statistics.median(m['segundos'] for m in mediciones) * 1000, 1),
+            'rss_kb': int(statistics.median(m['rss_kb'] for m in mediciones)),
+            'modulos': ultima['modulos'],
+            'reportlab': ultima['reportlab'],
+            'pil': ultima['pil'],
+            'importaciones_ms': {k: round(v, 1) for k, v in desglose.items()},
+        }
+
+        self.stdout.write(
+            f"Arranque: {resultado['ms']} ms, RSS {resultado['rss_kb'] / 1024:.1f} MiB, "
+            f"{resultado['modulos']} módulos (mediana de {options['repeticiones']})"
+        )
+        self.stdout.write(f"ReportLab cargado: {'sí' if resultado['reportlab'] else 'no'}; "
+                          f"Pillow cargado: {'sí' if resultado['pil'] else 'no'}")
+        self.stdout.write('Importación por paquete (ms, con -X importtime):')
+        for paquete, ms in list(desglose.items())[:options['top']]:
+            self.stdout.write(f'  {paquete:28} {ms:8.1f}')
+
+        ruta_base = options['base']
+        if options['guardar_base']:
+            guardar_base(resultado, ruta_base)
+            self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {ruta_base}'))
+            return
+        if not Path(ruta_base).exists():
+            return
+
+        base = cargar_base(ruta_base)
+        regresiones = []
+        for clave, unidad in (('ms', 'ms'), ('rss_kb', 'KiB')):
+            if resultado[clave] > base[clave] * (1 + options['tolerancia']):
+                regresiones.append(f'{clave}: {resultado[clave]} {unidad} (base {base[clave]} {unidad})')
+        if resultado['reportlab'] and not base['reportlab']:
+            regresiones.append('ReportLab se carga de nuevo al arrancar')
+        if regresiones:
+            for regresion in regresiones:
+                self.stdout.write(self.style.ERROR(regresion))
+            raise CommandError(f'{len(regresiones)} regresión(es) de arranque respecto a la línea base')
+        self.stdout.write(self.style.SUCCESS('Sin regresiones de arranque respecto a la línea base'))
@@ -0,0 +1,38 @@
+"""
+Compara el tiempo de CPU por render de las páginas públicas con DTL y Jinja2
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.rendimiento import PLANTILLAS_PUBLICAS, medir_plantillas
+
+
+class Command(BaseCommand):
+    help = 'Mide el render de las plantillas públicas con DTL y con Jinja2 (mediana de CPU por render)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticiones', type=int, default=200,
+            help='Renders medidos por plantilla y motor (por defecto 200)',
+        )
+        parser.add_argument(
+            '--solo', default=None,
+            help='Mide solo las plantillas cuyo nombre contenga este texto',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+
+        plantillas = [p for p in PLANTILLAS_PUBLICAS if not options['solo'] or options['solo'] in p]
+        resultados = medir_plantillas(options['repeticiones'], plantillas)
+
+        self.stdout.write(f"{'plantilla':26} {'DTL µs':>9} {'Jinja2 µs':>10} {'x':>6}")
+        for nombre, r in resultados.items():
+            self.stdout.write(f"{nombre:26} {r['dtl_us']:9.1f} {r['jinja2_us']:10.1f} {r['aceleracion']:6.2f}")
+        if resultados:
+            dtl = sum(r['dtl_us'] for r in resultados.values())
+            jinja = sum(r['jinja2_us'] for r in resultados.values())
+            self.stdout.write(self.style.SUCCESS(
+                f'Total: DTL {dtl / 1000:.2f} ms, Jinja2 {jinja / 1000:.2f} ms ({dtl / max(jinja, 0.1):.2f}x)'
+            ))
@@ -0,0 +1,94 @@
+"""
+Mide latencia, consultas y memoria de cada ruta y la compara con una línea base
+"""
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.rendimiento import (
+    cargar_base, comparar, ejecutar_benchmark, guardar_base, rutas_sin_caso,
+)
+
+
+class Command(BaseCommand):
+    help = 'Recorre todas las rutas con el cliente de pruebas y reporta p50/p95, consultas y memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticiones', type=int, default=20,
+            help='Peticiones medidas por ruta (por defecto 20)',
+        )
+        parser.add_argument(
+            '--fria', action='store_true',
+            help='Vacía la caché antes de cada petición',
+        )
+        parser.add_argument(
+            '--solo', default=None,
+            help='Mide solo las rutas cuyo nombre contenga este texto',
+        )
+        parser.add_argument(
+            '--base', default=str(Path(settings.BASE_DIR) / 'var' / 'rendimiento_base.json'),
+            help='Archivo JSON con la línea base',
+        )
+        parser.add_argument(
+            '--guardar-base', action='store_true',
+            help='Guarda este resultado como la nueva línea base',
+        )
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.25,
+            help='Crecimiento relativo permitido de p95 y memoria (por defecto 0.25)',
+        )
+
+    def handle(self, *args, **options):
+        faltantes = rutas_sin_caso()
+        if faltantes:
+            raise CommandError(f'Rutas sin caso en myapp.rendimiento.CASOS: {", ".join(faltantes)}')
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+
+        self.stdout.write(f"{'ruta':32} {'estado':>6} {'p50 ms':>9} {'p95 ms':>9} {'consultas':>9} {'KiB':>8}")
+        resultado = ejecutar_benchmark(
+            repeticiones=options['repeticiones'],
+            fria=options['fria'],
+            filtro=options['solo'],
+            progreso=self._mostrar,
+        )
+        meta = resultado['meta']
+        self.stdout.write(f"Datos: {meta['datos']}  RSS máximo: {meta['rss_max_kb'] / 1024:.1f} MiB")
+
+        errores = [n for n, r in resultado['rutas'].items() if r.get('estado', 0) >= 500]
+        if errores:
+            raise CommandError(f'Rutas con error del servidor: {", ".join(errores)}')
+
+        ruta_base = options['base']
+        if options['guardar_base']:
+            guardar_base(resultado, ruta_base)
+            self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {ruta_base}'))
+            return
+
+        if not Path(ruta_base).exists():
+            self.stdout.write(f'Sin línea base en {ruta_base}; usa --guardar-base para crearla')
+            return
+
+        base = cargar_base(ruta_base)
+        if base['meta'].get('datos') != meta['datos']:
+            self.stdout.write(self.style.WARNING(
+                f"Los datos difieren de la línea base ({base['meta'].get('datos')}); la comparación es orientativa"
+            ))
+        regresiones = comparar(resultado, base, tolerancia=options['tolerancia'])
+        if regresiones:
+            for regresion in regresiones:
+                self.stdout.write(self.style.ERROR(regresion))
+            raise CommandError(f'{len(regresiones)} regresión(es) respecto a la línea base')
+        self.stdout.write(self.style.SUCCESS('Sin regresiones respecto a la línea base'))
+
+    def _mostrar(self, nombre, r):
+        if 'omitida' in r:
+            self.stdout.write(f"{nombre:32} omitida ({r['omitida']})")
+            return
+        self.stdout.write(
+            f"{nombre:32} {r['estado']:>6} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+            f"{r['consultas']:>9} {r['memoria_kb']:>8}"
+        )
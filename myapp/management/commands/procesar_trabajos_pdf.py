@@ -0,0 +1,44 @@
+"""
+Worker local de la cola de trabajos PDF
+Se ejecuta como proceso aparte de gunicorn para no bloquear a los workers web
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myapp.trabajos import procesar_pendientes, registrar_latido
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de boletines PDF pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help='Procesa los trabajos pendientes y termina (útil en cron)',
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=2.0,
+            help='Segundos de espera entre revisiones de la cola (por defecto 2)',
+        )
+
+    def handle(self, *args, **options):
+        if options['una_vez']:
+            procesados = procesar_pendientes()
+            self.stdout.write(self.style.SUCCESS(f'Trabajos procesados: {procesados}'))
+            return
+
+        self.stdout.write('Worker de PDF en espera de trabajos (Ctrl+C para salir)')
+        try:
+            while True:
+                registrar_latido()
+                close_old_connections()
+                procesados = procesar_pendientes()
+                if procesados:
+                    self.stdout.write(f'Trabajos procesados: {procesados}')
+                else:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido')
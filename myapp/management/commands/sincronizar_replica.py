@@ -0,0 +1,38 @@
+"""
+Replicación de juguete para probar myapp.replicas con dos archivos SQLite
+
+    DATABASE_REPLICA_URL=sqlite:///var/replica.sqlite3 python manage.py sincronizar_replica
+    DATABASE_REPLICA_URL=sqlite:///var/replica.sqlite3 python manage.py sincronizar_replica --cada 10
+
+Con --cada N la réplica va hasta N segundos atrasada: con N mayor que
+REPLICA_RETRASO_MAXIMO las páginas públicas vuelven a leer del primario.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.replicas import ALIAS_REPLICA, replica_configurada, sincronizar_sqlite
+
+
+class Command(BaseCommand):
+    help = 'Copia la base SQLite del primario sobre la réplica (solo para pruebas locales)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cada', type=float, default=None,
+            help='Repite la copia cada N segundos hasta Ctrl+C',
+        )
+
+    def handle(self, *args, **options):
+        if not replica_configurada():
+            raise CommandError(f"No hay base '{ALIAS_REPLICA}': define DATABASE_REPLICA_URL")
+        while True:
+            try:
+                sincronizar_sqlite()
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f'Réplica sincronizada {time.strftime("%H:%M:%S")}')
+            if options['cada'] is None:
+                return
+            time.sleep(options['cada'])
@@ -0,0 +1,35 @@
+"""
+Inserta en la base de datos los contactos acumulados en el buffer local
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myapp.ingesta import vaciar_buffer
+
+
+class Command(BaseCommand):
+    help = 'Vacía el buffer de contactos con bulk_create (modo CONTACTOS_INGESTA_BUFFER)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cada', type=float, default=None,
+            help='Repite el vaciado cada N segundos en lugar de terminar',
+        )
+
+    def handle(self, *args, **options):
+        if options['cada'] is None:
+            self.stdout.write(self.style.SUCCESS(f'Contactos insertados: {vaciar_buffer()}'))
+            return
+
+        try:
+            while True:
+                close_old_connections()
+                insertados = vaciar_buffer()
+                if insertados:
+                    self.stdout.write(f'Contactos insertados: {insertados}')
+                time.sleep(options['cada'])
+        except KeyboardInterrupt:
+            self.stdout.write('Vaciado detenido')
@@ -0,0 +1,174 @@
+"""
+ENTREGA DE MEDIA - SEMARTEC
+Sirve en producción las imágenes subidas (MEDIA_ROOT) con Range, ETag y caché
+
+Modos (MEDIA_ENTREGA):
+- 'django': FileResponse. Con gunicorn en WSGI el cuerpo sale con sendfile()
+  (también los rangos), sin copiar bytes en Python.
+- 'x-accel-redirect': solo cabeceras; nginx entrega el archivo desde una
+  location `internal` (MEDIA_ACCEL_PREFIJO) y resuelve él mismo los rangos.
+- 'x-sendfile': igual con Apache mod_xsendfile / lighttpd (ruta absoluta).
+
+Solo se publican las carpetas de MEDIA_PUBLICO; los boletines en PDF, por
+ejemplo, se descargan a través de su vista con permisos.
+"""
+
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+
+# Ruta con huella de contenido: los archivos de myapp.almacen
+# (contenido/ab/<sha256>.jpg), sus derivados (derivados/contenido/ab/<sha256>_tarjeta.webp)
+# y los nombres con el hash de 12 caracteres del manifiesto (logo.3f9a1c2b7d4e.jpg).
+# Nunca cambian, se cachean un año; una subida antigua como 20240101123456.jpg
+# puede borrarse y volver a subirse con la misma URL, así que no entra.
+RE_HUELLA = re.compile(
+    r'^(?:derivados/)?contenido/[0-9a-f]{2}/[0-9a-f]{64}[._][^/]*$'
+    r'|^(?:.*/)?[^/]+\.[0-9a-f]{12}\.[^./]+$'
+)
+RE_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+UN_ANO = 365 * 24 * 60 * 60
+BLOQUE = 64 * 1024
+
+
+class _Tramo:
+    """
+    Vista de solo lectura de [inicio, inicio + longitud) de un archivo
+
+    Conserva fileno() para que gunicorn use sendfile() desde la posición
+    actual y con Content-Length como límite; sin sendfile, read() se detiene
+    al final del rango.
+    """
+
+    def __init__(self, archivo, inicio, longitud):
+        archivo.seek(inicio)
+        self.archivo = archivo
+        self.restante = longitud
+
+    def read(self, tamano=-1):
+        if tamano < 0 or tamano > self.restante:
+            tamano = self.restante
+        datos = self.archivo.read(tamano)
+        self.restante -= len(datos)
+        return datos
+
+    def fileno(self):
+        return self.archivo.fileno()
+
+    def close(self):
+        self.archivo.close()
+
+
+def _rango(cabecera, tamano):
+    """
+    Interpreta la cabecera Range
+
+    Returns:
+        tuple: (inicio, fin) inclusivo, None si no hay rango válido que aplicar
+        (se responde el archivo entero) o False si no se puede satisfacer (416)
+    """
+    # Varios rangos (bytes=0-1,5-6) no se soportan: se responde el archivo entero
+    coincidencia = RE_RANGO.match(cabecera.replace(' ', ''))
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        if not fin:
+            return None
+        # Sufijo: los últimos N bytes
+        sufijo = int(fin)
+        if sufijo == 0:
+            return False
+        return max(0, tamano - sufijo), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        return False
+    return inicio, fin
+
+
+def _ruta_publica(ruta):
+    """Ruta absoluta y normalizada del archivo, o Http404 si no existe o no es público"""
+    try:
+        absoluta = safe_join(settings.MEDIA_ROOT, ruta)
+    except SuspiciousFileOperation:
+        raise Http404
+    # La carpeta se comprueba sobre la ruta ya normalizada (noticias/../boletines)
+    relativa = os.path.relpath(absoluta, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+    if not relativa.startswith(tuple(settings.MEDIA_PUBLICO)) or relativa.endswith('.tmp'):
+        raise Http404
+    try:
+        info = os.stat(absoluta)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404
+    return absoluta, relativa, info
+
+
+def _cabeceras(response, ruta, etag, info):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(info.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    if RE_HUELLA.match(ruta):
+        patch_cache_control(response, public=True, max_age=UN_ANO, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
+
+
+@require_safe
+def servir_media(request, ruta):
+    """Entrega un archivo de MEDIA_ROOT (GET/HEAD) con validadores y rangos"""
+    absoluta, ruta, info = _ruta_publica(ruta)
+    etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+
+    # 304 con If-None-Match / If-Modified-Since
+    response = get_conditional_response(request, etag=etag, last_modified=int(info.st_mtime))
+    if response is not None:
+        return _cabeceras(response, ruta, etag, info)
+
+    tipo = mimetypes.guess_type(absoluta)[0] or 'application/octet-stream'
+    modo = settings.MEDIA_ENTREGA
+    if modo in ('x-accel-redirect', 'x-sendfile'):
+        # El servidor web entrega el cuerpo (y los rangos): el worker queda libre
+        response = HttpResponse(content_type=tipo)
+        if modo == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIJO + ruta)
+        else:
+            response['X-Sendfile'] = absoluta
+        return _cabeceras(response, ruta, etag, info)
+
+    rango = None
+    cabecera = request.headers.get('Range')
+    # If-Range: el rango solo vale si el cliente tiene la versión actual
+    if cabecera and request.headers.get('If-Range', etag) == etag:
+        rango = _rango(cabecera, info.st_size)
+    if rango is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{info.st_size}'
+        return _cabeceras(response, ruta, etag, info)
+
+    inicio, fin = rango or (0, info.st_size - 1)
+    longitud = fin - inicio + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=tipo)
+    else:
+        response = FileResponse(_Tramo(open(absoluta, 'rb'), inicio, longitud), content_type=tipo)
+        response.block_size = BLOQUE
+    response['Content-Length'] = str(longitud)
+    if rango:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{info.st_size}'
+    return _cabeceras(response, ruta, etag, info)
@@ -0,0 +1,302 @@
+"""
+MÉTRICAS - SEMARTEC
+Latencia, consultas y tamaño de respuesta por vista, agregados entre workers
+
+Cada proceso acumula en memoria y cada METRICAS_INTERVALO segundos suma sus
+valores en un archivo SQLite compartido (UPSERT), de modo que todos los workers
+de gunicorn contribuyen al mismo total. /metrics lo expone en formato Prometheus.
+"""
+
+import atexit
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+
+RE_LE = re.compile(r',?le="([^"]+)"')
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# nombre -> (tipo, ayuda)
+METRICAS = {
+    'semartec_peticiones_total': ('counter', 'Peticiones atendidas por vista, método y estado'),
+    'semartec_peticion_segundos': ('histogram', 'Latencia de la petición por vista'),
+    'semartec_consultas_db_total': ('counter', 'Consultas SQL ejecutadas por vista'),
+    'semartec_consultas_db_segundos_total': ('counter', 'Tiempo total en consultas SQL por vista'),
+    'semartec_respuesta_bytes_total': ('counter', 'Bytes de cuerpo de respuesta por vista'),
+    'semartec_pdf_build_segundos': ('histogram', 'Duración de doc.build de ReportLab por documento'),
+    'semartec_contactos_rechazados_total': ('counter', 'Líneas del buffer de contactos apartadas por inválidas'),
+    'semartec_login_fallos_total': ('counter', 'Intentos de login con credenciales incorrectas'),
+    'semartec_login_rechazos_total': ('counter', 'Intentos de login rechazados sin verificar la contraseña, por motivo'),
+    'semartec_db_pool_prestamos_total': ('counter', 'Conexiones pedidas al pool de PostgreSQL'),
+    'semartec_db_pool_esperas_total': ('counter', 'Peticiones que esperaron una conexión libre (pool saturado)'),
+    'semartec_db_pool_espera_segundos_total': ('counter', 'Tiempo total esperando una conexión del pool'),
+    'semartec_db_pool_timeouts_total': ('counter', 'Peticiones sin conexión tras DB_POOL_TIMEOUT'),
+    'semartec_db_pool_conexiones_total': ('counter', 'Intentos de abrir una conexión nueva en el pool'),
+    'semartec_db_pool_conexion_segundos_total': ('counter', 'Tiempo total abriendo conexiones nuevas'),
+    'semartec_db_pool_errores_conexion_total': ('counter', 'Intentos fallidos de abrir una conexión'),
+    'semartec_db_pool_conexiones_perdidas_total': ('counter', 'Conexiones caídas detectadas por el pool'),
+    'semartec_replica_retraso_segundos': ('histogram', 'Retraso de la réplica de lectura según el latido'),
+    'semartec_replica_errores_total': ('counter', 'Comprobaciones de la réplica que fallaron por error de base de datos'),
+    'semartec_replica_respaldos_total': ('counter', 'Lecturas públicas enviadas al primario por réplica atrasada, por motivo'),
+}
+
+# Estadísticas de psycopg_pool (pop_stats) -> (métrica, factor)
+ESTADISTICAS_POOL = {
+    'requests_num': ('semartec_db_pool_prestamos_total', 1),
+    'requests_queued': ('semartec_db_pool_esperas_total', 1),
+    'requests_wait_ms': ('semartec_db_pool_espera_segundos_total', 0.001),
+    'requests_errors': ('semartec_db_pool_timeouts_total', 1),
+    'connections_num': ('semartec_db_pool_conexiones_total', 1),
+    'connections_ms': ('semartec_db_pool_conexion_segundos_total', 0.001),
+    'connections_errors': ('semartec_db_pool_errores_conexion_total', 1),
+    'connections_lost': ('semartec_db_pool_conexiones_perdidas_total', 1),
+}
+
+_pendiente = defaultdict(float)
+_candado = threading.Lock()
+_ultimo_volcado = time.monotonic()
+_pool = None
+
+
+def _etiquetas(**etiquetas):
+    """Etiquetas en formato Prometheus con orden estable: a="1",b="2" """
+    return ','.join(
+        '%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in sorted(etiquetas.items())
+    )
+
+
+def incrementar(nombre, valor=1.0, **etiquetas):
+    """Suma `valor` al contador `nombre` con las etiquetas dadas"""
+    with _candado:
+        _pendiente[(nombre, _etiquetas(**etiquetas))] += valor
+    _volcar_si_toca()
+
+
+def observar(nombre, valor, **etiquetas):
+    """Registra una observación en el histograma `nombre`"""
+    with _candado:
+        for limite in BUCKETS_SEGUNDOS:
+            _pendiente[(f'{nombre}_bucket', _etiquetas(le=limite, **etiquetas))] += valor <= limite
+        _pendiente[(f'{nombre}_bucket', _etiquetas(le='+Inf', **etiquetas))] += 1
+        _pendiente[(f'{nombre}_sum', _etiquetas(**etiquetas))] += valor
+        _pendiente[(f'{nombre}_count', _etiquetas(**etiquetas))] += 1
+    _volcar_si_toca()
+
+
+@contextmanager
+def medir(nombre, **etiquetas):
+    """Mide la duración del bloque y la registra en el histograma `nombre`"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+
+def _conectar():
+    ruta = str(settings.METRICAS_RUTA)
+    conexion = sqlite3.connect(ruta, timeout=5)
+    conexion.execute('PRAGMA journal_mode=WAL')
+    conexion.execute(
+        'CREATE TABLE IF NOT EXISTS metricas ('
+        ' nombre TEXT NOT NULL, etiquetas TEXT NOT NULL, valor REAL NOT NULL,'
+        ' PRIMARY KEY (nombre, etiquetas))'
+    )
+    return conexion
+
+
+def _sumar_estadisticas_pool():
+    from .conexiones import pools
+
+    for alias, pool in pools():
+        estadisticas = pool.pop_stats()
+        with _candado:
+            for clave, (nombre, factor) in ESTADISTICAS_POOL.items():
+                if estadisticas.get(clave):
+                    _pendiente[(nombre, _etiquetas(bd=alias))] += estadisticas[clave] * factor
+
+
+def volcar():
+    """Suma en el almacén compartido lo acumulado por este proceso"""
+    global _ultimo_volcado
+    _sumar_estadisticas_pool()
+    with _candado:
+        filas = [(n, e, v) for (n, e), v in _pendiente.items()]
+        _pendiente.clear()
+        _ultimo_volcado = time.monotonic()
+    if not filas:
+        return
+
+    os.makedirs(os.path.dirname(str(settings.METRICAS_RUTA)), exist_ok=True)
+    conexion = _conectar()
+    try:
+        with conexion:
+            conexion.executemany(
+                'INSERT INTO metricas (nombre, etiquetas, valor) VALUES (?, ?, ?) '
+                'ON CONFLICT (nombre, etiquetas) DO UPDATE SET valor = valor + excluded.valor',
+                filas,
+            )
+    finally:
+        conexion.close()
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='volcado-metricas')
+        atexit.register(_pool.shutdown, wait=True)
+    return _pool
+
+
+def _volcar_en_segundo_plano():
+    try:
+        volcar()
+    except Exception:
+        logger.exception('Error al volcar las métricas')
+
+
+def _volcar_si_toca():
+    """
+    Programa el volcado en un hilo aparte cuando ha pasado METRICAS_INTERVALO
+
+    La petición solo suma en memoria: la escritura en SQLite (con su espera de
+    candado) no bloquea el hilo de la vista ni, bajo ASGI, el event loop.
+    """
+    global _ultimo_volcado
+    with _candado:
+        if time.monotonic() - _ultimo_volcado < settings.METRICAS_INTERVALO:
+            return
+        # Marca el volcado como hecho ya para no encolar uno por petición
+        _ultimo_volcado = time.monotonic()
+    _obtener_pool().submit(_volcar_en_segundo_plano)
+
+
+atexit.register(volcar)
+
+
+def exposicion_prometheus():
+    """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+    volcar()
+    conexion = _conectar()
+    try:
+        filas = conexion.execute(
+            'SELECT nombre, etiquetas, valor FROM metricas ORDER BY nombre, etiquetas'
+        ).fetchall()
+    finally:
+        conexion.close()
+
+    por_base = defaultdict(list)
+    for nombre, etiquetas, valor in filas:
+        base, orden = nombre, 0
+        for i, sufijo in enumerate(('_bucket', '_sum', '_count')):
+            if nombre.endswith(sufijo) and nombre[:-len(sufijo)] in METRICAS:
+                base, orden = nombre[:-len(sufijo)], i
+        # Los buckets deben listarse por `le` creciente, no en orden alfabético
+        le = RE_LE.search(etiquetas)
+        resto = RE_LE.sub('', etiquetas).strip(',')
+        clave = (resto, orden, float(le.group(1)) if le else 0.0)
+        por_base[base].append((clave, nombre, etiquetas, valor))
+
+    lineas = []
+    for base, muestras in por_base.items():
+        tipo, ayuda = METRICAS.get(base, ('untyped', ''))
+        lineas.append(f'# HELP {base} {ayuda}')
+        lineas.append(f'# TYPE {base} {tipo}')
+        for _, nombre, etiquetas, valor in sorted(muestras):
+            valor = int(valor) if valor.is_integer() else repr(valor)
+            lineas.append(f'{nombre}{{{etiquetas}}} {valor}' if etiquetas else f'{nombre} {valor}')
+    return '\n'.join(lineas) + '\n'
+
+
+class _ContadorConsultas:
+    """Observador de consultas (myapp.consultas.observar_consultas) que cuenta consultas y duración"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def anotar(self, sql, params, many, segundos):
+        self.consultas += 1
+        self.segundos += segundos
+
+
+class MetricasMiddleware:
+    """
+    Registra latencia, consultas SQL y bytes de respuesta por nombre de URL
+
+    Debe ser el primer middleware para medir también el resto de la cadena
+    (incluida la caché de páginas). Funciona en modo síncrono (WSGI) y
+    asíncrono (ASGI).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        from .consultas import observar_consultas
+
+        contador = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with observar_consultas(contador):
+            response = self.get_response(request)
+        self._registrar(request, response, time.perf_counter() - inicio, contador)
+        return response
+
+    async def __acall__(self, request):
+        from .consultas import observar_consultas
+
+        # El contador sigue al contexto: cuenta también las consultas que la
+        # vista hace en el hilo de sync_to_async, con otra conexión
+        contador = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with observar_consultas(contador):
+            response = await self.get_response(request)
+        self._registrar(request, response, time.perf_counter() - inicio, contador)
+        return response
+
+    def _vista(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match:
+            return match.view_name
+        # Respuestas que no pasan por el enrutado (WhiteNoise, redirecciones de
+        # CommonMiddleware...): se resuelve la ruta aquí
+        try:
+            return resolve(request.path_info).view_name
+        except Resolver404:
+            if request.path_info.startswith('/' + settings.STATIC_URL.lstrip('/')):
+                return 'estaticos'
+            return 'sin_ruta'
+
+    def _registrar(self, request, response, duracion, contador):
+        vista = self._vista(request)
+        if response.streaming:
+            tamano = int(response.get('Content-Length') or 0)
+        else:
+            tamano = len(response.content)
+
+        incrementar('semartec_peticiones_total', vista=vista, metodo=request.method, estado=response.status_code)
+        observar('semartec_peticion_segundos', duracion, vista=vista)
+        incrementar('semartec_consultas_db_total', contador.consultas, vista=vista)
+        incrementar('semartec_consultas_db_segundos_total', contador.segundos, vista=vista)
+        incrementar('semartec_respuesta_bytes_total', tamano, vista=vista)
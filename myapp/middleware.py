@@ -0,0 +1,298 @@
+"""
+MIDDLEWARE - SEMARTEC
+Caché de página completa para visitantes anónimos, lecturas públicas desde la
+réplica y WhiteNoise apto para ASGI
+"""
+
+import hashlib
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import urlencode
+from django.utils.translation import get_language
+
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import replicas
+from .cache import aversion_contenido, version_contenido
+
+
+# Nombres de URL públicas cuyo HTML es igual para todos los anónimos de un idioma
+PAGINAS_CACHEABLES = {
+    'inicio',
+    'avisos', 'aviso-detalle',
+    'noticias', 'noticia-detalle',
+    'colaboradores', 'colaborador-detalle',
+}
+# Únicos parámetros GET que cambian el HTML de esas páginas; el resto (utm_*,
+# fbclid, cache-busters...) no crea entradas nuevas en la caché
+PARAMETROS_CACHEABLES = ('antes', 'despues', 'pagina', 'q')
+CABECERAS_GUARDADAS = ('Content-Type', 'Content-Language', 'ETag', 'Last-Modified', 'Cache-Control')
+MARCA_CSRF = '__CSRF_TOKEN__'
+RE_CSRF = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+class CachePaginaAnonimaMiddleware:
+    """
+    Guarda el HTML de las páginas públicas para visitantes anónimos
+
+    - La llave incluye la ruta, los PARAMETROS_CACHEABLES presentes (en orden
+      fijo) y el idioma activo, por lo que debe ir después de LocaleMiddleware
+      y AuthenticationMiddleware.
+    - El token CSRF del selector de idioma de base.html se guarda como marca y
+      se sustituye en cada respuesta por un token válido para el visitante; por
+      eso debe ir después de CsrfViewMiddleware, que fija la cookie.
+    - Cada entrada recuerda la versión de contenido con la que se generó; al
+      cambiar un modelo (señales) la entrada queda obsoleta. Una entrada
+      obsoleta se sigue sirviendo durante PAGINA_CACHE_SWR segundos mientras
+      una sola petición la regenera (stale-while-revalidate).
+    - El usuario (y con él la sesión) solo se carga si la petición trae
+      cookie de sesión: un anónimo se sirve sin tocar la sesión. En modo ASGI
+      la caché se consulta con los métodos async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.ttl = getattr(settings, 'PAGINA_CACHE_TTL', 600)
+        self.swr = getattr(settings, 'PAGINA_CACHE_SWR', 60)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._aplica(request):
+            return self.get_response(request)
+
+        clave = self._clave(request)
+        entrada = cache.get(clave)
+        version = version_contenido()
+        ahora = time.time()
+
+        candado = f'{clave}:regenerando'
+        if entrada is not None:
+            if entrada['version'] == version and ahora - entrada['creada'] < self.ttl:
+                return self._servir(request, entrada, 'HIT')
+            # Obsoleta: solo una petición la regenera, las demás reciben la copia vieja
+            if not cache.add(candado, 1, 30):
+                return self._servir(request, entrada, 'STALE')
+
+        try:
+            response = self.get_response(request)
+            if self._guardable(response):
+                self._guardar(clave, response, version, ahora)
+                response['X-Cache'] = 'MISS'
+        finally:
+            if entrada is not None:
+                cache.delete(candado)
+        return response
+
+    async def __acall__(self, request):
+        if not await self._aaplica(request):
+            return await self.get_response(request)
+
+        clave = self._clave(request)
+        entrada = await cache.aget(clave)
+        version = await aversion_contenido()
+        ahora = time.time()
+
+        candado = f'{clave}:regenerando'
+        if entrada is not None:
+            if entrada['version'] == version and ahora - entrada['creada'] < self.ttl:
+                return self._servir(request, entrada, 'HIT')
+            if not await cache.aadd(candado, 1, 30):
+                return self._servir(request, entrada, 'STALE')
+
+        try:
+            response = await self.get_response(request)
+            if self._guardable(response):
+                await sync_to_async(self._guardar)(clave, response, version, ahora)
+                response['X-Cache'] = 'MISS'
+        finally:
+            if entrada is not None:
+                await cache.adelete(candado)
+        return response
+
+    def _ruta_cacheable(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        if CookieStorage.cookie_name in request.COOKIES:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        # Los aciertos no llegan a la vista; así MetricasMiddleware los etiqueta
+        request.resolver_match = match
+        return match.url_name in PAGINAS_CACHEABLES
+
+    def _aplica(self, request):
+        if not self._ruta_cacheable(request):
+            return False
+        # Sin cookie de sesión el visitante es anónimo: no hace falta cargarlo
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return True
+        return not request.user.is_authenticated
+
+    async def _aaplica(self, request):
+        if not self._ruta_cacheable(request):
+            return False
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return True
+        usuario = await request.auser()
+        return not usuario.is_authenticated
+
+    def _clave(self, request):
+        # Mismo valor que leen las vistas con request.GET.get (el último si se repite)
+        parametros = urlencode(sorted(
+            (nombre, request.GET[nombre]) for nombre in PARAMETROS_CACHEABLES if nombre in request.GET
+        ))
+        ruta = hashlib.sha256(f'{request.path_info}?{parametros}'.encode()).hexdigest()[:32]
+        return f'pagina:{get_language()}:{ruta}'
+
+    def _guardable(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and 'private' not in response.get('Cache-Control', '')
+            and 'no-store' not in response.get('Cache-Control', '')
+        )
+
+    def _guardar(self, clave, response, version, ahora):
+        contenido = RE_CSRF.sub(rf'\g<1>{MARCA_CSRF}\g<2>', response.content.decode(response.charset))
+        cache.set(clave, {
+            'version': version,
+            'creada': ahora,
+            'contenido': contenido,
+            'charset': response.charset,
+            'cabeceras': {c: response[c] for c in CABECERAS_GUARDADAS if c in response},
+        }, self.ttl + self.swr)
+
+    def _servir(self, request, entrada, estado):
+        cabeceras = entrada['cabeceras']
+        response = get_conditional_response(request, etag=cabeceras.get('ETag'))
+        if response is None:
+            contenido = entrada['contenido']
+            if MARCA_CSRF in contenido:
+                contenido = contenido.replace(MARCA_CSRF, get_token(request))
+            response = HttpResponse(contenido.encode(entrada['charset']))
+        for nombre, valor in cabeceras.items():
+            response[nombre] = valor
+        patch_vary_headers(response, ('Accept-Language', 'Cookie'))
+        response['X-Cache'] = estado
+        return response
+
+
+class ReplicaLecturaMiddleware:
+    """
+    Deja leer de la réplica (myapp.replicas) a las páginas públicas
+
+    - Solo GET/HEAD de PAGINAS_CACHEABLES y sin la cookie de lee-lo-que-escribes.
+    - Una escritura correcta de un usuario autenticado fija esa cookie durante
+      REPLICA_ADHERENCIA segundos, así el staff ve sus cambios al momento.
+    - Va después de CachePaginaAnonimaMiddleware: un acierto de caché no
+      llega aquí. Sin réplica configurada no hace nada.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replicas.replica_configurada():
+            return self.get_response(request)
+
+        token = replicas.permitir_replica(version_contenido()) if self._lectura_publica(request) else None
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                replicas.restaurar(token)
+        if self._escritura(request, response):
+            self._adherir(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not replicas.replica_configurada():
+            return await self.get_response(request)
+
+        token = replicas.permitir_replica(await aversion_contenido()) if self._lectura_publica(request) else None
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                replicas.restaurar(token)
+        if self._escritura(request, response):
+            await sync_to_async(self._adherir)(request, response)
+        return response
+
+    def _lectura_publica(self, request):
+        if request.method not in ('GET', 'HEAD') or replicas.COOKIE_PRIMARIO in request.COOKIES:
+            return False
+        try:
+            return resolve(request.path_info).url_name in PAGINAS_CACHEABLES
+        except Resolver404:
+            return False
+
+    def _escritura(self, request, response):
+        return (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and response.status_code < 400
+            and settings.SESSION_COOKIE_NAME in request.COOKIES
+        )
+
+    def _adherir(self, request, response):
+        if request.user.is_authenticated:
+            response.set_cookie(
+                replicas.COOKIE_PRIMARIO, '1', max_age=settings.REPLICA_ADHERENCIA,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+
+
+class WhiteNoiseAsincronoMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise que también funciona en modo async
+
+    WhiteNoiseMiddleware solo es síncrono; bajo ASGI Django pasaría cada
+    petición (también las dinámicas) por un hilo al cruzarlo. Aquí solo los
+    archivos estáticos se sirven en un hilo y el resto sigue en el event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
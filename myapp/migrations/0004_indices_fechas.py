@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_alter_contactos_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aviso',
+            index=models.Index(fields=['-fecha_publicacion', '-id_aviso'], name='aviso_fecha_pub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactos',
+            index=models.Index(fields=['-fecha_envio', '-id_contactos'], name='contactos_fecha_envio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='noticia',
+            index=models.Index(fields=['-fecha_publicacion', '-id_noticia'], name='noticia_fecha_pub_idx'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Índices de búsqueda de texto completo para avisos y noticias.
+# PostgreSQL: columna tsvector generada + índice GIN.
+# SQLite: tabla virtual FTS5 de contenido externo sincronizada con triggers.
+#
+# Ojo en SQLite: una migración futura que reconstruya myapp_aviso o
+# myapp_noticia (p. ej. AlterField) elimina los triggers junto con la tabla
+# vieja; en ese caso hay que volver a crearlos en la misma migración.
+
+from django.db import migrations
+
+
+TABLAS = [
+    ('myapp_aviso', 'id_aviso'),
+    ('myapp_noticia', 'id_noticia'),
+]
+
+
+def _sql_postgresql(tabla, pk):
+    return [
+        f"""
+        ALTER TABLE {tabla} ADD COLUMN busqueda tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('spanish', coalesce(titulo, '')), 'A') ||
+            setweight(to_tsvector('spanish', coalesce(descripcion, '')), 'B')
+        ) STORED
+        """,
+        f"CREATE INDEX {tabla}_busqueda_gin ON {tabla} USING GIN (busqueda)",
+    ]
+
+
+def _sql_sqlite(tabla, pk):
+    fts = f'{tabla}_fts'
+    return [
+        f"""
+        CREATE VIRTUAL TABLE {fts} USING fts5(
+            titulo, descripcion,
+            content='{tabla}', content_rowid='{pk}',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        f"""
+        CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabla} BEGIN
+            INSERT INTO {fts}(rowid, titulo, descripcion)
+            VALUES (new.{pk}, new.titulo, new.descripcion);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabla} BEGIN
+            INSERT INTO {fts}({fts}, rowid, titulo, descripcion)
+            VALUES ('delete', old.{pk}, old.titulo, old.descripcion);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {fts}_au AFTER UPDATE ON {tabla} BEGIN
+            INSERT INTO {fts}({fts}, rowid, titulo, descripcion)
+            VALUES ('delete', old.{pk}, old.titulo, old.descripcion);
+            INSERT INTO {fts}(rowid, titulo, descripcion)
+            VALUES (new.{pk}, new.titulo, new.descripcion);
+        END
+        """,
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def crear_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla, pk in TABLAS:
+        if vendor == 'postgresql':
+            sentencias = _sql_postgresql(tabla, pk)
+        elif vendor == 'sqlite':
+            sentencias = _sql_sqlite(tabla, pk)
+        else:
+            return
+        for sql in sentencias:
+            schema_editor.execute(sql)
+
+
+def eliminar_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla, pk in TABLAS:
+        if vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_busqueda_gin')
+            schema_editor.execute(f'ALTER TABLE {tabla} DROP COLUMN IF EXISTS busqueda')
+        elif vendor == 'sqlite':
+            for sufijo in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {tabla}_fts_{sufijo}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {tabla}_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_trabajopdf'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
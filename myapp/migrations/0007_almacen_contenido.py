@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:49
+
+import myapp.almacen
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_busqueda_texto'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='colaborador',
+            name='fotografia',
+            field=models.ImageField(blank=True, null=True, storage=myapp.almacen.almacen_contenido, upload_to='colaboradores/'),
+        ),
+        migrations.AlterField(
+            model_name='noticia',
+            name='fotografia',
+            field=models.ImageField(blank=True, null=True, storage=myapp.almacen.almacen_contenido, upload_to='noticias/'),
+        ),
+    ]
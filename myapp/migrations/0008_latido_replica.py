@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:03
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def crear_latido(apps, schema_editor):
+    LatidoReplica = apps.get_model('myapp', 'LatidoReplica')
+    LatidoReplica.objects.using(schema_editor.connection.alias).get_or_create(pk=1, defaults={'marca': timezone.now()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_almacen_contenido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatidoReplica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marca', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(crear_latido, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# En SQLite, los AlterField de 0007 reconstruyen myapp_noticia y la tabla
+# vieja se lleva los triggers de FTS5 creados en 0006: las noticias nuevas o
+# editadas dejaban de aparecer en la búsqueda. Se vuelven a crear y se
+# reconstruye el índice con las filas que se quedaron fuera.
+
+from django.db import migrations
+
+
+TABLAS = [
+    ('myapp_aviso', 'id_aviso'),
+    ('myapp_noticia', 'id_noticia'),
+]
+
+
+# Copia de los triggers de 0006: una migración no debe importar otra, que
+# puede renombrarse o desaparecer al hacer squash
+def _sql_triggers(tabla, pk):
+    fts = f'{tabla}_fts'
+    return [
+        f"""
+        CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabla} BEGIN
+            INSERT INTO {fts}(rowid, titulo, descripcion)
+            VALUES (new.{pk}, new.titulo, new.descripcion);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabla} BEGIN
+            INSERT INTO {fts}({fts}, rowid, titulo, descripcion)
+            VALUES ('delete', old.{pk}, old.titulo, old.descripcion);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {fts}_au AFTER UPDATE ON {tabla} BEGIN
+            INSERT INTO {fts}({fts}, rowid, titulo, descripcion)
+            VALUES ('delete', old.{pk}, old.titulo, old.descripcion);
+            INSERT INTO {fts}(rowid, titulo, descripcion)
+            VALUES (new.{pk}, new.titulo, new.descripcion);
+        END
+        """,
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def recrear_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for tabla, pk in TABLAS:
+        # myapp_aviso los conserva; se recrean igual por si una base vieja los perdió
+        for sufijo in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {tabla}_fts_{sufijo}')
+        for sql in _sql_triggers(tabla, pk):
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_latido_replica'),
+    ]
+
+    operations = [
+        migrations.RunPython(recrear_triggers, migrations.RunPython.noop),
+    ]
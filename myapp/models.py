@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from datetime import timedelta
 
+from .almacen import almacen_contenido
+from .retencion import TAMANO_LOTE, eliminar_por_lotes
+
 # Tabla Avisos
 
 class Aviso(models.Model):
@@ -10,6 +14,11 @@ class Aviso(models.Model):
     descripcion = models.TextField(verbose_name='Descripción o contenido del aviso')
     fecha_publicacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de publicación')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-fecha_publicacion', '-id_aviso'], name='aviso_fecha_pub_idx'),
+        ]
+
     def __str__(self):
         return self.titulo
 
@@ -20,7 +29,12 @@ class Noticia(models.Model):
     titulo = models.CharField(max_length=200)
     descripcion = models.TextField()
     fecha_publicacion = models.DateTimeField(auto_now_add=True)
-    fotografia = models.ImageField(upload_to='noticias/', blank=True, null=True)
+    fotografia = models.ImageField(upload_to='noticias/', storage=almacen_contenido, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-fecha_publicacion', '-id_noticia'], name='noticia_fecha_pub_idx'),
+        ]
 
     def __str__(self):
         return self.titulo
@@ -31,7 +45,7 @@ class Colaborador(models.Model):
     id_colaborador = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=200)
     descripcion = models.TextField()
-    fotografia = models.ImageField(upload_to='colaboradores/', blank=True, null=True)
+    fotografia = models.ImageField(upload_to='colaboradores/', storage=almacen_contenido, blank=True, null=True)
     
     class Meta:
         db_table = 'myapp_colaborador'
@@ -51,27 +65,95 @@ class Contactos(models.Model):
     
     class Meta:
         ordering = ['-fecha_envio']
+        indexes = [
+            models.Index(fields=['-fecha_envio', '-id_contactos'], name='contactos_fecha_envio_idx'),
+        ]
     
     def __str__(self):                               
         return self.nombre
     
     @classmethod
-    def limpiar_antiguos(cls, dias=30):
+    def limpiar_antiguos(cls, dias=30, tamano_lote=TAMANO_LOTE, pausa=0.0):
         """
         Elimina automáticamente los registros de contactos más antiguos de 30 días
         
         Args:
             dias (int): Número de días a mantener (por defecto 30)
+            tamano_lote (int): Registros eliminados por transacción
+            pausa (float): Segundos de espera entre lotes
         
         Returns:
-            tuple: (número de registros eliminados, diccionario con detalles)
+            int: número de registros eliminados
+        """
+        return cls.limpiar_antiguos_detalle(dias, tamano_lote, pausa)['eliminados']
+    
+    @classmethod
+    def limpiar_antiguos_detalle(cls, dias=30, tamano_lote=TAMANO_LOTE, pausa=0.0, simular=False):
+        """
+        Igual que limpiar_antiguos, pero devuelve el diccionario con detalles
+        (eliminados, lotes, segundos, por_segundo) de eliminar_por_lotes
         """
         fecha_limite = timezone.now() - timedelta(days=dias)
         contactos_antiguos = cls.objects.filter(fecha_envio__lt=fecha_limite)
-        cantidad = contactos_antiguos.count()
-        
-        if cantidad > 0:
-            contactos_antiguos.delete()
-        
-        return cantidad
+        return eliminar_por_lotes(contactos_antiguos, tamano_lote, pausa, simular)
+
+
+# Tabla Trabajos PDF (cola de generación en segundo plano)
+
+class TrabajoPDF(models.Model):
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    TERMINADO = 'terminado'
+    ERROR = 'error'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (TERMINADO, 'Terminado'),
+        (ERROR, 'Error'),
+    ]
+
+    id_trabajo = models.AutoField(primary_key=True)
+    tipo = models.CharField(max_length=30, default='boletin')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    archivo = models.FileField(upload_to='boletines/', blank=True, null=True)
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True
+    )
+    fecha_solicitud = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+    duracion_render = models.FloatField(blank=True, null=True, verbose_name='Duración del render (s)')
+    error = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'fecha_solicitud'], name='trabajopdf_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.tipo} #{self.pk} ({self.estado})'
+
+    @classmethod
+    def limpiar_antiguos_detalle(cls, dias=7, tamano_lote=TAMANO_LOTE, pausa=0.0, simular=False):
+        """
+        Elimina en lotes los trabajos terminados o fallidos de hace más de `dias`
+        días; sus PDF se borran del storage con la señal post_delete
+
+        Returns:
+            dict: detalles de eliminar_por_lotes
+        """
+        fecha_limite = timezone.now() - timedelta(days=dias)
+        antiguos = cls.objects.filter(estado__in=[cls.TERMINADO, cls.ERROR], fecha_solicitud__lt=fecha_limite)
+        return eliminar_por_lotes(antiguos, tamano_lote, pausa, simular)
+
+
+class LatidoReplica(models.Model):
+    """
+    Fila única que el primario actualiza cada pocos segundos (myapp.replicas)
+
+    Su valor leído en la réplica indica hasta qué momento llegó la replicación.
+    """
+    marca = models.DateTimeField()
+
+    def __str__(self):
+        return f'Latido {self.marca:%Y-%m-%d %H:%M:%S}'
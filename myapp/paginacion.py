@@ -0,0 +1,156 @@
+"""
+PAGINACIÓN POR CURSOR (KEYSET) - SEMARTEC
+Pagina listados ordenados de forma descendente sin usar OFFSET
+"""
+
+import base64
+import binascii
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+TAMANO_PAGINA = 12
+
+
+def _codificar_cursor(valores):
+    """Serializa los valores de la llave de orden en un cursor seguro para URLs"""
+    crudo = '|'.join(
+        v.isoformat() if hasattr(v, 'isoformat') else str(v) for v in valores
+    )
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor, model, campos):
+    """Convierte un cursor en la tupla de valores tipados, o None si es inválido"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        partes = base64.urlsafe_b64decode(cursor + relleno).decode().split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if len(partes) != len(campos):
+        return None
+
+    valores = []
+    for campo, crudo in zip(campos, partes):
+        field = model._meta.pk if campo == 'pk' else model._meta.get_field(campo)
+        try:
+            valor = field.to_python(crudo)
+        except ValidationError:
+            return None
+        if valor is None:
+            return None
+        valores.append(valor)
+    return tuple(valores)
+
+
+def filtro_keyset(campos, valores, operador):
+    """
+    Construye la condición lexicográfica (a, b) < (x, y) para la llave de orden
+
+    La cota redundante sobre el primer campo (a <= x) permite al motor iniciar
+    la búsqueda directamente en el índice compuesto en lugar de recorrerlo
+    desde el principio.
+    """
+    condicion = Q()
+    igualdad = {}
+    for campo, valor in zip(campos, valores):
+        condicion |= Q(**igualdad, **{f'{campo}__{operador}': valor})
+        igualdad[campo] = valor
+    return Q(**{f'{campos[0]}__{operador}e': valores[0]}) & condicion
+
+
+class PaginaKeyset:
+    """Página de resultados con cursores hacia la página siguiente y anterior"""
+
+    def __init__(self, object_list, campos, tiene_siguiente, tiene_anterior):
+        self.object_list = object_list
+        self.campos = campos
+        self.tiene_siguiente = tiene_siguiente
+        self.tiene_anterior = tiene_anterior
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _cursor(self, obj):
+        return _codificar_cursor(getattr(obj, campo) for campo in self.campos)
+
+    @property
+    def cursor_siguiente(self):
+        if self.tiene_siguiente and self.object_list:
+            return self._cursor(self.object_list[-1])
+        return None
+
+    @property
+    def cursor_anterior(self):
+        if self.tiene_anterior and self.object_list:
+            return self._cursor(self.object_list[0])
+        return None
+
+
+def _consulta_pagina(request, queryset, campos, tamano):
+    """
+    Queryset limitado de la página pedida (sin evaluar)
+
+    Returns:
+        tuple: (queryset, hacia_atras, tiene_anterior)
+    """
+    model = queryset.model
+    despues = request.GET.get('despues')
+    antes = request.GET.get('antes')
+
+    if antes:
+        valores = _decodificar_cursor(antes, model, campos)
+        if valores is not None:
+            consulta = queryset.filter(filtro_keyset(campos, valores, 'gt')).order_by(*campos)
+            return consulta[:tamano + 1], True, True
+
+    orden = [f'-{campo}' for campo in campos]
+    tiene_anterior = False
+    if despues:
+        valores = _decodificar_cursor(despues, model, campos)
+        if valores is not None:
+            queryset = queryset.filter(filtro_keyset(campos, valores, 'lt'))
+            tiene_anterior = True
+    return queryset.order_by(*orden)[:tamano + 1], False, tiene_anterior
+
+
+def _armar_pagina(filas, campos, tamano, hacia_atras, tiene_anterior):
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if hacia_atras:
+        # Se leyó en orden ascendente: `hay_mas` indica que existe otra página anterior
+        filas.reverse()
+        return PaginaKeyset(filas, campos, True, hay_mas)
+    return PaginaKeyset(filas, campos, hay_mas, tiene_anterior)
+
+
+def paginar_keyset(request, queryset, campos, tamano=TAMANO_PAGINA):
+    """
+    Pagina un queryset en orden descendente por `campos` usando cursores
+
+    La página se selecciona con los parámetros GET `despues` (página siguiente)
+    o `antes` (página anterior). El costo de cada página depende solo de
+    `tamano`, sin importar qué tan profunda sea en la tabla.
+
+    Args:
+        request: petición HTTP con los parámetros del cursor
+        queryset: queryset base sin ordenar
+        campos (tuple): llave de orden única, p. ej. ('fecha_publicacion', 'pk')
+        tamano (int): número de registros por página
+
+    Returns:
+        PaginaKeyset: registros de la página y cursores de navegación
+    """
+    consulta, hacia_atras, tiene_anterior = _consulta_pagina(request, queryset, campos, tamano)
+    return _armar_pagina(list(consulta), campos, tamano, hacia_atras, tiene_anterior)
+
+
+async def apaginar_keyset(request, queryset, campos, tamano=TAMANO_PAGINA):
+    """Versión asíncrona de paginar_keyset para vistas async (ORM asíncrono)"""
+    consulta, hacia_atras, tiene_anterior = _consulta_pagina(request, queryset, campos, tamano)
+    filas = [obj async for obj in consulta]
+    return _armar_pagina(filas, campos, tamano, hacia_atras, tiene_anterior)
@@ -0,0 +1,346 @@
+"""
+GENERADOR DE PDF - SEMARTEC
+Boletín informativo y relación de contactos con ReportLab
+
+Este módulo importa ReportLab al cargarse; las vistas y el worker de trabajos
+lo importan solo al generar un PDF para no cargarlo en cada arranque.
+"""
+
+from datetime import datetime
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import KeepTogether, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+
+from .models import Aviso, Noticia, Colaborador, Contactos
+from .metricas import medir
+
+
+# ==================== UTILIDADES ====================
+
+def _truncate_text(text, max_length=100):
+    """Trunca texto a un máximo de caracteres, cortando en espacios"""
+    if len(text) <= max_length:
+        return text
+    truncated = text[:max_length].rsplit(' ', 1)[0]
+    return truncated + "..."
+
+
+# ==================== BOLETÍN ====================
+
+def construir_boletin_pdf(destino):
+    """Escribe en `destino` (archivo o buffer) el boletín con avisos, noticias y colaboradores"""
+    doc = SimpleDocTemplate(destino, pagesize=letter, 
+                           rightMargin=0.4*inch, leftMargin=0.4*inch,
+                           topMargin=0.75*inch, bottomMargin=0.75*inch)
+    
+    story = []
+    styles = getSampleStyleSheet()
+    
+    # Estilos personalizados
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#008080'),
+        spaceAfter=12,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    
+    section_style = ParagraphStyle(
+        'SectionTitle',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#008080'),
+        spaceAfter=10,
+        spaceBefore=10,
+        fontName='Helvetica-Bold',
+        borderColor=colors.HexColor('#008080'),
+        borderWidth=1,
+        borderPadding=5
+    )
+    
+    body_style = ParagraphStyle(
+        'BodyText',
+        parent=styles['BodyText'],
+        fontSize=10,
+        alignment=TA_JUSTIFY,
+        spaceAfter=8
+    )
+    
+    # Estilo para celdas de tabla - ajuste automático de ancho
+    cell_style = ParagraphStyle(
+        'CellText',
+        parent=styles['BodyText'],
+        fontSize=6.5,
+        alignment=TA_LEFT,
+        spaceAfter=0,
+        leading=8,
+        wordWrap='CJK'
+    )
+    
+    # Título
+    story.append(Paragraph("BOLETÍN INFORMATIVO SEMARTEC", title_style))
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Fecha
+    fecha_actual = datetime.now().strftime("%d de %B de %Y - %H:%M")
+    story.append(Paragraph(f"<b>Fecha:</b> {fecha_actual}", body_style))
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Estilos de tabla - con altura fija de fila
+    table_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#008080')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 7.5),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
+        ('TOPPADDING', (0, 0), (-1, 0), 4),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('FONTSIZE', (0, 1), (-1, -1), 6),
+        ('TOPPADDING', (0, 1), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 2),
+        ('LEFTPADDING', (0, 0), (-1, -1), 3),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+        ('ROWHEIGHTS', (0, 0), (-1, -1), 20),
+    ]
+    
+    # Sección AVISOS
+    story.append(Paragraph("📢 AVISOS", section_style))
+    avisos = Aviso.objects.all().order_by('-fecha_publicacion')[:10]
+    
+    if avisos.exists():
+        avisos_data = [['Título', 'Descripción', 'Fecha']]
+        for aviso in avisos:
+            fecha_str = aviso.fecha_publicacion.strftime("%d/%m/%Y") if aviso.fecha_publicacion else "N/A"
+            # Truncar fuertemente a 60 caracteres
+            titulo = _truncate_text(aviso.titulo, 20)
+            desc = _truncate_text(aviso.descripcion, 40)
+            avisos_data.append([titulo, desc, fecha_str])
+        
+        table = Table(avisos_data, colWidths=[1.0*inch, 3.0*inch, 0.9*inch])
+        table.setStyle(TableStyle(table_style))
+        story.append(table)
+    else:
+        story.append(Paragraph("<i>No hay avisos registrados</i>", body_style))
+    
+    story.append(Spacer(1, 0.25*inch))
+    
+    # Sección NOTICIAS
+    story.append(Paragraph("📰 NOTICIAS", section_style))
+    noticias = Noticia.objects.all().order_by('-fecha_publicacion')[:10]
+    
+    if noticias.exists():
+        noticias_data = [['Título', 'Descripción', 'Fecha']]
+        for noticia in noticias:
+            fecha_str = noticia.fecha_publicacion.strftime("%d/%m/%Y") if noticia.fecha_publicacion else "N/A"
+            titulo = _truncate_text(noticia.titulo, 20)
+            desc = _truncate_text(noticia.descripcion, 40)
+            noticias_data.append([titulo, desc, fecha_str])
+        
+        table = Table(noticias_data, colWidths=[1.0*inch, 3.0*inch, 0.9*inch])
+        table.setStyle(TableStyle(table_style))
+        story.append(table)
+    else:
+        story.append(Paragraph("<i>No hay noticias registradas</i>", body_style))
+    
+    story.append(Spacer(1, 0.25*inch))
+    
+    # Sección COLABORADORES
+    story.append(Paragraph("👥 EQUIPO DE COLABORADORES", section_style))
+    colaboradores = Colaborador.objects.all()
+    
+    if colaboradores.exists():
+        colabs_data = [['Nombre', 'Descripción']]
+        for colab in colaboradores:
+            nombre = _truncate_text(colab.nombre, 20)
+            desc = _truncate_text(colab.descripcion, 40)
+            colabs_data.append([nombre, desc])
+        
+        table = Table(colabs_data, colWidths=[1.3*inch, 4.6*inch])
+        table.setStyle(TableStyle(table_style))
+        story.append(table)
+    else:
+        story.append(Paragraph("<i>No hay colaboradores registrados</i>", body_style))
+    
+    # Pie de página
+    story.append(Spacer(1, 0.3*inch))
+    story.append(Paragraph("_" * 80, body_style))
+    story.append(Paragraph(
+        "<i>Este boletín fue generado automáticamente por el sistema SEMARTEC. "
+        "Contiene información confidencial de la organización.</i>",
+        body_style
+    ))
+    
+    # Construir PDF
+    with medir('semartec_pdf_build_segundos', documento='boletin'):
+        doc.build(story)
+
+
+# ==================== RELACIÓN DE CONTACTOS ====================
+
+class _FlowablesPerezosos(list):
+    """
+    Lista de flowables que se llena bajo demanda desde un generador
+
+    `doc.build` consume la historia desde el frente de la lista; al entregar
+    los elementos conforme se piden, solo hay en memoria los que se están
+    maquetando en la página actual.
+
+    Como no hay elementos por delante, `keepWithNext` no tiene efecto: lo que
+    deba ir junto se entrega ya agrupado en un KeepTogether.
+    """
+
+    def __init__(self, generador):
+        super().__init__()
+        self._generador = generador
+
+    def _llenar(self, cantidad):
+        while super().__len__() < cantidad:
+            try:
+                self.append(next(self._generador))
+            except StopIteration:
+                break
+
+    def __len__(self):
+        self._llenar(1)
+        return super().__len__()
+
+    def __getitem__(self, indice):
+        if isinstance(indice, int) and indice >= 0:
+            self._llenar(indice + 1)
+        return super().__getitem__(indice)
+
+
+FILAS_POR_TABLA = 40  # Filas por bloque de tabla (aprox. una página carta)
+
+
+def _con_cabecera(cabecera, flowable):
+    """Agrupa la cabecera pendiente con el primer flowable que le sigue"""
+    if not cabecera:
+        return flowable
+    return KeepTogether([*cabecera, flowable])
+
+
+def _historia_contactos(title_style, body_style, table_style):
+    """Genera los flowables del PDF de contactos recorriendo la tabla por bloques"""
+    # Título y fecha: se entregan con el primer bloque para no quedar solos
+    # al pie de una página (ver _FlowablesPerezosos)
+    fecha_actual = datetime.now().strftime("%d de %B de %Y - %H:%M")
+    cabecera = [
+        Paragraph("RELACIÓN DE CONTACTOS", title_style),
+        Spacer(1, 0.2*inch),
+        Paragraph(f"<b>Fecha:</b> {fecha_actual}", body_style),
+        Spacer(1, 0.2*inch),
+    ]
+    
+    # Recorrer los contactos sin cargarlos todos en memoria
+    encabezado = ['Nombre', 'Número', 'Email', 'Fecha']
+    contactos = (
+        Contactos.objects.order_by('-fecha_envio')
+        .values_list('nombre', 'numero', 'email', 'fecha_envio')
+        .iterator(chunk_size=2000)
+    )
+    
+    total = 0
+    bloque = [encabezado]
+    for nombre, numero, email, fecha_envio in contactos:
+        fecha_str = fecha_envio.strftime("%d/%m/%Y %H:%M") if fecha_envio else "N/A"
+        bloque.append([
+            _truncate_text(nombre, 20),
+            _truncate_text(numero, 15),
+            _truncate_text(email or '', 35),
+            fecha_str
+        ])
+        total += 1
+        
+        if len(bloque) > FILAS_POR_TABLA:
+            yield _con_cabecera(cabecera, _tabla_contactos(bloque, table_style))
+            cabecera = []
+            bloque = [encabezado]
+    
+    if len(bloque) > 1:
+        yield _con_cabecera(cabecera, _tabla_contactos(bloque, table_style))
+        cabecera = []
+    
+    if total:
+        # Información de resumen
+        yield Spacer(1, 0.3*inch)
+        yield Paragraph(f"<b>Total de contactos:</b> {total}", body_style)
+    else:
+        yield _con_cabecera(cabecera, Paragraph("<i>No hay contactos registrados</i>", body_style))
+    
+    # Pie de página
+    yield Spacer(1, 0.4*inch)
+    yield Paragraph("_" * 80, body_style)
+    yield Paragraph(
+        "<i>Este documento fue generado automáticamente por el sistema SEMARTEC. "
+        "Contiene información confidencial de la organización.</i>",
+        body_style
+    )
+
+
+def _tabla_contactos(filas, table_style):
+    """Crea un bloque de tabla de contactos con el encabezado repetido"""
+    table = Table(filas, colWidths=[2*inch, 1.0*inch, 2.5*inch, 1*inch], repeatRows=1)
+    table.setStyle(TableStyle(table_style))
+    return table
+
+
+def construir_contactos_pdf(destino):
+    """Escribe en `destino` la relación de contactos con memoria acotada"""
+    doc = SimpleDocTemplate(destino, pagesize=letter, 
+                           rightMargin=0.4*inch, leftMargin=0.4*inch,
+                           topMargin=0.75*inch, bottomMargin=0.75*inch)
+    
+    styles = getSampleStyleSheet()
+    
+    # Estilos personalizados
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#008080'),
+        spaceAfter=12,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    
+    body_style = ParagraphStyle(
+        'BodyText',
+        parent=styles['BodyText'],
+        fontSize=10,
+        alignment=TA_JUSTIFY,
+        spaceAfter=8
+    )
+    
+    # Estilos de tabla - mejorado para evitar que texto sobrepase celdas
+    table_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#008080')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('TOPPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('FONTSIZE', (0, 1), (-1, -1), 7),
+        ('TOPPADDING', (0, 1), (-1, -1), 5),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 5),
+        ('LEFTPADDING', (0, 0), (-1, -1), 4),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+    ]
+    
+    # Construir PDF
+    with medir('semartec_pdf_build_segundos', documento='contactos'):
+        doc.build(_FlowablesPerezosos(_historia_contactos(title_style, body_style, table_style)))
@@ -0,0 +1,93 @@
+"""
+PLANTILLAS JINJA2 - SEMARTEC
+Entorno Jinja2 de las páginas públicas (myapp/jinja2/)
+
+Jinja2 compila cada plantilla a una función de Python, así que base.html y sus
+decenas de traducciones y URLs cuestan menos CPU por render que recorrer los
+nodos de DTL. Las plantillas de myapp/jinja2/ son copias de las de
+myapp/templates/ con la sintaxis de Jinja2: un cambio en una página pública se
+hace en las dos (las pruebas comparan el texto visible de ambas).
+
+Equivalencias:
+    {% trans "x" %}            {{ _("x") }}
+    {% blocktrans %}           {% trans %}...{% endtrans %} (mismo msgid)
+    {% url 'a' pk %}           {{ url('a', pk) }}
+    {% static 'x' %}           {{ static('x') }}
+    {% csrf_token %}           {{ csrf_input }}
+    {% now "Y" %}              {{ now("Y") }}
+    |date:"d/m/Y"              |date("d/m/Y")
+"""
+
+import os
+from datetime import datetime
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.template.defaultfilters import date, linebreaksbr, truncatechars, urlencode
+from django.templatetags.static import static
+from django.urls import get_script_prefix, get_urlconf, reverse
+from django.utils import timezone, translation
+from jinja2 import Environment, FileSystemBytecodeCache
+
+from .templatetags.imagenes import imagen_estatica, imagen_responsiva
+
+
+def url(nombre, *args, **kwargs):
+    """
+    Equivalente de {% url %}, memorizado: base.html resuelve las mismas URL en
+    cada render y reverse() cuesta decenas de µs (el sitio no usa i18n_patterns,
+    así que la URL solo depende del urlconf y del prefijo)
+    """
+    return _reverse(get_urlconf(), get_script_prefix(), nombre, args, tuple(sorted(kwargs.items())))
+
+
+@lru_cache(maxsize=1024)
+def _reverse(urlconf, prefijo, nombre, args, kwargs):
+    return reverse(nombre, urlconf=urlconf, args=args or None, kwargs=dict(kwargs) or None)
+
+
+def _limpiar_urls(setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        _reverse.cache_clear()
+
+
+setting_changed.connect(_limpiar_urls)
+
+
+def gettext(mensaje):
+    """gettext memorizado por idioma: base.html traduce decenas de textos fijos por render"""
+    return _traduccion(translation.get_language(), mensaje)
+
+
+@lru_cache(maxsize=4096)
+def _traduccion(idioma, mensaje):
+    return translation.gettext(mensaje)
+
+
+def now(formato):
+    """Equivalente de {% now %}"""
+    return date(datetime.now(tz=timezone.get_current_timezone() if settings.USE_TZ else None), formato)
+
+
+def entorno(**opciones):
+    """Environment de Jinja2 con i18n, static/url, filtros de Django y bytecode en disco"""
+    os.makedirs(settings.JINJA2_BYTECODE_DIR, exist_ok=True)
+    opciones.setdefault('bytecode_cache', FileSystemBytecodeCache(settings.JINJA2_BYTECODE_DIR))
+    opciones.setdefault('extensions', ['jinja2.ext.i18n'])
+    env = Environment(**opciones)
+    env.install_gettext_callables(gettext, translation.ngettext, newstyle=True)
+    env.globals.update({
+        'static': static,
+        'url': url,
+        'now': now,
+        'imagen_estatica': imagen_estatica,
+        'imagen_responsiva': imagen_responsiva,
+    })
+    env.filters.update({
+        'date': date,
+        'linebreaksbr': linebreaksbr,
+        'truncatechars': truncatechars,
+        'urlencode': urlencode,
+    })
+    return env
@@ -0,0 +1,536 @@
+"""
+RENDIMIENTO - SEMARTEC
+Datos sintéticos reproducibles y medición de todas las rutas de myapp.urls
+"""
+
+import json
+import os
+import platform
+import random
+import resource
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from .cache import invalidar_contenido
+from .models import Aviso, Noticia, Colaborador, Contactos, TrabajoPDF
+
+
+# ==================== DATOS SINTÉTICOS ====================
+
+ESCALAS = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+LOTE_INSERCION = 5_000
+DIAS_HISTORIA = 60
+
+PALABRAS = (
+    'servicio social residencia profesional convocatoria inscripción beca '
+    'semestre laboratorio taller conferencia congreso proyecto tecnológico '
+    'ingeniería sistemas industrial mecatrónica biblioteca evaluación docente '
+    'estudiantes egresados titulación calendario vacaciones reunión academia '
+    'investigación innovación emprendimiento deportes cultura feria empleo'
+).split()
+
+
+def _texto(rng, minimo, maximo):
+    return ' '.join(rng.choice(PALABRAS) for _ in range(rng.randint(minimo, maximo)))
+
+
+def _fecha(rng, ahora):
+    return ahora - timedelta(seconds=rng.randint(0, DIAS_HISTORIA * 86400))
+
+
+@contextmanager
+def _fechas_explicitas(model, campo):
+    """Desactiva auto_now_add para que bulk_create respete la fecha asignada"""
+    field = model._meta.get_field(campo)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _insertar(model, fabrica, cantidad):
+    """Inserta `cantidad` objetos en lotes sin mantenerlos todos en memoria"""
+    for inicio in range(0, cantidad, LOTE_INSERCION):
+        fin = min(inicio + LOTE_INSERCION, cantidad)
+        model.objects.bulk_create([fabrica(i) for i in range(inicio, fin)], batch_size=LOTE_INSERCION)
+
+
+def generar_imagenes_muestra(cantidad, semilla):
+    """
+    Escribe `cantidad` JPEG deterministas en noticias/ y colaboradores/
+
+    Returns:
+        list: nombres en el storage, alternando entre ambas carpetas
+    """
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(semilla)
+    nombres = []
+    for i in range(cantidad):
+        carpeta = 'noticias' if i % 2 == 0 else 'colaboradores'
+        imagen = Image.new('RGB', (1600, 1200), tuple(rng.randrange(256) for _ in range(3)))
+        dibujo = ImageDraw.Draw(imagen)
+        for _ in range(12):
+            x, y = rng.randrange(1400), rng.randrange(1000)
+            dibujo.rectangle((x, y, x + 200, y + 200), fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = BytesIO()
+        imagen.save(buffer, format='JPEG', quality=85)
+        nombre = f'{carpeta}/muestra_{i:03d}.jpg'
+        if default_storage.exists(nombre):
+            default_storage.delete(nombre)
+        nombres.append(default_storage.save(nombre, ContentFile(buffer.getvalue())))
+    return nombres
+
+
+def generar_datos(avisos, noticias, contactos, colaboradores, semilla=2024, imagenes=()):
+    """
+    Inserta datos sintéticos con bulk_create
+
+    Con la misma semilla el contenido es idéntico; las fechas se reparten en
+    los últimos DIAS_HISTORIA días contados desde el momento de la generación,
+    así que cerca de la mitad de los contactos cae fuera de la retención.
+
+    Args:
+        imagenes (list): nombres en el storage asignados en rotación a noticias
+            y colaboradores; vacío para registros sin fotografía
+
+    Returns:
+        dict: registros insertados por modelo
+    """
+    rng = random.Random(semilla)
+    ahora = timezone.now()
+    fotos = {
+        'noticias': [n for n in imagenes if n.startswith('noticias/')],
+        'colaboradores': [n for n in imagenes if n.startswith('colaboradores/')],
+    }
+
+    def foto(carpeta, i):
+        nombres = fotos[carpeta]
+        return nombres[i % len(nombres)] if nombres and i % 3 == 0 else None
+
+    with transaction.atomic():
+        with _fechas_explicitas(Aviso, 'fecha_publicacion'):
+            _insertar(Aviso, lambda i: Aviso(
+                titulo=_texto(rng, 3, 8).capitalize(),
+                descripcion=_texto(rng, 30, 120),
+                fecha_publicacion=_fecha(rng, ahora),
+            ), avisos)
+        with _fechas_explicitas(Noticia, 'fecha_publicacion'):
+            _insertar(Noticia, lambda i: Noticia(
+                titulo=_texto(rng, 3, 8).capitalize(),
+                descripcion=_texto(rng, 60, 250),
+                fecha_publicacion=_fecha(rng, ahora),
+                fotografia=foto('noticias', i),
+            ), noticias)
+        _insertar(Colaborador, lambda i: Colaborador(
+            nombre=f'Colaborador {i:06d}',
+            descripcion=_texto(rng, 20, 60),
+            fotografia=foto('colaboradores', i),
+        ), colaboradores)
+        with _fechas_explicitas(Contactos, 'fecha_envio'):
+            _insertar(Contactos, lambda i: Contactos(
+                nombre=f'Persona {i:07d}',
+                numero=f'55{rng.randrange(10**8):08d}',
+                email=f'persona{i}@ejemplo.com' if i % 10 else None,
+                mensaje=_texto(rng, 10, 60),
+                fecha_envio=_fecha(rng, ahora),
+            ), contactos)
+
+    # bulk_create no emite post_save: se invalida la caché de contenido a mano
+    invalidar_contenido()
+    return {
+        'avisos': avisos,
+        'noticias': noticias,
+        'colaboradores': colaboradores,
+        'contactos': contactos,
+    }
+
+
+# ==================== MEDICIÓN DE RUTAS ====================
+
+# usuario: 'anonimo', 'staff' o 'desechable' (sesión nueva por petición, p. ej. logout)
+# muta: la petición se ejecuta en un savepoint que se revierte para que cada
+#       repetición haga el mismo trabajo
+Caso = namedtuple(
+    'Caso', 'url_name metodo usuario modelo query datos muta',
+    defaults=('GET', 'anonimo', None, None, None, False),
+)
+
+_CONTACTO = {'nombre': 'Benchmark', 'numero': '5550000000', 'email': 'b@ejemplo.com', 'mensaje': 'Prueba de carga'}
+
+CASOS = [
+    Caso('inicio'),
+    Caso('login'),
+    Caso('logout', usuario='desechable'),
+    Caso('buscar', query={'q': 'convocatoria beca'}),
+
+    Caso('avisos'),
+    Caso('aviso-detalle', modelo=Aviso),
+    Caso('aviso-crear', usuario='staff'),
+    Caso('aviso-editar', usuario='staff', modelo=Aviso),
+    Caso('aviso-eliminar', usuario='staff', modelo=Aviso),
+    Caso('admin-avisos', usuario='staff'),
+
+    Caso('noticias'),
+    Caso('noticia-detalle', modelo=Noticia),
+    Caso('noticia-crear', usuario='staff'),
+    Caso('noticia-editar', usuario='staff', modelo=Noticia),
+    Caso('noticia-eliminar', usuario='staff', modelo=Noticia),
+    Caso('admin-noticias', usuario='staff'),
+
+    Caso('colaboradores'),
+    Caso('colaborador-detalle', modelo=Colaborador),
+    Caso('colaborador-crear', usuario='staff'),
+    Caso('colaborador-editar', usuario='staff', modelo=Colaborador),
+    Caso('colaborador-eliminar', usuario='staff', modelo=Colaborador),
+    Caso('admin-colaboradores', usuario='staff'),
+
+    Caso('contactos-crear'),
+    Caso('contactos-crear', metodo='POST', datos=_CONTACTO, muta=True),
+    Caso('contactos-detalle', usuario='staff', modelo=Contactos),
+    Caso('contactos-editar', usuario='staff', modelo=Contactos),
+    Caso('contactos-eliminar', usuario='staff', modelo=Contactos),
+    Caso('admin-contactos', usuario='staff'),
+    Caso('limpiar-contactos', usuario='staff', muta=True),
+
+    Caso('inicio-admin', usuario='staff'),
+    Caso('generar-pdf', usuario='staff'),
+    Caso('generar-contactos-pdf', usuario='staff'),
+    Caso('boletin-solicitar', metodo='POST', usuario='staff', muta=True),
+    Caso('boletin-estado', usuario='staff', modelo=TrabajoPDF),
+    Caso('boletin-descargar', usuario='staff', modelo=TrabajoPDF),
+    Caso('metricas', usuario='staff'),
+]
+
+
+def etiqueta(caso):
+    return caso.url_name if caso.metodo == 'GET' else f'{caso.url_name} {caso.metodo}'
+
+
+def rutas_sin_caso():
+    """Nombres de URL de myapp.urls que no tienen un caso de medición"""
+    from . import urls
+
+    cubiertas = {caso.url_name for caso in CASOS}
+    return sorted(
+        p.name for p in urls.urlpatterns
+        if isinstance(p, URLPattern) and p.name and p.name not in cubiertas
+    )
+
+
+def _percentil(valores, p):
+    """Percentil por rango más cercano"""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def _consumir(response):
+    """
+    Lee el cuerpo completo para que el tiempo incluya respuestas en streaming
+
+    El cliente de pruebas cierra la respuesta al agotar el iterador; cerrarla
+    otra vez dispararía close_old_connections dentro de la transacción.
+    """
+    if response.streaming:
+        b''.join(response.streaming_content)
+
+
+class _Medidor:
+    """Ejecuta los casos con clientes anónimo y staff compartidos"""
+
+    def __init__(self, staff, fria):
+        self.staff = staff
+        self.fria = fria
+        self.clientes = {'anonimo': Client(), 'staff': Client()}
+        self.clientes['staff'].force_login(staff)
+
+    def _cliente(self, caso):
+        if caso.usuario != 'desechable':
+            return self.clientes[caso.usuario]
+        cliente = Client()
+        cliente.force_login(self.staff)
+        return cliente
+
+    def url(self, caso):
+        args = []
+        if caso.modelo is not None:
+            pk = caso.modelo.objects.order_by('-pk').values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            args = [pk]
+        return reverse(caso.url_name, args=args)
+
+    def peticion(self, caso, url):
+        """Hace una petición y devuelve (estado, segundos, consultas)"""
+        cliente = self._cliente(caso)
+        if self.fria:
+            cache.clear()
+        metodo = cliente.post if caso.metodo == 'POST' else cliente.get
+        # El savepoint queda fuera de la captura para no contarlo como consulta
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                response = metodo(url, caso.datos or caso.query or {})
+                _consumir(response)
+                segundos = time.perf_counter() - inicio
+            if caso.muta:
+                transaction.set_rollback(True)
+        return response.status_code, segundos, len(consultas)
+
+    def medir(self, caso, repeticiones):
+        url = self.url(caso)
+        if url is None:
+            return {'omitida': 'sin registros'}
+
+        self.peticion(caso, url)  # calentamiento
+        estados, tiempos, consultas = set(), [], []
+        for _ in range(repeticiones):
+            estado, segundos, n = self.peticion(caso, url)
+            estados.add(estado)
+            tiempos.append(segundos)
+            consultas.append(n)
+
+        tracemalloc.start()
+        try:
+            self.peticion(caso, url)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'estado': max(estados),
+            'p50_ms': round(_percentil(tiempos, 50) * 1000, 2),
+            'p95_ms': round(_percentil(tiempos, 95) * 1000, 2),
+            'consultas': max(consultas),
+            'memoria_kb': round(pico / 1024),
+        }
+
+
+def conteo_datos():
+    return {
+        'avisos': Aviso.objects.count(),
+        'noticias': Noticia.objects.count(),
+        'colaboradores': Colaborador.objects.count(),
+        'contactos': Contactos.objects.count(),
+    }
+
+
+def ejecutar_benchmark(repeticiones=20, fria=False, filtro=None, progreso=None):
+    """
+    Mide cada caso de CASOS sobre los datos actuales sin modificarlos
+
+    Todo se ejecuta dentro de una transacción que se revierte al final (el
+    usuario staff y el trabajo de boletín que se crean son temporales). Los
+    archivos que se escriban en el storage durante la medición se eliminan.
+
+    Args:
+        repeticiones (int): peticiones medidas por caso, tras una de calentamiento
+        fria (bool): vacía la caché antes de cada petición para medir las vistas
+            sin la caché de páginas ni la del boletín
+        filtro (str): solo mide los casos cuya etiqueta contenga este texto
+        progreso (callable): recibe (etiqueta, resultado) al terminar cada caso
+
+    Returns:
+        dict: {'meta': {...}, 'rutas': {etiqueta: resultado}}
+    """
+    from .trabajos import ejecutar, encolar_boletin
+
+    resultados = {}
+    meta = {
+        'fecha': timezone.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'motor': connection.vendor,
+        'repeticiones': repeticiones,
+        'fria': fria,
+        'datos': conteo_datos(),
+    }
+    boletines_previos = set(TrabajoPDF.objects.exclude(archivo='').values_list('archivo', flat=True))
+    archivos_nuevos = []
+
+    try:
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CONTACTOS_RAFAGA=10 ** 9,
+            CONTACTOS_INGESTA_BUFFER=False,
+        ), transaction.atomic():
+            staff = User.objects.create_user(
+                f'benchmark_{os.getpid()}', password=None, is_staff=True,
+            )
+            trabajo = ejecutar(encolar_boletin(staff))
+            if trabajo.archivo:
+                archivos_nuevos.append(trabajo.archivo.name)
+
+            medidor = _Medidor(staff, fria)
+            for caso in CASOS:
+                nombre = etiqueta(caso)
+                if filtro and filtro not in nombre:
+                    continue
+                resultados[nombre] = medidor.medir(caso, repeticiones)
+                if progreso:
+                    progreso(nombre, resultados[nombre])
+
+            archivos_nuevos.extend(
+                nombre for nombre in TrabajoPDF.objects.exclude(archivo='').values_list('archivo', flat=True)
+                if nombre not in boletines_previos
+            )
+            transaction.set_rollback(True)
+    finally:
+        for nombre in set(archivos_nuevos):
+            default_storage.delete(nombre)
+        cache.clear()
+
+    # ru_maxrss está en KiB en Linux
+    meta['rss_max_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'meta': meta, 'rutas': resultados}
+
+
+# ==================== MOTORES DE PLANTILLAS ====================
+
+PLANTILLAS_PUBLICAS = (
+    'inicio.html', 'avisos.html', 'noticias.html', 'colaboradores.html',
+    'aviso_detail.html', 'noticia_detail.html', 'colaborador_detail.html',
+)
+
+
+def motores_plantillas():
+    """(DTL, Jinja2) configurados; Jinja2 se construye aunque PLANTILLAS_JINJA2 esté apagado"""
+    from django.template import engines
+    from django.template.backends.jinja2 import Jinja2
+    from django.template.utils import InvalidTemplateEngineError
+
+    dtl = engines['django']
+    try:
+        jinja = engines['jinja2']
+    except InvalidTemplateEngineError:
+        jinja = Jinja2({
+            'NAME': 'jinja2', 'DIRS': [settings.BASE_DIR / 'myapp' / 'jinja2'], 'APP_DIRS': False,
+            'OPTIONS': {
+                'environment': 'myapp.plantillas_jinja.entorno',
+                'context_processors': dtl.engine.context_processors,
+            },
+        })
+    return dtl, jinja
+
+
+def _contextos_plantillas():
+    """
+    Contexto de cada página pública con una página completa de registros sin
+    guardar: se mide el render, no la base de datos ni los archivos
+    """
+    from .paginacion import TAMANO_PAGINA
+
+    rng = random.Random(2024)
+    ahora = timezone.now()
+    avisos = [Aviso(pk=i, titulo=_texto(rng, 3, 8), descripcion=_texto(rng, 30, 80), fecha_publicacion=_fecha(rng, ahora))
+              for i in range(1, TAMANO_PAGINA + 1)]
+    noticias = [Noticia(pk=i, titulo=_texto(rng, 3, 8), descripcion=_texto(rng, 30, 80), fecha_publicacion=_fecha(rng, ahora))
+                for i in range(1, TAMANO_PAGINA + 1)]
+    colaboradores = [Colaborador(pk=i, nombre=_texto(rng, 2, 3), descripcion=_texto(rng, 10, 30))
+                     for i in range(1, TAMANO_PAGINA + 1)]
+    return {
+        'inicio.html': {},
+        'avisos.html': {'avisos': avisos, 'pagina': None},
+        'noticias.html': {'noticias': noticias, 'pagina': None},
+        'colaboradores.html': {'colaboradores': colaboradores, 'pagina': None},
+        'aviso_detail.html': {'aviso': avisos[0], 'object': avisos[0]},
+        'noticia_detail.html': {'noticia': noticias[0], 'object': noticias[0]},
+        'colaborador_detail.html': {'colaborador': colaboradores[0], 'object': colaboradores[0]},
+    }
+
+
+def medir_plantillas(repeticiones=200, plantillas=PLANTILLAS_PUBLICAS):
+    """
+    Tiempo de CPU por render de cada página pública con DTL y con Jinja2
+
+    Se renderiza con una petición anónima (como las que llegan sin caché) y
+    la plantilla ya cargada: el costo de compilar se paga una vez por proceso.
+
+    Returns:
+        dict: {plantilla: {'dtl_us': mediana, 'jinja2_us': mediana, 'aceleracion': dtl/jinja2}}
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    request.session = {}
+    contextos = _contextos_plantillas()
+    resultados = {}
+    for nombre in plantillas:
+        medianas = {}
+        for clave, motor in zip(('dtl_us', 'jinja2_us'), motores_plantillas()):
+            plantilla = motor.get_template(nombre)
+            plantilla.render(dict(contextos[nombre]), request)  # calentamiento
+            tiempos = []
+            for _ in range(repeticiones):
+                contexto = dict(contextos[nombre])
+                inicio = time.process_time()
+                plantilla.render(contexto, request)
+                tiempos.append(time.process_time() - inicio)
+            medianas[clave] = round(_percentil(tiempos, 50) * 1_000_000, 1)
+        medianas['aceleracion'] = round(medianas['dtl_us'] / max(medianas['jinja2_us'], 0.1), 2)
+        resultados[nombre] = medianas
+    return resultados
+
+
+# ==================== COMPARACIÓN CON LA LÍNEA BASE ====================
+
+def guardar_base(resultado, ruta):
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def cargar_base(ruta):
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def comparar(resultado, base, tolerancia=0.25, margen_ms=5.0, margen_kb=256):
+    """
+    Compara un resultado contra la línea base
+
+    Una ruta regresa si hace más consultas que en la base, si su p95 crece más
+    que `tolerancia` (y más de `margen_ms`, para ignorar el ruido de rutas muy
+    rápidas) o si su pico de memoria crece más que `tolerancia` y `margen_kb`.
+
+    Returns:
+        list: descripción de cada regresión encontrada
+    """
+    regresiones = []
+    for nombre, actual in resultado['rutas'].items():
+        previo = base['rutas'].get(nombre)
+        if not previo or 'omitida' in actual or 'omitida' in previo:
+            continue
+        if actual['consultas'] > previo['consultas']:
+            regresiones.append(f"{nombre}: {actual['consultas']} consultas (base {previo['consultas']})")
+        limite_ms = max(previo['p95_ms'] * (1 + tolerancia), previo['p95_ms'] + margen_ms)
+        if actual['p95_ms'] > limite_ms:
+            regresiones.append(f"{nombre}: p95 {actual['p95_ms']} ms (base {previo['p95_ms']} ms)")
+        limite_kb = max(previo['memoria_kb'] * (1 + tolerancia), previo['memoria_kb'] + margen_kb)
+        if actual['memoria_kb'] > limite_kb:
+            regresiones.append(f"{nombre}: memoria {actual['memoria_kb']} KiB (base {previo['memoria_kb']} KiB)")
+    return regresiones
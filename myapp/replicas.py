@@ -0,0 +1,154 @@
+"""
+RÉPLICA DE LECTURA - SEMARTEC
+Router que manda las lecturas de las páginas públicas a DATABASE_REPLICA_URL
+
+- Solo leen de la réplica las vistas públicas GET que marca
+  ReplicaLecturaMiddleware (myapp.middleware); todo lo demás, y toda
+  escritura, va al primario ('default').
+- Lee-lo-que-escribes: tras una escritura de un usuario autenticado el
+  middleware fija una cookie y ese navegador lee del primario durante
+  REPLICA_ADHERENCIA segundos.
+- Retraso: el primario actualiza LatidoReplica cada REPLICA_COMPROBACION
+  segundos y se lee la marca que tiene la réplica. Si la réplica no responde,
+  va más de REPLICA_RETRASO_MAXIMO segundos atrás o todavía no tiene la última
+  modificación de contenido (la versión de myapp.cache), se lee del primario;
+  así las cachés de página no se regeneran con datos viejos.
+
+Sin réplica configurada el router no hace nada. En local se puede probar con
+dos SQLite: DATABASE_REPLICA_URL=sqlite:///var/replica.sqlite3 y
+`manage.py sincronizar_replica` para copiar el primario.
+"""
+
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+from .metricas import incrementar, observar
+
+
+ALIAS_REPLICA = 'replica'
+COOKIE_PRIMARIO = 'semartec_primario'
+# La versión de contenido se fija en post_save, antes del COMMIT: se exige un
+# latido al menos este margen posterior para no leer antes de que la
+# escritura se confirme
+MARGEN_VERSION_NS = 1_000_000_000
+
+# Versión de contenido vigente al empezar la petición, o None si la petición
+# no puede leer de la réplica
+_version_lectura = ContextVar('version_lectura', default=None)
+_estado = {'comprobado': None, 'marca_ns': None}
+_candado = threading.Lock()
+
+
+def replica_configurada():
+    return ALIAS_REPLICA in connections
+
+
+def permitir_replica(version):
+    """Marca la petición actual como de solo lectura pública (devuelve el token para reset)"""
+    return _version_lectura.set(version)
+
+
+def restaurar(token):
+    _version_lectura.reset(token)
+
+
+def _comprobar():
+    """Actualiza el latido en el primario y lee el de la réplica"""
+    from .models import LatidoReplica
+
+    ahora = timezone.now()
+    try:
+        if not LatidoReplica.objects.using(DEFAULT_DB_ALIAS).filter(pk=1).update(marca=ahora):
+            LatidoReplica.objects.using(DEFAULT_DB_ALIAS).create(pk=1, marca=ahora)
+        marca = LatidoReplica.objects.using(ALIAS_REPLICA).values_list('marca', flat=True).first()
+    except DatabaseError:
+        incrementar('semartec_replica_errores_total')
+        return None
+    if marca is None:
+        return None
+    observar('semartec_replica_retraso_segundos', (ahora - marca).total_seconds())
+    return int(marca.timestamp() * 1_000_000_000)
+
+
+def marca_replica():
+    """
+    Instante (ns) hasta el que llegó la replicación, o None si no se sabe
+
+    Se comprueba como mucho cada REPLICA_COMPROBACION segundos por proceso.
+    """
+    with _candado:
+        comprobado = _estado['comprobado']
+        if comprobado is None or time.monotonic() - comprobado >= settings.REPLICA_COMPROBACION:
+            _estado['marca_ns'] = _comprobar()
+            _estado['comprobado'] = time.monotonic()
+        return _estado['marca_ns']
+
+
+def olvidar_estado():
+    """Fuerza una comprobación nueva en la siguiente lectura"""
+    with _candado:
+        _estado['comprobado'] = None
+
+
+def replica_al_dia(version):
+    """La réplica responde, va poco atrasada y ya tiene la versión de contenido `version`"""
+    marca = marca_replica()
+    if marca is None:
+        return False
+    if time.time_ns() - marca > settings.REPLICA_RETRASO_MAXIMO * 1_000_000_000:
+        incrementar('semartec_replica_respaldos_total', motivo='retraso')
+        return False
+    if marca < version + MARGEN_VERSION_NS:
+        incrementar('semartec_replica_respaldos_total', motivo='version')
+        return False
+    return True
+
+
+def sincronizar_sqlite(origen=DEFAULT_DB_ALIAS, destino=ALIAS_REPLICA):
+    """
+    Copia la base SQLite del primario sobre la de la réplica (replicación en local)
+
+    Fuera de una transacción: la copia espera a que el primario no tenga
+    escrituras sin confirmar en esta misma conexión y nunca terminaría.
+    """
+    for alias in (origen, destino):
+        if connections[alias].vendor != 'sqlite':
+            raise ValueError(f"'{alias}' no es SQLite: la replicación real la hace el servidor")
+        connections[alias].ensure_connection()
+    connections[origen].connection.backup(connections[destino].connection)
+    olvidar_estado()
+
+
+class RouterReplica:
+    """DATABASE_ROUTERS: lecturas públicas a la réplica, el resto al primario"""
+
+    def db_for_read(self, model, **hints):
+        version = _version_lectura.get()
+        if version is None or not replica_configurada():
+            return None
+        if replica_al_dia(version):
+            return ALIAS_REPLICA
+        # Sin réplica útil, el resto de la petición ya no la vuelve a comprobar
+        _version_lectura.set(None)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mismos datos en ambas bases: un objeto leído de la réplica puede
+        # relacionarse con uno del primario
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, ALIAS_REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación
+        if db == ALIAS_REPLICA:
+            return False
+        return None
@@ -0,0 +1,63 @@
+"""
+RETENCIÓN DE DATOS - SEMARTEC
+Eliminación de registros en lotes acotados por llave primaria
+"""
+
+import time
+
+from django.db import transaction
+
+
+TAMANO_LOTE = 1000
+
+
+def eliminar_por_lotes(queryset, tamano_lote=TAMANO_LOTE, pausa=0.0, simular=False):
+    """
+    Elimina los registros de `queryset` en lotes de `tamano_lote` llaves primarias
+
+    Cada lote es una transacción corta con un único DELETE ... WHERE pk IN (...),
+    así que la tabla nunca queda bloqueada durante toda la limpieza ni se cargan
+    todos los registros en memoria. Entre lotes se puede dormir `pausa` segundos
+    para ceder la base de datos al tráfico normal.
+
+    Args:
+        queryset: registros a eliminar
+        tamano_lote (int): máximo de registros por transacción
+        pausa (float): segundos de espera entre lotes
+        simular (bool): solo cuenta los registros, sin eliminarlos
+
+    Returns:
+        dict: eliminados, lotes, segundos y registros por segundo
+    """
+    inicio = time.perf_counter()
+    eliminados = 0
+    lotes = 0
+    ultimo_pk = None
+
+    while True:
+        lote = queryset.order_by('pk')
+        if ultimo_pk is not None:
+            lote = lote.filter(pk__gt=ultimo_pk)
+        pks = list(lote.values_list('pk', flat=True)[:tamano_lote])
+        if not pks:
+            break
+
+        if not simular:
+            with transaction.atomic():
+                queryset.model._base_manager.filter(pk__in=pks).delete()
+        eliminados += len(pks)
+        lotes += 1
+        ultimo_pk = pks[-1]
+
+        if len(pks) < tamano_lote:
+            break
+        if pausa:
+            time.sleep(pausa)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'eliminados': eliminados,
+        'lotes': lotes,
+        'segundos': segundos,
+        'por_segundo': eliminados / segundos if segundos else 0.0,
+    }
@@ -0,0 +1,63 @@
+"""
+SEÑALES - SEMARTEC
+Invalida la caché de contenido público cuando el staff modifica los modelos,
+libera las fotografías que dejan de usarse y borra los boletines eliminados
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .almacen import liberar
+from .cache import invalidar_contenido
+from .models import Aviso, Noticia, Colaborador, TrabajoPDF
+
+
+@receiver(post_save, sender=Aviso)
+@receiver(post_save, sender=Noticia)
+@receiver(post_save, sender=Colaborador)
+@receiver(post_delete, sender=Aviso)
+@receiver(post_delete, sender=Noticia)
+@receiver(post_delete, sender=Colaborador)
+def invalidar_cache_contenido(sender, **kwargs):
+    """Cambia la versión del contenido tras crear, editar o eliminar un registro"""
+    invalidar_contenido()
+
+
+@receiver(pre_save, sender=Noticia)
+@receiver(pre_save, sender=Colaborador)
+def recordar_fotografia_anterior(sender, instance, update_fields=None, **kwargs):
+    """Guarda el nombre de la fotografía actual antes de que la edición la cambie"""
+    instance._fotografia_anterior = None
+    if instance._state.adding or (update_fields is not None and 'fotografia' not in update_fields):
+        return
+    instance._fotografia_anterior = (
+        sender.objects.filter(pk=instance.pk).values_list('fotografia', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Noticia)
+@receiver(post_save, sender=Colaborador)
+def liberar_fotografia_reemplazada(sender, instance, **kwargs):
+    """Libera la fotografía anterior si se cambió o quitó y nadie más la usa"""
+    anterior = getattr(instance, '_fotografia_anterior', None)
+    if anterior and anterior != instance.fotografia.name:
+        transaction.on_commit(lambda: liberar(anterior))
+
+
+@receiver(post_delete, sender=Noticia)
+@receiver(post_delete, sender=Colaborador)
+def liberar_fotografia_eliminada(sender, instance, **kwargs):
+    """Libera la fotografía de la fila eliminada si nadie más la usa"""
+    nombre = instance.fotografia.name
+    if nombre:
+        transaction.on_commit(lambda: liberar(nombre))
+
+
+@receiver(post_delete, sender=TrabajoPDF)
+def eliminar_pdf_trabajo(sender, instance, **kwargs):
+    """Borra del storage el PDF del trabajo eliminado (p. ej. por la retención)"""
+    archivo = instance.archivo
+    if archivo:
+        storage, nombre = archivo.storage, archivo.name
+        transaction.on_commit(lambda: storage.delete(nombre))
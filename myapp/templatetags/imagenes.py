@@ -0,0 +1,88 @@
+"""
+Etiquetas de plantilla para imágenes responsivas
+Uso: {% load imagenes %} {% imagen_responsiva n.fotografia alt=n.titulo sizes="33vw" %}
+     {% imagen_estatica "img/valores.jpg" alt="Valores" sizes="180px" %}
+"""
+
+from django import template
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from myapp.estaticos import variantes
+from myapp.imagenes import TAMANOS, anchos_derivados, nombre_derivado
+
+register = template.Library()
+
+
+def _srcset(nombre, extension, anchos):
+    """
+    srcset con el ancho real de cada derivado; si una imagen pequeña dio
+    varios derivados del mismo ancho solo se anuncia el primero
+    """
+    vistos = set()
+    candidatos = []
+    for tamano in TAMANOS:
+        ancho = anchos.get(tamano)
+        if ancho is None or ancho in vistos:
+            continue
+        vistos.add(ancho)
+        candidatos.append(f'{default_storage.url(nombre_derivado(nombre, tamano, extension))} {ancho}w')
+    return ', '.join(candidatos)
+
+
+@register.simple_tag
+def imagen_responsiva(campo, alt='', clase='', estilo='', sizes='100vw', tamano='tarjeta'):
+    """
+    Emite un <picture> con srcset WebP y respaldo JPEG para un ImageField
+
+    Si la imagen todavía no tiene derivados se usa el archivo original. Los
+    anchos vienen de la caché (myapp.imagenes.anchos_derivados): el render no
+    consulta el storage.
+    """
+    if not campo:
+        return ''
+
+    nombre = campo.name
+    anchos = anchos_derivados(nombre)
+    if tamano not in anchos:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy" decoding="async">',
+            campo.url, alt, clase, estilo,
+        )
+
+    return format_html(
+        '<picture style="display: contents;">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" style="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(nombre, 'webp', anchos), sizes,
+        default_storage.url(nombre_derivado(nombre, tamano, 'jpg')), _srcset(nombre, 'jpg', anchos), sizes,
+        alt, clase, estilo,
+    )
+
+
+@register.simple_tag
+def imagen_estatica(ruta, alt='', clase='', sizes='100vw'):
+    """
+    Emite un <picture> con las variantes AVIF y WebP que generó collectstatic
+    (myapp.estaticos) y el original como respaldo
+
+    Sin manifiesto (desarrollo, pruebas) se emite solo el <img> del original.
+    """
+    por_formato = variantes(ruta)
+    imagen = format_html(
+        '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+        static(ruta), alt, clase,
+    )
+    if not por_formato:
+        return imagen
+
+    fuentes = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        (
+            (formato, ', '.join(f'{static(nombre)} {ancho}w' for ancho, nombre in lista), sizes)
+            for formato, lista in por_formato.items()
+        ),
+    )
+    return format_html('<picture style="display: contents;">{}{}</picture>', fuentes, imagen)
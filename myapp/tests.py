@@ -1,3 +1,1341 @@
-from django.test import TestCase
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from itertools import chain
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.checks import run_checks
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.template import engines
+from django.template.loader import get_template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from .almacen import almacen_contenido
+from .busqueda import buscar
+from .cache import CLAVE_VERSION, aultimos_inicio, boletin_cacheado, huella_boletin
+from .consultas import RegistroConsultas, limite_consultas
+from .estaticos import minificar_css, variantes
+from .imagenes import generar_derivados, ruta_manifiesto
+from .ingesta import encolar_contacto, vaciar_buffer
+from .limites import consumir_token, espera_login, registrar_fallo_login
+from .metricas import exposicion_prometheus
+from .middleware import MARCA_CSRF, CachePaginaAnonimaMiddleware
+from .paginacion import filtro_keyset, paginar_keyset
+from .models import Aviso, Noticia, Colaborador, Contactos, LatidoReplica, TrabajoPDF
+from .rendimiento import (
+    CASOS, PLANTILLAS_PUBLICAS, _contextos_plantillas, comparar, conteo_datos, ejecutar_benchmark, etiqueta,
+    generar_datos, medir_plantillas, motores_plantillas, rutas_sin_caso,
+)
+from .replicas import ALIAS_REPLICA, COOKIE_PRIMARIO, MARGEN_VERSION_NS, olvidar_estado, sincronizar_sqlite
+from . import trabajos
+from .trabajos import (
+    LATIDO_MAXIMO_SEGUNDOS, TIEMPO_MAXIMO_PROCESANDO, ejecutar, encolar_boletin, iniciar_worker_local,
+    procesar_pendientes, registrar_latido, tomar_siguiente, worker_activo,
+)
+
+
+# Máximo de consultas por ruta con la caché vacía (peor caso). Con la caché
+# vacía la sesión de staff (cached_db) suma 2 consultas, sesión y usuario; con
+# la sesión ya en caché, solo el usuario. Subir un límite debe justificarse.
+PRESUPUESTO_CONSULTAS = {
+    'inicio': 3,
+    'login': 0,
+    'logout': 4,
+    'buscar': 2,
+    'avisos': 2,
+    'aviso-detalle': 1,
+    'aviso-crear': 2,
+    'aviso-editar': 3,
+    'aviso-eliminar': 3,
+    'admin-avisos': 4,
+    'noticias': 2,
+    'noticia-detalle': 1,
+    'noticia-crear': 2,
+    'noticia-editar': 3,
+    'noticia-eliminar': 3,
+    'admin-noticias': 4,
+    'colaboradores': 2,
+    'colaborador-detalle': 1,
+    'colaborador-crear': 2,
+    'colaborador-editar': 3,
+    'colaborador-eliminar': 3,
+    'admin-colaboradores': 4,
+    'contactos-crear': 0,
+    'contactos-crear POST': 1,
+    'contactos-detalle': 3,
+    'contactos-editar': 3,
+    'contactos-eliminar': 3,
+    'admin-contactos': 4,
+    'limpiar-contactos': 4,
+    'inicio-admin': 2,
+    'generar-pdf': 9,
+    'generar-contactos-pdf': 3,
+    'boletin-solicitar POST': 3,
+    'boletin-estado': 3,
+    'boletin-descargar': 3,
+    'metricas': 2,
+}
+
+
+class GenerarDatosTests(TestCase):
+    def _titulos(self):
+        return list(Aviso.objects.order_by('pk').values_list('titulo', flat=True))
+
+    def test_misma_semilla_mismos_datos(self):
+        generar_datos(avisos=20, noticias=5, contactos=5, colaboradores=2, semilla=7)
+        primera = self._titulos()
+        Aviso.objects.all().delete()
+        generar_datos(avisos=20, noticias=5, contactos=5, colaboradores=2, semilla=7)
+        self.assertEqual(primera, self._titulos())
+
+    def test_cantidades_y_fechas_repartidas(self):
+        insertados = generar_datos(avisos=10, noticias=10, contactos=50, colaboradores=3)
+        self.assertEqual(insertados, conteo_datos())
+        fechas = set(Contactos.objects.values_list('fecha_envio', flat=True))
+        self.assertGreater(len(fechas), 1)
+
+
+class BenchmarkTests(TestCase):
+    def test_todas_las_rutas_tienen_caso(self):
+        self.assertEqual(rutas_sin_caso(), [])
+
+    def test_recorrido_sin_errores_ni_cambios(self):
+        generar_datos(avisos=15, noticias=15, contactos=15, colaboradores=3)
+        antes = conteo_datos()
+        resultado = ejecutar_benchmark(repeticiones=1)
+
+        for nombre, r in resultado['rutas'].items():
+            with self.subTest(ruta=nombre):
+                self.assertNotIn('omitida', r)
+                self.assertLess(r['estado'], 500)
+        self.assertEqual(conteo_datos(), antes)
+        self.assertEqual(
+            (Aviso.objects.count(), Noticia.objects.count(), Colaborador.objects.count()),
+            (15, 15, 3),
+        )
+
+    def test_comparar_detecta_regresiones(self):
+        base = {'rutas': {'avisos': {'p95_ms': 10.0, 'consultas': 2, 'memoria_kb': 100}}}
+        igual = {'rutas': {'avisos': {'p95_ms': 11.0, 'consultas': 2, 'memoria_kb': 120}}}
+        peor = {'rutas': {'avisos': {'p95_ms': 40.0, 'consultas': 3, 'memoria_kb': 100}}}
+        self.assertEqual(comparar(igual, base), [])
+        self.assertEqual(len(comparar(peor, base)), 2)
+
+
+class PresupuestoConsultasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_datos(avisos=30, noticias=30, contactos=30, colaboradores=30)
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+
+    def setUp(self):
+        self.trabajo = ejecutar(encolar_boletin(self.staff))
+        self.addCleanup(self.trabajo.archivo.delete, save=False)
+
+    def test_todas_las_rutas_tienen_presupuesto(self):
+        self.assertEqual({etiqueta(caso) for caso in CASOS}, set(PRESUPUESTO_CONSULTAS))
+
+    def test_presupuesto_por_ruta(self):
+        for caso in CASOS:
+            nombre = etiqueta(caso)
+            with self.subTest(ruta=nombre):
+                if caso.usuario != 'anonimo':
+                    self.client.force_login(self.staff)
+                args = []
+                if caso.modelo is not None:
+                    args = [caso.modelo.objects.order_by('-pk').values_list('pk', flat=True).first()]
+                url = reverse(caso.url_name, args=args)
+                metodo = self.client.post if caso.metodo == 'POST' else self.client.get
+                cache.clear()
+
+                with transaction.atomic():
+                    with limite_consultas(PRESUPUESTO_CONSULTAS[nombre]):
+                        response = metodo(url, caso.datos or caso.query or {})
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                    transaction.set_rollback(True)
+                self.assertLess(response.status_code, 400)
+                self.client.logout()
+
+
+class _Fila:
+    def __init__(self, pk):
+        self.pk = pk
+
+    def total(self):
+        return Aviso.objects.filter(pk=self.pk).count()
+
+
+class DeteccionConsultasTests(TestCase):
+    def test_detecta_n_mas_1_con_su_origen(self):
+        generar_datos(avisos=5, noticias=0, contactos=0, colaboradores=0)
+        filas = [_Fila(pk) for pk in Aviso.objects.values_list('pk', flat=True)]
+        plantilla = engines['django'].from_string('{% for f in filas %}\n{{ f.total }}{% endfor %}')
+
+        with RegistroConsultas() as registro:
+            plantilla.render({'filas': filas})
+        hallazgo, = registro.hallazgos()
+        self.assertEqual((hallazgo.tipo, hallazgo.veces), ('n+1', 5))
+        self.assertIn('myapp/tests.py', hallazgo.origen)
+        self.assertTrue(hallazgo.plantilla.endswith(':2'))
+
+    def test_limite_falla_con_duplicadas(self):
+        with self.assertRaisesMessage(AssertionError, 'consultas repetidas'):
+            with limite_consultas(5):
+                Aviso.objects.count()
+                Aviso.objects.count()
+        with self.assertRaisesMessage(AssertionError, '2 consultas, el máximo es 1'):
+            with limite_consultas(1, permitir_repetidas=True):
+                Aviso.objects.count()
+                Aviso.objects.count()
+
+
+class VistasAsincronasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generar_datos(avisos=15, noticias=15, contactos=0, colaboradores=5)
+
+    async def test_paginas_publicas_por_asgi(self):
+        aviso = await Aviso.objects.alatest('pk')
+        for url in ('/', '/avisos/', '/noticias/', '/colaboradores/', f'/avisos/{aviso.pk}/'):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+        response = await self.async_client.get(f'/avisos/{aviso.pk}/', headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get('/avisos/0/')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(DEBUG=True)
+    async def test_consultas_contadas_por_asgi(self):
+        # La vista async consulta desde el hilo de sync_to_async, con otra
+        # conexión que la del event loop donde corren los middlewares
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+
+        def contadas():
+            muestra = re.search(r'^semartec_consultas_db_total\{vista="avisos"\} (\d+)$', exposicion_prometheus(), re.M)
+            return int(muestra.group(1)) if muestra else 0
+
+        with self.settings(METRICAS_RUTA=os.path.join(directorio.name, 'metricas.sqlite3')):
+            await cache.aclear()
+            antes = contadas()
+            response = await self.async_client.get('/avisos/')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(response['X-Consultas'], '2')
+            self.assertEqual(contadas() - antes, 2)
+
+
+class VolcadoMetricasTests(TestCase):
+    def test_volcado_en_hilo_aparte(self):
+        from . import metricas
+
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ruta = os.path.join(directorio.name, 'metricas.sqlite3')
+        hilos = []
+        volcar = metricas.volcar
+
+        def volcar_anotando():
+            hilos.append(threading.current_thread())
+            volcar()
+
+        metricas.volcar = volcar_anotando
+        self.addCleanup(setattr, metricas, 'volcar', volcar)
+        with self.settings(METRICAS_RUTA=ruta, METRICAS_INTERVALO=0):
+            metricas.incrementar('semartec_login_fallos_total')
+            # Espera a que el pool termine lo encolado
+            metricas._obtener_pool().submit(lambda: None).result()
+
+        self.assertEqual(len(hilos), 1)
+        self.assertIsNot(hilos[0], threading.current_thread())
+        with sqlite3.connect(ruta) as conexion:
+            valor = conexion.execute(
+                "SELECT valor FROM metricas WHERE nombre = 'semartec_login_fallos_total'"
+            ).fetchone()
+        self.assertEqual(valor, (1.0,))
+
+
+class SesionesTests(TestCase):
+    def test_anonimo_no_toca_la_sesion(self):
+        generar_datos(avisos=5, noticias=0, contactos=0, colaboradores=0)
+        self.client.get('/avisos/')
+
+        with self.assertNumQueries(0):
+            response = self.client.post('/set-language/', {'language': 'en', 'next': '/avisos/'})
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+        # Una cookie de sesión caducada tampoco cuesta consultas
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'caducada'
+        self.client.get('/avisos/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/avisos/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_sesion_de_staff_en_cache_y_revocable(self):
+        User.objects.create_user('staff', password='clave-segura', is_staff=True)
+        self.client.post('/login/', {'username': 'staff', 'password': 'clave-segura'})
+        # Solo el usuario; la sesión se lee de la caché
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/inicio-admin/').status_code, 200)
+
+        # Tras el logout, una copia de la cookie ya no sirve
+        robada = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.get('/logout/')
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = robada
+        self.assertRedirects(self.client.get('/inicio-admin/'), '/login/?next=/inicio-admin/', fetch_redirect_response=False)
+
+
+@override_settings(
+    LOGIN_FALLOS_LIBRES=3, LOGIN_FALLOS_LIBRES_IP=5, LOGIN_ESPERA_BASE=60,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class LimiteLoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user('staff', password='clave-segura', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def _login(self, usuario, clave='incorrecta', ip='10.0.0.1'):
+        return self.client.post('/login/', {'username': usuario, 'password': clave}, REMOTE_ADDR=ip)
+
+    def test_bloqueo_por_usuario_antes_del_hash(self):
+        for _ in range(3):
+            self.assertEqual(self._login('staff').status_code, 200)
+
+        # Bloqueado: ni siquiera se busca al usuario, aunque la clave sea buena
+        with self.assertNumQueries(0):
+            response = self._login('Staff', 'clave-segura', ip='10.0.0.2')
+        self.assertEqual(response.status_code, 429)
+        self.assertAlmostEqual(int(response['Retry-After']), 60, delta=1)
+
+    def test_bloqueo_por_ip_con_usuarios_distintos(self):
+        for i in range(5):
+            self._login(f'usuario{i}')
+        self.assertEqual(self._login('staff', 'clave-segura').status_code, 429)
+        self.assertEqual(self._login('staff', 'clave-segura', ip='10.0.0.2').status_code, 302)
+
+    @override_settings(LOGIN_BLOQUEO_MAXIMO=24 * 60 * 60)
+    def test_fallos_simultaneos_se_cuentan_todos(self):
+        barrera = threading.Barrier(10)
+
+        def fallar():
+            barrera.wait()
+            registrar_fallo_login('10.0.0.9', 'staff')
+
+        hilos = [threading.Thread(target=fallar) for _ in range(10)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        motivo, espera = espera_login('10.0.0.9', 'staff')
+        # 10 fallos con 3 libres: 60 * 2 ** 7 segundos (la IP, con 5 libres, menos)
+        self.assertEqual(motivo, 'usuario')
+        self.assertAlmostEqual(espera, 60 * 2 ** 7, delta=1)
+
+    def test_login_correcto_reinicia_el_usuario(self):
+        for _ in range(2):
+            self._login('staff')
+        self.assertEqual(self._login('staff', 'clave-segura').status_code, 302)
+        self.client.logout()
+        for _ in range(2):
+            self._login('staff', ip='10.0.0.2')
+        self.assertEqual(self._login('staff', 'clave-segura', ip='10.0.0.3').status_code, 302)
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.contenido = bytes(range(256)) * 4
+        for nombre in ('noticias/foto.jpg', 'noticias/foto.0123456789ab.jpg', 'noticias/20240101123456.jpg', 'boletines/boletin.pdf'):
+            os.makedirs(os.path.dirname(os.path.join(directorio.name, nombre)), exist_ok=True)
+            with open(os.path.join(directorio.name, nombre), 'wb') as archivo:
+                archivo.write(self.contenido)
+        ajustes = self.settings(MEDIA_ROOT=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_archivo_completo_y_validadores(self):
+        response = self.client.get('/media/noticias/foto.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.contenido)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+        response = self.client.get('/media/noticias/foto.jpg', headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/media/noticias/foto.0123456789ab.jpg')
+        self.assertIn('immutable', response['Cache-Control'])
+        # Un nombre de subida que solo parece una huella puede reutilizarse
+        response = self.client.get('/media/noticias/20240101123456.jpg')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_rangos(self):
+        response = self.client.get('/media/noticias/foto.jpg', headers={'range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), self.contenido[10:20])
+
+        response = self.client.get('/media/noticias/foto.jpg', headers={'range': 'bytes=-5'})
+        self.assertEqual(b''.join(response.streaming_content), self.contenido[-5:])
+
+        response = self.client.get('/media/noticias/foto.jpg', headers={'range': 'bytes=2000-'})
+        self.assertEqual(response.status_code, 416)
+
+        # If-Range con una versión vieja: archivo entero
+        response = self.client.get('/media/noticias/foto.jpg', headers={'range': 'bytes=0-9', 'if-range': '"viejo"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_solo_carpetas_publicas(self):
+        for ruta in ('boletines/boletin.pdf', 'noticias/../boletines/boletin.pdf', 'noticias/no-existe.jpg'):
+            with self.subTest(ruta=ruta):
+                self.assertEqual(self.client.get(f'/media/{ruta}').status_code, 404)
+
+    @override_settings(MEDIA_ENTREGA='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        response = self.client.get('/media/noticias/foto.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/media-interna/noticias/foto.jpg')
+        self.assertEqual(response.content, b'')
+
+
+class AlmacenContenidoTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = self.settings(MEDIA_ROOT=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.almacen = almacen_contenido()
+
+    def _envejecer(self, nombre):
+        os.utime(self.almacen.path(nombre), (0, 0))
+
+    def test_subidas_iguales_comparten_archivo(self):
+        noticia = Noticia.objects.create(titulo='a', descripcion='a', fotografia=SimpleUploadedFile('a.JPG', b'imagen'))
+        colaborador = Colaborador.objects.create(nombre='b', descripcion='b', fotografia=SimpleUploadedFile('b.jpg', b'imagen'))
+
+        self.assertEqual(noticia.fotografia.name, colaborador.fotografia.name)
+        self.assertRegex(noticia.fotografia.name, r'^contenido/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(len(os.listdir(os.path.dirname(self.almacen.path(noticia.fotografia.name)))), 1)
+        response = self.client.get(noticia.fotografia.url)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_reemplazar_libera_solo_sin_referencias(self):
+        noticia = Noticia.objects.create(titulo='a', descripcion='a', fotografia=SimpleUploadedFile('a.jpg', b'uno'))
+        Colaborador.objects.create(nombre='b', descripcion='b', fotografia=SimpleUploadedFile('b.jpg', b'uno'))
+        compartida = noticia.fotografia.name
+        self._envejecer(compartida)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            noticia.fotografia = SimpleUploadedFile('c.jpg', b'dos')
+            noticia.save()
+        self.assertTrue(self.almacen.exists(compartida))
+
+        propia = noticia.fotografia.name
+        self._envejecer(propia)
+        with self.captureOnCommitCallbacks(execute=True):
+            noticia.delete()
+        self.assertFalse(self.almacen.exists(propia))
+
+    def test_limpiar_media_migra_y_borra_huerfanos(self):
+        for nombre in ('noticias/logo.jpg', 'colaboradores/logo.jpg'):
+            os.makedirs(os.path.dirname(self.almacen.path(nombre)), exist_ok=True)
+            with open(self.almacen.path(nombre), 'wb') as archivo:
+                archivo.write(b'logo')
+        Noticia.objects.create(titulo='a', descripcion='a', fotografia='noticias/logo.jpg')
+        Colaborador.objects.create(nombre='b', descripcion='b', fotografia='colaboradores/logo.jpg')
+        huerfano = self.almacen.save('x.jpg', SimpleUploadedFile('x.jpg', b'huerfano'))
+        self._envejecer(huerfano)
+
+        call_command('limpiar_media', migrar=True, stdout=StringIO())
+
+        nombre = Noticia.objects.get().fotografia.name
+        self.assertEqual(Colaborador.objects.get().fotografia.name, nombre)
+        self.assertTrue(self.almacen.exists(nombre))
+        self.assertFalse(self.almacen.exists('noticias/logo.jpg'))
+        self.assertFalse(self.almacen.exists(huerfano))
+
+
+class EstaticosTests(TestCase):
+    CSS = '/* cabecera */\n.a  >  b {\n  color: red;\n  content: "x  ;  y";\n}\n'
+
+    def setUp(self):
+        origen = tempfile.TemporaryDirectory()
+        destino = tempfile.TemporaryDirectory()
+        self.addCleanup(origen.cleanup)
+        self.addCleanup(destino.cleanup)
+        os.makedirs(os.path.join(origen.name, 'img'))
+        with open(os.path.join(origen.name, 'main.css'), 'w') as archivo:
+            # Repetido para que a WhiteNoise le compense comprimirlo
+            archivo.write(self.CSS * 50)
+        from PIL import Image
+        Image.new('RGB', (800, 400), 'white').save(os.path.join(origen.name, 'img', 'foto.png'))
+        ajustes = self.settings(
+            STATICFILES_DIRS=[origen.name], STATIC_ROOT=destino.name,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.destino = destino.name
+
+    def test_minificar_css_conserva_cadenas(self):
+        self.assertEqual(minificar_css(self.CSS), '.a > b{color: red;content: "x  ;  y"}')
+
+    def test_collectstatic_minifica_comprime_y_crea_variantes(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        css = staticfiles_storage.stored_name('main.css')
+        self.assertLess(os.path.getsize(os.path.join(self.destino, css)), len(self.CSS * 50))
+        self.assertTrue(os.path.exists(os.path.join(self.destino, f'{css}.br')))
+        self.assertTrue(os.path.exists(os.path.join(self.destino, f'{css}.gz')))
+
+        encontradas = variantes('img/foto.png', staticfiles_storage)
+        self.assertEqual([ancho for ancho, _ in encontradas['avif']], [360, 720, 800])
+        self.assertEqual(len(encontradas['webp']), 3)
+        self.assertFalse(os.path.exists(os.path.join(self.destino, f"{staticfiles_storage.stored_name('img/foto-360.avif')}.gz")))
+
+        html = engines['django'].from_string('{% load imagenes %}{% imagen_estatica "img/foto.png" %}').render()
+        self.assertIn('foto-720.', html)
+        self.assertIn('<source type="image/avif"', html)
+
+
+def _motores(jinja2):
+    """override_settings con DTL solo o con Jinja2 delante, sea cual sea PLANTILLAS_JINJA2"""
+    dtl = [motor for motor in settings.TEMPLATES if motor is not settings.MOTOR_JINJA2]
+    return override_settings(TEMPLATES=[settings.MOTOR_JINJA2, *dtl] if jinja2 else dtl)
+
+
+class PlantillasJinjaTests(TestCase):
+    def _texto(self, html):
+        html = re.sub(r'name="csrfmiddlewaretoken" value="[^"]+"', '', html)
+        return re.sub(r'\s+', ' ', html).strip()
+
+    def _pagina(self, url, idioma, jinja2):
+        cache.clear()
+        with _motores(jinja2):
+            response = self.client.get(url, HTTP_ACCEPT_LANGUAGE=idioma)
+        self.assertEqual(response.status_code, 200)
+        return self._texto(response.content.decode())
+
+    def test_cada_url_publica_igual_con_ambos_motores(self):
+        generar_datos(avisos=5, noticias=5, contactos=0, colaboradores=3)
+        urls = [reverse(nombre) for nombre in ('inicio', 'avisos', 'noticias', 'colaboradores')] + [
+            reverse(nombre, args=[model.objects.values_list('pk', flat=True).first()])
+            for nombre, model in (
+                ('aviso-detalle', Aviso), ('noticia-detalle', Noticia), ('colaborador-detalle', Colaborador),
+            )
+        ]
+        for idioma in ('es', 'en'):
+            for url in urls:
+                with self.subTest(idioma=idioma, url=url):
+                    self.assertEqual(self._pagina(url, idioma, True), self._pagina(url, idioma, False))
+
+    def test_jinja2_y_dtl_generan_la_misma_pagina(self):
+        request = self.client.get(reverse('avisos')).wsgi_request
+        dtl, jinja = motores_plantillas()
+        contextos = _contextos_plantillas()
+        for idioma in ('es', 'en'):
+            for nombre in PLANTILLAS_PUBLICAS:
+                with self.subTest(idioma=idioma, plantilla=nombre), translation.override(idioma):
+                    self.assertEqual(
+                        self._texto(jinja.get_template(nombre).render(dict(contextos[nombre]), request)),
+                        self._texto(dtl.get_template(nombre).render(dict(contextos[nombre]), request)),
+                    )
+
+    @_motores(jinja2=True)
+    def test_paginas_publicas_usan_jinja2(self):
+        aviso = Aviso.objects.create(titulo='Convocatoria', descripcion='Texto')
+        for nombre in PLANTILLAS_PUBLICAS:
+            self.assertEqual(get_template(nombre).backend.name, 'jinja2')
+
+        response = self.client.get(reverse('aviso-detalle', args=[aviso.pk]), HTTP_ACCEPT_LANGUAGE='en')
+        self.assertContains(response, 'Convocatoria')
+        self.assertContains(response, f'href="{reverse("avisos")}"')
+        self.assertContains(response, 'All rights reserved')
+        # La plantilla de login no tiene versión Jinja2 y sigue saliendo de DTL
+        self.assertEqual(self.client.get(reverse('login')).templates[0].name, 'login.html')
+
+    def test_medir_plantillas(self):
+        resultado = medir_plantillas(repeticiones=2, plantillas=['inicio.html'])
+        self.assertGreater(resultado['inicio.html']['dtl_us'], 0)
+        self.assertGreater(resultado['inicio.html']['jinja2_us'], 0)
+
+
+class ReplicaTests(TransactionTestCase):
+    """
+    La réplica es un segundo archivo SQLite que se copia del primario a mano
+
+    TransactionTestCase: la copia (API de backup de SQLite) no puede leer un
+    primario con una transacción de escritura abierta.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # La réplica no existe para el runner (no crea base de prueba para
+        # ella): se registra aquí, antes de que la clase base valide `databases`.
+        # Con MIRROR el runner no la trata como una base de prueba más ni
+        # se vacía al terminar cada prueba: solo ve lo que se le copia.
+        cls.directorio = tempfile.TemporaryDirectory()
+        connections.settings[ALIAS_REPLICA] = {
+            **connections.settings['default'],
+            'NAME': os.path.join(cls.directorio.name, 'replica.sqlite3'),
+            'TEST': {**connections.settings['default']['TEST'], 'MIRROR': 'default'},
+        }
+        cls.databases = {'default', ALIAS_REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.databases = {'default'}
+        connections[ALIAS_REPLICA].close()
+        del connections[ALIAS_REPLICA]
+        del connections.settings[ALIAS_REPLICA]
+        cls.directorio.cleanup()
+
+    def setUp(self):
+        self.addCleanup(olvidar_estado)
+        cache.clear()
+
+    def _replicar(self):
+        # Como si la última modificación de contenido fuera de hace unos
+        # segundos y el latido de ahora ya hubiera llegado a la réplica (el
+        # vaciado entre pruebas se lleva la fila que crea la migración)
+        cache.set(CLAVE_VERSION, time.time_ns() - 2 * MARGEN_VERSION_NS, None)
+        LatidoReplica.objects.update_or_create(pk=1, defaults={'marca': timezone.now()})
+        sincronizar_sqlite()
+
+    def _sin_senales(self, titulo):
+        # bulk_create no dispara señales: el cambio no mueve la versión de contenido
+        Aviso.objects.bulk_create([Aviso(titulo=titulo, descripcion='x')])
+
+    def test_lecturas_publicas_de_la_replica_y_el_escritor_lee_del_primario(self):
+        Aviso.objects.create(titulo='Replicado', descripcion='x')
+        self._replicar()
+        self._sin_senales('Solo en primario')
+
+        response = self.client.get(reverse('avisos'))
+        self.assertContains(response, 'Replicado')
+        self.assertNotContains(response, 'Solo en primario')
+
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.post(reverse('aviso-crear'), {'titulo': 'Del staff', 'descripcion': 'x'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(COOKIE_PRIMARIO, response.cookies)
+        response = self.client.get(reverse('avisos'))
+        self.assertContains(response, 'Del staff')
+
+        # El cambio de contenido tampoco se lee de la réplica hasta que llegue
+        # (logout() también borra la cookie del cliente)
+        self.client.logout()
+        self.assertContains(self.client.get(reverse('avisos')), 'Del staff')
+
+    def test_replica_atrasada_lee_del_primario(self):
+        Aviso.objects.create(titulo='Replicado', descripcion='x')
+        self._replicar()
+        self._sin_senales('Nuevo')
+        self.assertNotContains(self.client.get(reverse('avisos')), 'Nuevo')
+
+        LatidoReplica.objects.using(ALIAS_REPLICA).update(marca=timezone.now() - timedelta(hours=1))
+        olvidar_estado()
+        cache.clear()
+        self.assertContains(self.client.get(reverse('avisos')), 'Nuevo')
+
+    def test_admin_y_escrituras_van_al_primario(self):
+        self._replicar()
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        self._sin_senales('Sin replicar')
+        self.assertContains(self.client.get(reverse('admin-avisos')), 'Sin replicar')
+
+
+class ArranqueTests(TestCase):
+    def test_reportlab_no_se_carga_al_arrancar(self):
+        from .management.commands.medir_arranque import ejecutar_arranque
+
+        medicion, _ = ejecutar_arranque()
+        self.assertFalse(medicion['reportlab'])
+
+
+class BusquedaTextoTests(TestCase):
+    def _triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_fts_%'")
+            return {fila[0] for fila in cursor.fetchall()}
+
+    def test_triggers_de_avisos_y_noticias_tras_migrar(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 solo en SQLite')
+        # 0007 reconstruye myapp_noticia (AlterField) y se llevaba sus triggers
+        self.assertEqual(
+            self._triggers(),
+            {f'myapp_{tabla}_fts_{sufijo}' for tabla in ('aviso', 'noticia') for sufijo in ('ai', 'ad', 'au')},
+        )
+
+    def test_noticia_nueva_y_editada_se_encuentra(self):
+        noticia = Noticia.objects.create(titulo='Taller de robótica', descripcion='Para alumnos')
+        self.assertEqual(buscar('noticias', 'robotica'), ([noticia], False))
+
+        noticia.titulo = 'Taller de electrónica'
+        noticia.save()
+        self.assertEqual(buscar('noticias', 'robotica'), ([], False))
+        self.assertEqual(buscar('noticias', 'electronica'), ([noticia], False))
+
+        noticia.delete()
+        self.assertEqual(buscar('noticias', 'electronica'), ([], False))
+
+    def test_prefijos_acentos_y_sintaxis_del_usuario(self):
+        aviso = Aviso.objects.create(titulo='Inscripciones abiertas', descripcion='Período de reinscripción')
+        self.assertEqual(buscar('avisos', 'inscrip')[0], [aviso])
+        self.assertEqual(buscar('avisos', 'PERIODO')[0], [aviso])
+        # Comillas y operadores de FTS5 se tratan como texto, no como sintaxis
+        for texto in ('"inscripciones', 'inscripciones AND NOT (', '*', '   '):
+            with self.subTest(texto=texto):
+                buscar('avisos', texto)
+
+    def test_titulo_pesa_mas_que_descripcion(self):
+        en_descripcion = Aviso.objects.create(titulo='Calendario', descripcion='Incluye el examen final')
+        en_titulo = Aviso.objects.create(titulo='Examen final', descripcion='Consulta el calendario')
+        self.assertEqual(buscar('avisos', 'examen')[0], [en_titulo, en_descripcion])
+
+    def test_paginacion(self):
+        Aviso.objects.bulk_create([Aviso(titulo=f'Beca {i}', descripcion='x') for i in range(5)])
+        primera, hay_siguiente = buscar('avisos', 'beca', pagina=1, tamano=2)
+        self.assertTrue(hay_siguiente)
+        ultima, hay_siguiente = buscar('avisos', 'beca', pagina=3, tamano=2)
+        self.assertFalse(hay_siguiente)
+        vistos = primera + buscar('avisos', 'beca', pagina=2, tamano=2)[0] + ultima
+        self.assertEqual(len({a.pk for a in vistos}), 5)
+
+    def test_vista_pagina_fuera_de_rango(self):
+        Aviso.objects.create(titulo='Beca', descripcion='x')
+        response = self.client.get(reverse('buscar'), {'q': 'beca', 'pagina': '99999999999999999999'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('buscar'), {'q': 'beca', 'pagina': 'x'})
+        self.assertContains(response, 'Beca')
+
+
+class ComprobacionesTests(TestCase):
+    def _errores(self):
+        return [m.id for m in run_checks() if m.is_serious()]
+
+    def test_varios_workers_exigen_cache_compartida(self):
+        with self.settings(WEB_CONCURRENCY=1):
+            self.assertNotIn('myapp.E001', self._errores())
+        with self.settings(WEB_CONCURRENCY=4):
+            self.assertIn('myapp.E001', self._errores())
+        with self.settings(
+            WEB_CONCURRENCY=4,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}},
+        ):
+            self.assertNotIn('myapp.E001', self._errores())
+
+    def test_sesiones_firmadas_con_clave_conocida(self):
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'):
+            for clave in ('my_secret_key', 'replace-me', 'corta'):
+                with self.subTest(clave=clave), self.settings(SECRET_KEY=clave):
+                    self.assertIn('myapp.E002', self._errores())
+            with self.settings(SECRET_KEY='k' * 20 + 'x7#Q' * 10):
+                self.assertNotIn('myapp.E002', self._errores())
+        with self.settings(SECRET_KEY='my_secret_key'):
+            self.assertNotIn('myapp.E002', self._errores())
+
+
+@override_settings(CONTACTOS_RAFAGA=3, CONTACTOS_POR_MINUTO=1)
+class LimiteContactosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _enviar(self, ip='10.0.0.1'):
+        datos = {'nombre': 'Ana', 'numero': '555', 'email': 'ana@example.com', 'mensaje': 'Hola'}
+        return self.client.post(reverse('contactos-crear'), datos, REMOTE_ADDR=ip)
+
+    def test_rafaga_y_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self._enviar().status_code, 302)
+        response = self._enviar()
+        self.assertEqual(response.status_code, 429)
+        # Ventana de 3 / 1 = 3 minutos
+        self.assertTrue(1 <= int(response['Retry-After']) <= 181)
+        self.assertEqual(Contactos.objects.count(), 3)
+        self.assertEqual(self._enviar(ip='10.0.0.2').status_code, 302)
+
+    def test_peticiones_concurrentes_no_se_pisan(self):
+        barrera = threading.Barrier(20)
+        permitidas = []
+
+        def enviar():
+            barrera.wait()
+            permitidas.append(consumir_token('prueba:concurrente', 5, 1)[0])
+
+        hilos = [threading.Thread(target=enviar) for _ in range(20)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(permitidas.count(True), 5)
+
+
+class IngestaContactosTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.ruta = os.path.join(self.directorio.name, 'contactos.jsonl')
+        ajustes = self.settings(CONTACTOS_BUFFER_RUTA=self.ruta, CONTACTOS_BUFFER_LOTE=2)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _contacto(self, nombre):
+        return {'nombre': nombre, 'numero': '555', 'email': 'a@example.com', 'mensaje': 'Hola'}
+
+    def test_vaciado_inserta_en_lotes(self):
+        for i in range(5):
+            encolar_contacto(self._contacto(f'c{i}'))
+        self.assertEqual(vaciar_buffer(), 5)
+        self.assertEqual(Contactos.objects.count(), 5)
+        self.assertFalse(os.path.exists(self.ruta + '.procesando'))
+        self.assertEqual(vaciar_buffer(), 0)
+
+    def test_lineas_invalidas_se_apartan_sin_bloquear_la_cola(self):
+        encolar_contacto(self._contacto('primero'))
+        with open(self.ruta, 'a', encoding='utf-8') as archivo:
+            archivo.write('{"nombre": "cortado\n')
+            archivo.write('{"nombre": "x", "campo": "desconocido"}\n')
+        # nombre nulo: la base la rechaza dentro de bulk_create
+        encolar_contacto(self._contacto(None))
+        encolar_contacto(self._contacto('ultimo'))
+
+        self.assertEqual(vaciar_buffer(), 2)
+        self.assertEqual(
+            sorted(Contactos.objects.values_list('nombre', flat=True)), ['primero', 'ultimo'],
+        )
+        self.assertFalse(os.path.exists(self.ruta + '.procesando'))
+        with open(self.ruta + '.rechazados', encoding='utf-8') as archivo:
+            self.assertEqual(len(archivo.readlines()), 3)
+        self.assertEqual(vaciar_buffer(), 0)
+
+    def test_envio_bajo_el_umbral_solo_encola(self):
+        datos = self._contacto('Ana')
+        with self.settings(CONTACTOS_INGESTA_BUFFER=True, CONTACTOS_BUFFER_BYTES=1024 * 1024):
+            cache.clear()
+            response = self.client.post(reverse('contactos-crear'), datos)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Contactos.objects.count(), 0)
+        self.assertEqual(vaciar_buffer(), 1)
+
+
+class PaginacionKeysetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Aviso.objects.bulk_create(Aviso(titulo=f'a{i}', descripcion='-') for i in range(30))
+        # Tres fechas repetidas: el desempate lo hace la llave primaria
+        base = timezone.now()
+        for pk in Aviso.objects.values_list('pk', flat=True):
+            Aviso.objects.filter(pk=pk).update(fecha_publicacion=base - timedelta(days=pk % 3))
+        cls.orden = list(Aviso.objects.order_by('-fecha_publicacion', '-pk').values_list('pk', flat=True))
+
+    def _pagina(self, **params):
+        request = RequestFactory().get('/', params)
+        return paginar_keyset(request, Aviso.objects.all(), ('fecha_publicacion', 'pk'), tamano=7)
+
+    def test_recorrido_completo_con_fechas_empatadas(self):
+        vistos = []
+        pagina = self._pagina()
+        self.assertFalse(pagina.tiene_anterior)
+        while True:
+            vistos.extend(a.pk for a in pagina)
+            if not pagina.cursor_siguiente:
+                break
+            pagina = self._pagina(despues=pagina.cursor_siguiente)
+        self.assertEqual(vistos, self.orden)
+
+    def test_antes_y_despues_ida_y_vuelta(self):
+        primera = self._pagina()
+        segunda = self._pagina(despues=primera.cursor_siguiente)
+        tercera = self._pagina(despues=segunda.cursor_siguiente)
+        self.assertEqual([a.pk for a in tercera], self.orden[14:21])
+
+        regreso = self._pagina(antes=tercera.cursor_anterior)
+        self.assertEqual([a.pk for a in regreso], [a.pk for a in segunda])
+        self.assertTrue(regreso.tiene_anterior)
+        inicio = self._pagina(antes=regreso.cursor_anterior)
+        self.assertEqual([a.pk for a in inicio], [a.pk for a in primera])
+        self.assertFalse(inicio.tiene_anterior)
+        self.assertTrue(inicio.tiene_siguiente)
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        for cursor in ('basura', '!!', 'MTIz'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual([a.pk for a in self._pagina(despues=cursor)], self.orden[:7])
+
+    def test_vista_publica_enlaza_la_pagina_siguiente(self):
+        response = self.client.get(reverse('avisos'))
+        cursor = re.search(r'\?despues=([\w-]+)', response.content.decode()).group(1)
+        siguiente = self.client.get(reverse('avisos'), {'despues': cursor})
+        self.assertEqual(siguiente.status_code, 200)
+        self.assertIn('?antes=', siguiente.content.decode())
+
+
+class IndicesFechasTests(TestCase):
+    def test_cota_redundante_sobre_el_primer_campo(self):
+        ahora = timezone.now()
+        sql = str(Aviso.objects.filter(filtro_keyset(('fecha_publicacion', 'pk'), (ahora, 5), 'lt')).query)
+        self.assertIn('"fecha_publicacion" <=', sql)
+
+    def test_listados_usan_los_indices_compuestos(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('El plan esperado solo se comprueba en SQLite')
+        salida = StringIO()
+        call_command('explicar_consultas', stdout=salida)
+        salida = salida.getvalue()
+        for indice in ('aviso_fecha_pub_idx', 'noticia_fecha_pub_idx', 'contactos_fecha_envio_idx'):
+            with self.subTest(indice=indice):
+                self.assertIn(f'SEARCH myapp_{indice.split("_")[0]}', salida)
+                self.assertIn(f'USING INDEX {indice}', salida)
+
+
+class CacheInicioTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Aviso.objects.create(titulo='Primero', descripcion='-')
+
+    def test_inicio_en_cache_no_consulta(self):
+        ultimos_inicio = async_to_sync(aultimos_inicio)
+        with self.assertNumQueries(3):
+            ultimos_inicio()
+        with self.assertNumQueries(0):
+            datos = ultimos_inicio()
+        self.assertEqual([a.titulo for a in datos['avisos']], ['Primero'])
+
+    def test_guardar_invalida(self):
+        ultimos_inicio = async_to_sync(aultimos_inicio)
+        ultimos_inicio()
+        aviso = Aviso.objects.create(titulo='Segundo', descripcion='-')
+        self.assertEqual([a.titulo for a in ultimos_inicio()['avisos']], ['Segundo', 'Primero'])
+        aviso.titulo = 'Editado'
+        aviso.save()
+        self.assertEqual(ultimos_inicio()['avisos'][0].titulo, 'Editado')
+        aviso.delete()
+        self.assertEqual([a.titulo for a in ultimos_inicio()['avisos']], ['Primero'])
+
+
+class ColaTrabajosPDFTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = self.settings(
+            MEDIA_ROOT=directorio.name,
+            TRABAJOS_PDF_LATIDO_RUTA=os.path.join(directorio.name, 'trabajos.latido'),
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_panel_encola_solo_con_worker_activo(self):
+        response = self.client.get(reverse('inicio-admin'))
+        self.assertNotContains(response, 'id="formBoletin"')
+        self.assertContains(response, f'href="{reverse("generar-pdf")}" class="btn btn-outline-danger')
+
+        registrar_latido()
+        self.assertTrue(worker_activo())
+        self.assertContains(self.client.get(reverse('inicio-admin')), 'id="formBoletin"')
+
+        viejo = time.time() - LATIDO_MAXIMO_SEGUNDOS - 1
+        os.utime(settings.TRABAJOS_PDF_LATIDO_RUTA, (viejo, viejo))
+        self.assertFalse(worker_activo())
+
+    @override_settings(TRABAJOS_PDF_WORKER_LOCAL=False)
+    def test_worker_local_desactivado(self):
+        iniciar_worker_local()
+        self.assertIsNone(trabajos._worker)
+
+    def test_reserva_en_orden_y_sin_repetir(self):
+        primero, segundo = encolar_boletin(), encolar_boletin()
+        self.assertEqual(tomar_siguiente().pk, primero.pk)
+        self.assertEqual(tomar_siguiente().pk, segundo.pk)
+        self.assertIsNone(tomar_siguiente())
+
+    def test_trabajo_abandonado_se_retoma(self):
+        trabajo = encolar_boletin()
+        tomar_siguiente()
+        TrabajoPDF.objects.filter(pk=trabajo.pk).update(
+            fecha_inicio=timezone.now() - TIEMPO_MAXIMO_PROCESANDO - timedelta(minutes=1),
+        )
+        self.assertEqual(tomar_siguiente().pk, trabajo.pk)
+
+    def test_solicitar_procesar_y_descargar(self):
+        json = {'accept': 'application/json'}
+        response = self.client.post(reverse('boletin-solicitar'), headers=json)
+        self.assertEqual(response.status_code, 202)
+        url_estado = response.json()['url_estado']
+        self.assertEqual(self.client.get(url_estado, headers=json).json()['estado'], TrabajoPDF.PENDIENTE)
+
+        self.assertEqual(procesar_pendientes(), 1)
+        estado = self.client.get(url_estado, headers=json).json()
+        self.assertEqual(estado['estado'], TrabajoPDF.TERMINADO)
+        self.assertIsNotNone(estado['duracion_render'])
+
+        response = self.client.get(estado['url_descarga'])
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        response.close()
+
+    def test_archivo_perdido_da_404_y_marca_error(self):
+        trabajo = encolar_boletin()
+        procesar_pendientes()
+        trabajo.refresh_from_db()
+        os.remove(trabajo.archivo.path)
+
+        response = self.client.get(reverse('boletin-descargar', args=[trabajo.pk]))
+        self.assertEqual(response.status_code, 404)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoPDF.ERROR)
+        self.assertEqual(
+            self.client.get(reverse('boletin-estado', args=[trabajo.pk]), headers={'accept': 'application/json'}).json()['estado'],
+            TrabajoPDF.ERROR,
+        )
+
+    def test_formulario_sin_javascript_va_a_la_pagina_de_estado(self):
+        navegador = {'accept': 'text/html,application/xhtml+xml,*/*;q=0.8'}
+        response = self.client.post(reverse('boletin-solicitar'), headers=navegador)
+        trabajo = TrabajoPDF.objects.get()
+        self.assertRedirects(response, reverse('boletin-estado', args=[trabajo.pk]), fetch_redirect_response=False)
+
+        response = self.client.get(response['Location'], headers=navegador)
+        self.assertContains(response, 'Generando boletín')
+        self.assertEqual(response['Refresh'], '2')
+
+        procesar_pendientes()
+        response = self.client.get(reverse('boletin-estado', args=[trabajo.pk]), headers=navegador)
+        self.assertContains(response, reverse('boletin-descargar', args=[trabajo.pk]))
+        self.assertNotIn('Refresh', response)
+
+    def test_retencion_borra_filas_y_archivos(self):
+        viejo, reciente = encolar_boletin(), encolar_boletin()
+        procesar_pendientes()
+        viejo.refresh_from_db()
+        ruta = viejo.archivo.path
+        TrabajoPDF.objects.filter(pk=viejo.pk).update(fecha_solicitud=timezone.now() - timedelta(days=8))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('limpiar_contactos', stdout=StringIO())
+        self.assertEqual(list(TrabajoPDF.objects.values_list('pk', flat=True)), [reciente.pk])
+        self.assertFalse(os.path.exists(ruta))
+        reciente.refresh_from_db()
+        self.assertTrue(os.path.exists(reciente.archivo.path))
+
+
+class BoletinCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Aviso.objects.create(titulo='Aviso', descripcion='-')
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+
+    def test_etag_y_304(self):
+        response = self.client.get(reverse('generar-pdf'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        etag = response['ETag']
+
+        response = self.client.get(reverse('generar-pdf'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        Aviso.objects.create(titulo='Otro', descripcion='-')
+        response = self.client.get(reverse('generar-pdf'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pdf_se_construye_una_vez_por_huella(self):
+        construcciones = []
+
+        def construir(buffer):
+            construcciones.append(1)
+            buffer.write(b'%PDF-prueba')
+
+        huella = huella_boletin()
+        self.assertEqual(boletin_cacheado(huella, construir), b'%PDF-prueba')
+        self.assertEqual(boletin_cacheado(huella_boletin(), construir), b'%PDF-prueba')
+        self.assertEqual(len(construcciones), 1)
+
+        aviso = Aviso.objects.get()
+        aviso.titulo = 'Editado'
+        aviso.save()
+        self.assertNotEqual(huella_boletin(), huella)
+
+
+class ImagenResponsivaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = self.settings(MEDIA_ROOT=directorio.name, MEDIA_URL='/media/')
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _foto(self, ancho, alto):
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', (ancho, alto), 'navy').save(buffer, 'JPEG')
+        return default_storage.save('noticias/foto.jpg', ContentFile(buffer.getvalue()))
+
+    def _render(self, nombre):
+        plantilla = engines['django'].from_string(
+            '{% load imagenes %}{% imagen_responsiva campo alt="Foto" sizes="50vw" %}'
+        )
+        return plantilla.render({'campo': Noticia(fotografia=nombre).fotografia})
+
+    def test_sin_derivados_usa_el_original(self):
+        html = self._render(self._foto(400, 300))
+        self.assertNotIn('<picture', html)
+        self.assertIn('src="/media/noticias/foto.jpg"', html)
+
+    def test_srcset_webp_y_jpeg(self):
+        nombre = self._foto(1600, 900)
+        generar_derivados(nombre)
+        html = self._render(nombre)
+        self.assertIn('<source type="image/webp" srcset="', html)
+        for extension in ('webp', 'jpg'):
+            for tamano, ancho in (('miniatura', 320), ('tarjeta', 640), ('completa', 1280)):
+                self.assertIn(f'/media/derivados/noticias/foto_{tamano}.{extension} {ancho}w', html)
+        self.assertIn('src="/media/derivados/noticias/foto_tarjeta.jpg"', html)
+        self.assertIn('sizes="50vw"', html)
+
+    def test_srcset_con_el_ancho_real_de_una_imagen_pequena(self):
+        nombre = self._foto(500, 300)
+        self.assertEqual(generar_derivados(nombre), {'miniatura': 320, 'tarjeta': 500, 'completa': 500})
+        html = self._render(nombre)
+        self.assertIn('foto_miniatura.webp 320w, /media/derivados/noticias/foto_tarjeta.webp 500w"', html)
+        self.assertNotIn('foto_completa', html)
+        self.assertNotIn('640w', html)
+
+    def test_render_sin_consultar_el_storage(self):
+        nombre = self._foto(800, 600)
+        generar_derivados(nombre)
+        # Los anchos quedaron en caché al generar: el manifiesto ya no se lee
+        os.remove(ruta_manifiesto(nombre))
+        self.assertIn('<picture', self._render(nombre))
+
+
+class RetencionContactosTests(TestCase):
+    def setUp(self):
+        Contactos.objects.bulk_create(
+            Contactos(nombre=f'c{i}', numero='555', mensaje='-') for i in range(25)
+        )
+        self.antiguos = list(Contactos.objects.order_by('pk').values_list('pk', flat=True)[:23])
+        Contactos.objects.filter(pk__in=self.antiguos).update(fecha_envio=timezone.now() - timedelta(days=40))
+
+    def test_elimina_solo_los_antiguos_en_lotes(self):
+        detalle = Contactos.limpiar_antiguos_detalle(dias=30, tamano_lote=10)
+        self.assertEqual((detalle['eliminados'], detalle['lotes']), (23, 3))
+        self.assertEqual(Contactos.objects.count(), 2)
+        self.assertFalse(Contactos.objects.filter(pk__in=self.antiguos).exists())
+
+    def test_cada_lote_es_un_delete_acotado(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            Contactos.limpiar_antiguos(dias=30, tamano_lote=10)
+        borrados = [q['sql'] for q in capturadas if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(borrados), 3)
+        self.assertTrue(all('IN (' in sql for sql in borrados))
+
+    def test_simular_no_elimina(self):
+        salida = StringIO()
+        call_command('limpiar_contactos', '--simular', '--lote', '10', stdout=salida)
+        self.assertIn('por eliminar: 23 en 3 lote(s)', salida.getvalue())
+        self.assertEqual(Contactos.objects.count(), 25)
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.aviso = Aviso.objects.create(titulo='Aviso', descripcion='-')
+        # El staff no pasa por la caché de páginas: responde el decorador
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+
+    def _validadores(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        return response['ETag'], response['Last-Modified']
+
+    def test_listado_304_hasta_que_cambia(self):
+        etag, ultima = self._validadores(reverse('avisos'))
+        # Usuario y resumen agregado de la tabla
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('avisos'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse('avisos'), headers={'if-modified-since': ultima})
+        self.assertEqual(response.status_code, 304)
+
+        Aviso.objects.create(titulo='Nuevo', descripcion='-')
+        response = self.client.get(reverse('avisos'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_detalle_304_sin_consultar_el_registro(self):
+        url = reverse('aviso-detalle', args=[self.aviso.pk])
+        etag, _ = self._validadores(url)
+        # Solo la consulta del usuario autenticado
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.aviso.titulo = 'Editado'
+        self.aviso.save()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_etag_distinto_por_usuario(self):
+        etag, _ = self._validadores(reverse('avisos'))
+        self.client.logout()
+        response = self.client.get(reverse('avisos'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class CachePaginaAnonimaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Aviso.objects.create(titulo='Aviso', descripcion='-')
+
+    def _token(self, response):
+        return re.search(r'name="csrfmiddlewaretoken" value="([^"]*)"', response.content.decode()).group(1)
+
+    def test_miss_hit_y_csrf_propio(self):
+        primera = self.client.get(reverse('avisos'))
+        self.assertEqual(primera['X-Cache'], 'MISS')
+
+        visitante = self.client_class(enforce_csrf_checks=True)
+        with self.assertNumQueries(0):
+            segunda = visitante.get(reverse('avisos'))
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertNotIn(MARCA_CSRF, segunda.content.decode())
+        # El token sustituido es válido con la cookie CSRF del nuevo visitante
+        response = visitante.post(reverse('set_language'), {
+            'csrfmiddlewaretoken': self._token(segunda), 'language': 'es', 'next': '/',
+        })
+        self.assertEqual(response.status_code, 302)
+
+        respuesta_304 = visitante.get(reverse('avisos'), headers={'if-none-match': segunda['ETag']})
+        self.assertEqual(respuesta_304.status_code, 304)
+
+    def test_entrada_obsoleta_se_sirve_mientras_otra_peticion_regenera(self):
+        primera = self.client.get(reverse('avisos'))
+        Aviso.objects.create(titulo='Nuevo', descripcion='-')
+        with translation.override(primera['Content-Language']):
+            clave = CachePaginaAnonimaMiddleware(None)._clave(RequestFactory().get(reverse('avisos')))
+        cache.add(f'{clave}:regenerando', 1, 30)
+
+        obsoleta = self.client.get(reverse('avisos'))
+        self.assertEqual(obsoleta['X-Cache'], 'STALE')
+        self.assertNotIn('Nuevo', obsoleta.content.decode())
+
+        cache.delete(f'{clave}:regenerando')
+        nueva = self.client.get(reverse('avisos'))
+        self.assertEqual(nueva['X-Cache'], 'MISS')
+        self.assertIn('Nuevo', nueva.content.decode())
+
+    def test_parametros_ajenos_no_crean_entradas(self):
+        self.assertEqual(self.client.get(reverse('avisos'))['X-Cache'], 'MISS')
+        for query in ('?utm_source=boletin', '?fbclid=abc&x=1', '?'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(reverse('avisos') + query)['X-Cache'], 'HIT')
+
+        self.assertEqual(self.client.get(reverse('avisos'), {'despues': 'MQ', 'utm': '1'})['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(reverse('avisos'), {'utm': '2', 'despues': 'MQ'})['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(reverse('avisos'), {'antes': 'MQ'})['X-Cache'], 'MISS')
+
+    def test_staff_no_usa_la_cache(self):
+        self.client.get(reverse('avisos'))
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertNotIn('X-Cache', self.client.get(reverse('avisos')))
+
+    def test_aciertos_contados_por_vista(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+
+        def peticiones(vista):
+            muestra = re.search(
+                r'^semartec_peticiones_total\{estado="200",metodo="GET",vista="%s"\} (\d+)$' % vista,
+                exposicion_prometheus(), re.M,
+            )
+            return int(muestra.group(1)) if muestra else 0
+
+        with self.settings(METRICAS_RUTA=os.path.join(directorio.name, 'metricas.sqlite3')):
+            self.assertEqual(self.client.get(reverse('inicio'))['X-Cache'], 'MISS')
+            antes = peticiones('inicio')
+            self.assertEqual(self.client.get(reverse('inicio'))['X-Cache'], 'HIT')
+            self.assertEqual(peticiones('inicio') - antes, 1)
+            self.assertEqual(peticiones('sin_ruta'), 0)
+
+
+class PdfContactosTests(TestCase):
+    def _paginas(self, historia):
+        """Página en la que doc.build colocó cada flowable (tipo, texto, página)"""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+        from .pdf import _FlowablesPerezosos
+
+        colocados = []
+
+        class Documento(SimpleDocTemplate):
+            def afterFlowable(self, flowable):
+                texto = flowable.getPlainText() if isinstance(flowable, Paragraph) else ''
+                colocados.append((type(flowable).__name__, texto, self.page))
+
+        Documento(BytesIO(), pagesize=letter).build(_FlowablesPerezosos(historia))
+        return colocados
+
+    def _historia(self):
+        from reportlab.lib.styles import getSampleStyleSheet
+
+        from .pdf import _historia_contactos
+
+        estilos = getSampleStyleSheet()
+        return _historia_contactos(estilos['Heading1'], estilos['BodyText'], [])
+
+    def test_titulo_no_queda_solo_al_pie_de_pagina(self):
+        from reportlab.platypus import Spacer
+
+        from .pdf import FILAS_POR_TABLA
+
+        Contactos.objects.bulk_create(
+            Contactos(nombre=f'c{i}', numero='555', mensaje='-') for i in range(FILAS_POR_TABLA + 5)
+        )
+        # El relleno deja sitio para el título pero no para la primera fila
+        colocados = self._paginas(chain([Spacer(1, 580)], self._historia()))
+        titulo = next(p for tipo, texto, p in colocados if texto == 'RELACIÓN DE CONTACTOS')
+        primera_tabla = next(p for tipo, _, p in colocados if tipo == 'Table')
+        self.assertEqual(titulo, primera_tabla)
+        self.assertEqual(titulo, 2)
+
+    def test_sin_contactos(self):
+        colocados = self._paginas(self._historia())
+        textos = [texto for _, texto, _ in colocados]
+        self.assertIn('No hay contactos registrados', textos)
+        self.assertEqual({p for _, _, p in colocados}, {1})
@@ -0,0 +1,191 @@
+"""
+COLA DE TRABAJOS PDF - SEMARTEC
+Cola respaldada en la base de datos para generar boletines fuera del request
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TrabajoPDF
+
+logger = logging.getLogger(__name__)
+
+
+# Un trabajo "procesando" más antiguo que esto se considera abandonado
+# (p. ej. el worker murió) y vuelve a estar disponible
+TIEMPO_MAXIMO_PROCESANDO = timedelta(minutes=10)
+
+# El worker marca el archivo de latido en cada vuelta; sin latido reciente el
+# panel ofrece la descarga directa en lugar de encolar
+LATIDO_MAXIMO_SEGUNDOS = 30
+ESPERA_REINICIO_SEGUNDOS = 5
+
+_worker = None
+
+
+def encolar_boletin(usuario=None):
+    """Registra un nuevo trabajo de boletín pendiente y lo devuelve"""
+    return TrabajoPDF.objects.create(tipo='boletin', solicitado_por=usuario)
+
+
+def _disponibles():
+    limite = timezone.now() - TIEMPO_MAXIMO_PROCESANDO
+    return Q(estado=TrabajoPDF.PENDIENTE) | Q(estado=TrabajoPDF.PROCESANDO, fecha_inicio__lt=limite)
+
+
+def tomar_siguiente():
+    """
+    Reserva el trabajo disponible más antiguo para este worker
+
+    La reserva es un UPDATE condicionado al estado, así que si varios workers
+    compiten por el mismo trabajo solo uno lo obtiene (funciona igual en SQLite
+    y PostgreSQL, sin SELECT ... FOR UPDATE).
+    """
+    candidatos = (
+        TrabajoPDF.objects.filter(_disponibles())
+        .order_by('fecha_solicitud')
+        .values_list('pk', flat=True)[:5]
+    )
+    for pk in candidatos:
+        tomado = TrabajoPDF.objects.filter(_disponibles(), pk=pk).update(
+            estado=TrabajoPDF.PROCESANDO, fecha_inicio=timezone.now()
+        )
+        if tomado:
+            return TrabajoPDF.objects.get(pk=pk)
+    return None
+
+
+def ejecutar(trabajo):
+    """Genera el PDF del trabajo, lo guarda en el storage y registra el tiempo de render"""
+    from .pdf import construir_boletin_pdf
+
+    inicio = time.perf_counter()
+    try:
+        buffer = BytesIO()
+        construir_boletin_pdf(buffer)
+        trabajo.duracion_render = time.perf_counter() - inicio
+        nombre = f'Boletin_SEMARTEC_{timezone.now().strftime("%Y%m%d_%H%M%S")}_{trabajo.pk}.pdf'
+        buffer.seek(0)
+        trabajo.archivo.save(nombre, File(buffer), save=False)
+        trabajo.estado = TrabajoPDF.TERMINADO
+    except Exception as e:
+        trabajo.duracion_render = time.perf_counter() - inicio
+        trabajo.estado = TrabajoPDF.ERROR
+        trabajo.error = str(e)
+
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save()
+    return trabajo
+
+
+def procesar_pendientes(maximo=None):
+    """
+    Procesa trabajos disponibles hasta vaciar la cola o llegar a `maximo`
+
+    Returns:
+        int: número de trabajos procesados
+    """
+    procesados = 0
+    while maximo is None or procesados < maximo:
+        trabajo = tomar_siguiente()
+        if trabajo is None:
+            break
+        ejecutar(trabajo)
+        procesados += 1
+    return procesados
+
+
+# ==================== WORKER LOCAL ====================
+
+def registrar_latido():
+    """Marca que el worker de trabajos sigue vivo (mtime del archivo de latido)"""
+    ruta = str(settings.TRABAJOS_PDF_LATIDO_RUTA)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'a'):
+        os.utime(ruta)
+
+
+def worker_activo():
+    """Indica si algún worker de esta máquina marcó el latido hace poco"""
+    try:
+        edad = time.time() - os.path.getmtime(settings.TRABAJOS_PDF_LATIDO_RUTA)
+    except FileNotFoundError:
+        return False
+    return edad < LATIDO_MAXIMO_SEGUNDOS
+
+
+class _WorkerLocal:
+    """
+    `manage.py procesar_trabajos_pdf` como subproceso del maestro de gunicorn
+
+    Un hilo lo vigila y lo vuelve a lanzar si termina; detener() lo corta con
+    SIGINT (el comando sale limpio con KeyboardInterrupt).
+    """
+
+    def __init__(self):
+        self._detenido = threading.Event()
+        self._proceso = None
+        self._hilo = threading.Thread(target=self._vigilar, name='worker-trabajos-pdf', daemon=True)
+
+    def _lanzar(self):
+        comando = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'procesar_trabajos_pdf']
+        self._proceso = subprocess.Popen(comando)
+        logger.info('Worker de trabajos PDF iniciado (pid %s)', self._proceso.pid)
+
+    def _vigilar(self):
+        while not self._detenido.is_set():
+            self._lanzar()
+            codigo = self._proceso.wait()
+            # Una señal al grupo (Ctrl+C, SIGTERM) llega antes de on_exit: se
+            # da un segundo al maestro para marcar la parada antes de reiniciar
+            if self._detenido.wait(1):
+                break
+            logger.error('El worker de trabajos PDF terminó con código %s; se reinicia', codigo)
+            self._detenido.wait(ESPERA_REINICIO_SEGUNDOS)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self, espera=10):
+        self._detenido.set()
+        proceso = self._proceso
+        if proceso is None or proceso.poll() is not None:
+            return
+        proceso.send_signal(signal.SIGINT)
+        try:
+            proceso.wait(espera)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+
+
+def iniciar_worker_local():
+    """
+    Lanza el worker de la cola junto al servidor (hook when_ready de gunicorn)
+
+    Con TRABAJOS_PDF_WORKER_LOCAL=False no hace nada: el worker corre aparte.
+    """
+    global _worker
+    if not settings.TRABAJOS_PDF_WORKER_LOCAL or _worker is not None:
+        return
+    _worker = _WorkerLocal()
+    _worker.iniciar()
+
+
+def detener_worker_local():
+    """Detiene el worker lanzado por iniciar_worker_local (hook on_exit de gunicorn)"""
+    global _worker
+    if _worker is not None:
+        _worker.detener()
+        _worker = None
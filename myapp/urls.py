@@ -11,6 +11,7 @@ urlpatterns = [
     path('', views.inicio, name='inicio'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('buscar/', views.buscar, name='buscar'),
     
     # CRUD Avisos
     path('avisos/', views.avisos, name='avisos'),
@@ -50,5 +51,13 @@ urlpatterns = [
     # URL de pdf
     path('generar-pdf/', views.generar_boletin_pdf, name='generar-pdf'),
     path('generar-contactos-pdf/', views.generar_contactos_pdf, name='generar-contactos-pdf'),
+
+    # Boletín en segundo plano
+    path('boletin/solicitar/', views.solicitar_boletin_pdf, name='boletin-solicitar'),
+    path('boletin/<int:pk>/estado/', views.estado_boletin_pdf, name='boletin-estado'),
+    path('boletin/<int:pk>/descargar/', views.descargar_boletin_pdf, name='boletin-descargar'),
+
+    # Métricas en formato Prometheus
+    path('metrics', views.metricas, name='metricas'),
 ]
 
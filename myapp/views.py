@@ -4,29 +4,37 @@ Gestiona avisos, noticias, colaboradores y generación de PDF
 """
 
 # ==================== IMPORTACIONES ====================
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.template.response import TemplateResponse
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.views.decorators.http import require_http_methods
-from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from django.urls import reverse, reverse_lazy
 from django.views.generic import CreateView, UpdateView, DeleteView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.http import HttpResponse
-from io import BytesIO
+from django.http import Http404, HttpResponse, JsonResponse, FileResponse
+import tempfile
 from datetime import datetime, timedelta
 from django.utils import timezone
+from django.db.models import Count, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
 
 # Modelos
-from .models import Aviso, Noticia, Colaborador, Contactos
-
-# ReportLab para PDF
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+from .models import Aviso, Noticia, Colaborador, Contactos, TrabajoPDF
+from .paginacion import paginar_keyset, apaginar_keyset
+from .cache import aultimos_inicio, huella_boletin, boletin_cacheado
+from .trabajos import encolar_boletin, worker_activo
+from .imagenes import encolar_derivados
+from .limites import consumir_token, espera_login, ip_cliente, limpiar_fallos_login, registrar_fallo_login
+from .ingesta import encolar_contacto, programar_vaciado
+from .busqueda import MODELOS as MODELOS_BUSQUEDA, PAGINA_MAXIMA as PAGINA_MAXIMA_BUSQUEDA, buscar as buscar_texto
+from .condicional import respuesta_condicional, validadores_lista, validadores_detalle
+from .metricas import exposicion_prometheus, incrementar
 
 
 # ==================== UTILIDADES ====================
@@ -39,14 +47,6 @@ def _check_staff_permission(request, redirect_view='inicio'):
     return None
 
 
-def _truncate_text(text, max_length=100):
-    """Trunca texto a un máximo de caracteres, cortando en espacios"""
-    if len(text) <= max_length:
-        return text
-    truncated = text[:max_length].rsplit(' ', 1)[0]
-    return truncated + "..."
-
-
 def _limit_words(text, max_words=15):
     """Limita el texto a un número máximo de palabras"""
     words = text.split()
@@ -63,12 +63,27 @@ def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
+        ip = ip_cliente(request)
+
+        # El bloqueo se comprueba antes de authenticate: un ataque de fuerza
+        # bruta no llega a calcular el hash PBKDF2 y no consume CPU
+        motivo, espera = espera_login(ip, username)
+        if motivo:
+            incrementar('semartec_login_rechazos_total', motivo=motivo)
+            messages.error(request, f'Demasiados intentos. Intenta de nuevo en {espera} segundos.')
+            response = render(request, 'login.html', status=429)
+            response['Retry-After'] = str(espera)
+            return response
+
         user = authenticate(request, username=username, password=password)
         
         if user is not None:
+            limpiar_fallos_login(username)
             login(request, user)
             return redirect('inicio-admin' if user.is_staff else 'inicio')
         else:
+            registrar_fallo_login(ip, username)
+            incrementar('semartec_login_fallos_total')
             messages.error(request, 'Usuario o contraseña incorrectos')
     
     return render(request, 'login.html')
@@ -82,56 +97,100 @@ def logout_view(request):
 
 
 # ==================== VISTAS PÚBLICAS ====================
+# Las páginas públicas son async: con un servidor ASGI (ver misite/asgi.py) un
+# mismo proceso atiende muchas conexiones lentas mientras espera a la base de
+# datos. Se responde con TemplateResponse para que Django renderice la
+# plantilla en un hilo (el context processor de auth puede consultar la sesión).
 
-def inicio(request):
-    """Página de inicio pública con últimos elementos"""
-    ctx = {
-        'avisos': Aviso.objects.order_by('-fecha_publicacion')[:4],
-        'noticias': Noticia.objects.order_by('-fecha_publicacion')[:4],
-        'colaboradores': Colaborador.objects.all()[:4],
-    }
-    return render(request, 'inicio.html', ctx)
+async def inicio(request):
+    """Página de inicio pública con últimos elementos (servidos desde caché)"""
+    return TemplateResponse(request, 'inicio.html', await aultimos_inicio())
 
 
-def avisos(request):
+@respuesta_condicional(validadores_lista(Aviso, 'fecha_publicacion'))
+async def avisos(request):
     """Listado de avisos públicos"""
-    ctx = {'avisos': Aviso.objects.order_by('-fecha_publicacion')}
-    return render(request, 'avisos.html', ctx)
+    pagina = await apaginar_keyset(request, Aviso.objects.all(), ('fecha_publicacion', 'pk'))
+    ctx = {'avisos': pagina.object_list, 'pagina': pagina}
+    return TemplateResponse(request, 'avisos.html', ctx)
 
 
-class AvisoDetailView(DetailView):
+class DetalleAsincronoMixin:
+    """DetailView async: el registro se lee con el ORM asíncrono"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(self.get_queryset(), pk=kwargs[self.pk_url_kwarg])
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+@method_decorator(respuesta_condicional(validadores_detalle), name='dispatch')
+class AvisoDetailView(DetalleAsincronoMixin, DetailView):
     model = Aviso
     template_name = 'aviso_detail.html'
     context_object_name = 'aviso'
     pk_url_kwarg = 'pk'
 
 
-def noticias(request):
+@respuesta_condicional(validadores_lista(Noticia, 'fecha_publicacion'))
+async def noticias(request):
     """Listado de noticias públicas"""
-    ctx = {'noticias': Noticia.objects.all().order_by('-fecha_publicacion')}
-    return render(request, 'noticias.html', ctx)
+    pagina = await apaginar_keyset(request, Noticia.objects.all(), ('fecha_publicacion', 'pk'))
+    ctx = {'noticias': pagina.object_list, 'pagina': pagina}
+    return TemplateResponse(request, 'noticias.html', ctx)
 
 
-class NoticiaDetailView(DetailView):
+@method_decorator(respuesta_condicional(validadores_detalle), name='dispatch')
+class NoticiaDetailView(DetalleAsincronoMixin, DetailView):
     model = Noticia
     template_name = 'noticia_detail.html'
     context_object_name = 'noticia'
     pk_url_kwarg = 'pk'
 
 
-def colaboradores(request):
+@respuesta_condicional(validadores_lista(Colaborador))
+async def colaboradores(request):
     """Listado de colaboradores públicos"""
-    ctx = {'colaboradores': Colaborador.objects.all()}
-    return render(request, 'colaboradores.html', ctx)
+    pagina = await apaginar_keyset(request, Colaborador.objects.all(), ('pk',))
+    ctx = {'colaboradores': pagina.object_list, 'pagina': pagina}
+    return TemplateResponse(request, 'colaboradores.html', ctx)
 
 
-class ColaboradorDetailView(DetailView):
+@method_decorator(respuesta_condicional(validadores_detalle), name='dispatch')
+class ColaboradorDetailView(DetalleAsincronoMixin, DetailView):
     model = Colaborador
     template_name = 'colaborador_detail.html'
     context_object_name = 'colaborador'
     pk_url_kwarg = 'pk'
 
 
+def buscar(request):
+    """Búsqueda de texto completo en avisos o noticias, ordenada por relevancia"""
+    texto = request.GET.get('q', '')
+    tipo = request.GET.get('tipo', 'avisos')
+    if tipo not in MODELOS_BUSQUEDA:
+        tipo = 'avisos'
+    try:
+        pagina = max(1, int(request.GET.get('pagina', 1)))
+    except ValueError:
+        pagina = 1
+    if pagina > PAGINA_MAXIMA_BUSQUEDA:
+        raise Http404
+    
+    resultados, hay_siguiente = buscar_texto(tipo, texto, pagina)
+    ctx = {
+        'q': texto,
+        'tipo': tipo,
+        'resultados': resultados,
+        'pagina': pagina,
+        'pagina_anterior': pagina - 1 if pagina > 1 else None,
+        'pagina_siguiente': pagina + 1 if hay_siguiente else None,
+    }
+    return render(request, 'buscar.html', ctx)
+
+
 # ==================== VISTAS DE ADMINISTRACIÓN ====================
 
 @login_required(login_url='login')
@@ -140,7 +199,7 @@ def inicio_admin(request):
     check = _check_staff_permission(request)
     if check:
         return check
-    return render(request, 'InicioAdmin.html')
+    return render(request, 'InicioAdmin.html', {'worker_pdf': worker_activo()})
 
 
 @login_required(login_url='login')
@@ -150,9 +209,11 @@ def admin_avisos(request):
     if check:
         return check
     
+    pagina = paginar_keyset(request, Aviso.objects.all(), ('fecha_publicacion', 'pk'), tamano=25)
     ctx = {
         'total_avisos': Aviso.objects.count(),
-        'avisos': Aviso.objects.all().order_by('-fecha_publicacion'),
+        'avisos': pagina.object_list,
+        'pagina': pagina,
     }
     return render(request, 'admin_avisos.html', ctx)
 
@@ -164,9 +225,11 @@ def admin_noticias(request):
     if check:
         return check
     
+    pagina = paginar_keyset(request, Noticia.objects.all(), ('fecha_publicacion', 'pk'), tamano=25)
     ctx = {
         'total_noticias': Noticia.objects.count(),
-        'noticias': Noticia.objects.all().order_by('-fecha_publicacion'),
+        'noticias': pagina.object_list,
+        'pagina': pagina,
     }
     return render(request, 'admin_noticias.html', ctx)
 
@@ -178,9 +241,11 @@ def admin_colaboradores(request):
     if check:
         return check
     
+    pagina = paginar_keyset(request, Colaborador.objects.all(), ('pk',), tamano=25)
     ctx = {
         'total_colaboradores': Colaborador.objects.count(),
-        'colaboradores': Colaborador.objects.all(),
+        'colaboradores': pagina.object_list,
+        'pagina': pagina,
     }
     return render(request, 'admin_colaboradores.html', ctx)
 
@@ -192,15 +257,19 @@ def admin_contactos(request):
     if check:
         return check
     
-    # Información de limpieza automática
+    # Información de limpieza automática (total y antiguos en una sola consulta)
     fecha_limite = timezone.now() - timedelta(days=30)
-    contactos_antiguos = Contactos.objects.filter(fecha_envio__lt=fecha_limite)
-    cantidad_por_eliminar = contactos_antiguos.count()
+    conteos = Contactos.objects.aggregate(
+        total=Count('pk'),
+        por_eliminar=Count('pk', filter=Q(fecha_envio__lt=fecha_limite)),
+    )
     
+    pagina = paginar_keyset(request, Contactos.objects.all(), ('fecha_envio', 'pk'), tamano=25)
     ctx = {
-        'total_contactos': Contactos.objects.count(),
-        'contactos': Contactos.objects.all(),
-        'contactos_por_eliminar': cantidad_por_eliminar,
+        'total_contactos': conteos['total'],
+        'contactos': pagina.object_list,
+        'pagina': pagina,
+        'contactos_por_eliminar': conteos['por_eliminar'],
         'fecha_limite': fecha_limite,
     }
     return render(request, 'admin_contactos.html', ctx)
@@ -221,6 +290,16 @@ class BaseStaffDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return redirect(self.success_url)
 
 
+class DerivadosImagenMixin:
+    """Programa la generación de miniaturas responsivas al guardar una fotografía"""
+    
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if 'fotografia' in form.changed_data and self.object.fotografia:
+            encolar_derivados(self.object.fotografia.name)
+        return response
+
+
 # ==================== CRUD - AVISOS ====================
 
 class AvisoCreateView(LoginRequiredMixin, CreateView):
@@ -248,7 +327,7 @@ class AvisoDeleteView(BaseStaffDeleteView):
 
 # ==================== CRUD - NOTICIAS ====================
 
-class NoticiaCreateView(LoginRequiredMixin, CreateView):
+class NoticiaCreateView(LoginRequiredMixin, DerivadosImagenMixin, CreateView):
     model = Noticia
     fields = ['titulo', 'descripcion', 'fotografia']
     template_name = 'noticia_form.html'
@@ -256,7 +335,7 @@ class NoticiaCreateView(LoginRequiredMixin, CreateView):
     login_url = 'login'
 
 
-class NoticiaUpdateView(LoginRequiredMixin, UpdateView):
+class NoticiaUpdateView(LoginRequiredMixin, DerivadosImagenMixin, UpdateView):
     model = Noticia
     fields = ['titulo', 'descripcion', 'fotografia']
     template_name = 'noticia_form.html'
@@ -273,7 +352,7 @@ class NoticiaDeleteView(BaseStaffDeleteView):
 
 # ==================== CRUD - COLABORADORES ====================
 
-class ColaboradorCreateView(LoginRequiredMixin, CreateView):
+class ColaboradorCreateView(LoginRequiredMixin, DerivadosImagenMixin, CreateView):
     model = Colaborador
     fields = ['nombre', 'descripcion', 'fotografia']
     template_name = 'colaboradores_form.html'
@@ -281,7 +360,7 @@ class ColaboradorCreateView(LoginRequiredMixin, CreateView):
     login_url = 'login'
 
 
-class ColaboradorUpdateView(LoginRequiredMixin, UpdateView):
+class ColaboradorUpdateView(LoginRequiredMixin, DerivadosImagenMixin, UpdateView):
     model = Colaborador
     fields = ['nombre', 'descripcion', 'fotografia']
     template_name = 'colaboradores_form.html'
@@ -305,6 +384,32 @@ class ContactosCreateView(CreateView):
     fields = ['nombre', 'numero', 'email', 'mensaje']
     template_name = 'contactos_form.html'
     success_url = reverse_lazy('inicio')
+    
+    def post(self, request, *args, **kwargs):
+        """Aplica el límite de envíos por IP antes de validar el formulario"""
+        permitido, espera = consumir_token(
+            f'contactos:{ip_cliente(request)}',
+            settings.CONTACTOS_RAFAGA,
+            settings.CONTACTOS_POR_MINUTO,
+        )
+        if not permitido:
+            self.object = None
+            form = self.get_form()
+            form.add_error(None, f'Demasiados envíos. Intenta de nuevo en {espera} segundos.')
+            response = self.render_to_response(self.get_context_data(form=form), status=429)
+            response['Retry-After'] = str(espera)
+            return response
+        return super().post(request, *args, **kwargs)
+    
+    def form_valid(self, form):
+        """En modo buffer, anexa el envío a la cola local en lugar de insertarlo"""
+        if not settings.CONTACTOS_INGESTA_BUFFER:
+            return super().form_valid(form)
+        
+        tamano = encolar_contacto(form.cleaned_data)
+        if tamano >= settings.CONTACTOS_BUFFER_BYTES:
+            programar_vaciado()
+        return redirect(self.success_url)
 
 
 class ContactosUpdateView(LoginRequiredMixin, UpdateView):
@@ -334,6 +439,8 @@ class ContactosDeleteView(BaseStaffDeleteView):
 
 
 # ==================== GENERADOR DE PDF ====================
+# El motor de PDF (ReportLab) vive en myapp/pdf.py y se importa dentro de cada
+# vista: solo los workers que atienden estas rutas de staff pagan su carga.
 
 @login_required(login_url='login')
 def generar_boletin_pdf(request):
@@ -342,181 +449,96 @@ def generar_boletin_pdf(request):
     if check:
         return check
     
-    # Crear documento PDF en memoria
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                           rightMargin=0.4*inch, leftMargin=0.4*inch,
-                           topMargin=0.75*inch, bottomMargin=0.75*inch)
-    
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Estilos personalizados
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#008080'),
-        spaceAfter=12,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    section_style = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#008080'),
-        spaceAfter=10,
-        spaceBefore=10,
-        fontName='Helvetica-Bold',
-        borderColor=colors.HexColor('#008080'),
-        borderWidth=1,
-        borderPadding=5
-    )
-    
-    body_style = ParagraphStyle(
-        'BodyText',
-        parent=styles['BodyText'],
-        fontSize=10,
-        alignment=TA_JUSTIFY,
-        spaceAfter=8
-    )
-    
-    # Estilo para celdas de tabla - ajuste automático de ancho
-    cell_style = ParagraphStyle(
-        'CellText',
-        parent=styles['BodyText'],
-        fontSize=6.5,
-        alignment=TA_LEFT,
-        spaceAfter=0,
-        leading=8,
-        wordWrap='CJK'
-    )
-    
-    # Título
-    story.append(Paragraph("BOLETÍN INFORMATIVO SEMARTEC", title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Fecha
-    fecha_actual = datetime.now().strftime("%d de %B de %Y - %H:%M")
-    story.append(Paragraph(f"<b>Fecha:</b> {fecha_actual}", body_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Estilos de tabla - con altura fija de fila
-    table_style = [
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#008080')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 7.5),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
-        ('TOPPADDING', (0, 0), (-1, 0), 4),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('FONTSIZE', (0, 1), (-1, -1), 6),
-        ('TOPPADDING', (0, 1), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 2),
-        ('LEFTPADDING', (0, 0), (-1, -1), 3),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 3),
-        ('ROWHEIGHTS', (0, 0), (-1, -1), 20),
-    ]
-    
-    # Sección AVISOS
-    story.append(Paragraph("📢 AVISOS", section_style))
-    avisos = Aviso.objects.all().order_by('-fecha_publicacion')[:10]
-    
-    if avisos.exists():
-        avisos_data = [['Título', 'Descripción', 'Fecha']]
-        for aviso in avisos:
-            fecha_str = aviso.fecha_publicacion.strftime("%d/%m/%Y") if aviso.fecha_publicacion else "N/A"
-            # Truncar fuertemente a 60 caracteres
-            titulo = _truncate_text(aviso.titulo, 20)
-            desc = _truncate_text(aviso.descripcion, 40)
-            avisos_data.append([titulo, desc, fecha_str])
-        
-        table = Table(avisos_data, colWidths=[1.0*inch, 3.0*inch, 0.9*inch])
-        table.setStyle(TableStyle(table_style))
-        story.append(table)
-    else:
-        story.append(Paragraph("<i>No hay avisos registrados</i>", body_style))
-    
-    story.append(Spacer(1, 0.25*inch))
-    
-    # Sección NOTICIAS
-    story.append(Paragraph("📰 NOTICIAS", section_style))
-    noticias = Noticia.objects.all().order_by('-fecha_publicacion')[:10]
-    
-    if noticias.exists():
-        noticias_data = [['Título', 'Descripción', 'Fecha']]
-        for noticia in noticias:
-            fecha_str = noticia.fecha_publicacion.strftime("%d/%m/%Y") if noticia.fecha_publicacion else "N/A"
-            titulo = _truncate_text(noticia.titulo, 20)
-            desc = _truncate_text(noticia.descripcion, 40)
-            noticias_data.append([titulo, desc, fecha_str])
-        
-        table = Table(noticias_data, colWidths=[1.0*inch, 3.0*inch, 0.9*inch])
-        table.setStyle(TableStyle(table_style))
-        story.append(table)
-    else:
-        story.append(Paragraph("<i>No hay noticias registradas</i>", body_style))
-    
-    story.append(Spacer(1, 0.25*inch))
-    
-    # Sección COLABORADORES
-    story.append(Paragraph("👥 EQUIPO DE COLABORADORES", section_style))
-    colaboradores = Colaborador.objects.all()
-    
-    if colaboradores.exists():
-        colabs_data = [['Nombre', 'Descripción']]
-        for colab in colaboradores:
-            nombre = _truncate_text(colab.nombre, 20)
-            desc = _truncate_text(colab.descripcion, 40)
-            colabs_data.append([nombre, desc])
-        
-        table = Table(colabs_data, colWidths=[1.3*inch, 4.6*inch])
-        table.setStyle(TableStyle(table_style))
-        story.append(table)
-    else:
-        story.append(Paragraph("<i>No hay colaboradores registrados</i>", body_style))
-    
-    # Pie de página
-    story.append(Spacer(1, 0.3*inch))
-    story.append(Paragraph("_" * 80, body_style))
-    story.append(Paragraph(
-        "<i>Este boletín fue generado automáticamente por el sistema SEMARTEC. "
-        "Contiene información confidencial de la organización.</i>",
-        body_style
-    ))
-    
-    # Construir PDF
-    doc.build(story)
-    
-    # Preparar respuesta
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="Boletin_SEMARTEC_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    
+    # El PDF solo se reconstruye cuando cambia el contenido que incluye
+    huella = huella_boletin()
+    etag = f'"{huella}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        from .pdf import construir_boletin_pdf
+        contenido = boletin_cacheado(huella, construir_boletin_pdf)
+        response = HttpResponse(contenido, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="Boletin_SEMARTEC_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
+    
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
     return response
-    # Pie de página
-    story.append(Spacer(1, 0.4*inch))
-    story.append(Paragraph("_" * 80, body_style))
-    story.append(Paragraph(
-        "<i>Este boletín fue generado automáticamente por el sistema SEMARTEC. "
-        "Contiene información confidencial de la organización.</i>",
-        body_style
-    ))
+
+
+def _pide_json(request):
+    """True si el cliente prefiere JSON a HTML (el fetch del panel envía Accept: application/json)"""
+    return request.get_preferred_type(['text/html', 'application/json']) == 'application/json'
+
+
+@login_required(login_url='login')
+@require_http_methods(["POST"])
+def solicitar_boletin_pdf(request):
+    """Encola la generación del boletín y responde de inmediato con la URL de estado"""
+    check = _check_staff_permission(request, 'inicio')
+    if check:
+        return check
     
-    # Construir PDF
-    doc.build(story)
+    trabajo = encolar_boletin(request.user)
+    if not _pide_json(request):
+        # Envío del formulario sin JavaScript: a la página de estado
+        return redirect('boletin-estado', pk=trabajo.pk)
+    return JsonResponse({
+        'id': trabajo.pk,
+        'estado': trabajo.estado,
+        'url_estado': reverse('boletin-estado', args=[trabajo.pk]),
+    }, status=202)
+
+
+@login_required(login_url='login')
+def estado_boletin_pdf(request, pk):
+    """
+    Estado de un trabajo de boletín: JSON para el panel (fetch) o una página
+    que se recarga sola mientras el trabajo no termina
+    """
+    check = _check_staff_permission(request, 'inicio')
+    if check:
+        return check
     
-    # Preparar respuesta
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="Boletin_SEMARTEC_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
+    trabajo = get_object_or_404(TrabajoPDF, pk=pk)
+    if not _pide_json(request):
+        response = render(request, 'boletin_estado.html', {'trabajo': trabajo, 'worker_pdf': worker_activo()})
+        if trabajo.estado in (TrabajoPDF.PENDIENTE, TrabajoPDF.PROCESANDO):
+            response['Refresh'] = '2'
+        return response
+
+    data = {
+        'id': trabajo.pk,
+        'estado': trabajo.estado,
+        'duracion_render': trabajo.duracion_render,
+        'error': trabajo.error,
+    }
+    if trabajo.estado == TrabajoPDF.TERMINADO:
+        data['url_descarga'] = reverse('boletin-descargar', args=[trabajo.pk])
+    return JsonResponse(data)
+
+
+@login_required(login_url='login')
+def descargar_boletin_pdf(request, pk):
+    """Descarga desde el storage el boletín ya generado por el worker"""
+    check = _check_staff_permission(request, 'inicio')
+    if check:
+        return check
     
-    return response
+    trabajo = get_object_or_404(TrabajoPDF, pk=pk, estado=TrabajoPDF.TERMINADO)
+    try:
+        archivo = trabajo.archivo.open('rb')
+    except FileNotFoundError:
+        # Borrado del storage (o perdido con un disco efímero): el panel lo
+        # muestra como error en lugar de ofrecer una descarga que no existe
+        TrabajoPDF.objects.filter(pk=trabajo.pk).update(
+            estado=TrabajoPDF.ERROR, error='El archivo del boletín ya no está disponible',
+        )
+        raise Http404('El archivo del boletín ya no está disponible')
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=trabajo.archivo.name.rsplit('/', 1)[-1],
+        content_type='application/pdf',
+    )
 
 
 @login_required(login_url='login')
@@ -526,108 +548,36 @@ def generar_contactos_pdf(request):
     if check:
         return check
     
-    # Crear documento PDF en memoria
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                           rightMargin=0.4*inch, leftMargin=0.4*inch,
-                           topMargin=0.75*inch, bottomMargin=0.75*inch)
-    
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Estilos personalizados
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#008080'),
-        spaceAfter=12,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    body_style = ParagraphStyle(
-        'BodyText',
-        parent=styles['BodyText'],
-        fontSize=10,
-        alignment=TA_JUSTIFY,
-        spaceAfter=8
-    )
-    
-    # Título
-    story.append(Paragraph("RELACIÓN DE CONTACTOS", title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Fecha
-    fecha_actual = datetime.now().strftime("%d de %B de %Y - %H:%M")
-    story.append(Paragraph(f"<b>Fecha:</b> {fecha_actual}", body_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Estilos de tabla - mejorado para evitar que texto sobrepase celdas
-    table_style = [
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#008080')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('FONTSIZE', (0, 1), (-1, -1), 7),
-        ('TOPPADDING', (0, 1), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 5),
-        ('LEFTPADDING', (0, 0), (-1, -1), 4),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-    ]
-    
-    # Obtener todos los contactos
-    contactos = Contactos.objects.all().order_by('-fecha_envio')
-    
-    if contactos.exists():
-        # Preparar datos para la tabla
-        contactos_data = [['Nombre', 'Número', 'Email', 'Fecha']]
-        
-        for contacto in contactos:
-            fecha_str = contacto.fecha_envio.strftime("%d/%m/%Y %H:%M") if contacto.fecha_envio else "N/A"
-            
-            contactos_data.append([
-                _truncate_text(contacto.nombre, 20),
-                _truncate_text(contacto.numero, 15),
-                _truncate_text(contacto.email, 35),
-                fecha_str
-            ])
-        
-        # Crear tabla con ancho dinámico
-        table = Table(contactos_data, colWidths=[2*inch, 1.0*inch, 2.5*inch, 1*inch])
-        table.setStyle(TableStyle(table_style))
-        story.append(table)
-        
-        # Información de resumen
-        story.append(Spacer(1, 0.3*inch))
-        story.append(Paragraph(f"<b>Total de contactos:</b> {contactos.count()}", body_style))
-    else:
-        story.append(Paragraph("<i>No hay contactos registrados</i>", body_style))
-    
-    # Pie de página
-    story.append(Spacer(1, 0.4*inch))
-    story.append(Paragraph("_" * 80, body_style))
-    story.append(Paragraph(
-        "<i>Este documento fue generado automáticamente por el sistema SEMARTEC. "
-        "Contiene información confidencial de la organización.</i>",
-        body_style
-    ))
-    
-    # Construir PDF
-    doc.build(story)
+    # El PDF se escribe en un archivo temporal (en memoria solo si es pequeño)
+    from .pdf import construir_contactos_pdf
+    archivo = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    construir_contactos_pdf(archivo)
+    archivo.seek(0)
     
     # Preparar respuesta
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="Contactos_SEMARTEC_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=f'Contactos_SEMARTEC_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+        content_type='application/pdf',
+    )
+
+
+# ==================== MÉTRICAS ====================
+
+def metricas(request):
+    """Expone las métricas de rendimiento en formato de texto de Prometheus"""
+    token = settings.METRICAS_TOKEN
+    cabecera = request.headers.get('Authorization', '')
+    if not (token and constant_time_compare(cabecera, f'Bearer {token}')):
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), 'login')
+        check = _check_staff_permission(request, 'inicio')
+        if check:
+            return check
     
+    response = HttpResponse(exposicion_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    patch_cache_control(response, no_store=True)
     return response
 
 
@@ -1,4 +1,20 @@
-import os
+"""
+Diagnóstico de la conexión a PostgreSQL
+
+Mide el tiempo de conexión, la latencia de ida y vuelta (SELECT 1) y cómo se
+comporta el pool (psycopg_pool) con varios hilos a la vez. Si los hilos pasan
+más tiempo esperando conexión que consultando, DB_POOL_MAX se queda corto.
+
+    python scripts/conexion.py
+    python scripts/conexion.py --hilos 32 --max 10 --retencion 0.02
+
+Usa DATABASE_URL si está definida; si no, POSTGRESQL_* de misite/environ.env.
+"""
+
+import argparse
+import statistics
+import threading
+import time
 from pathlib import Path
 import sys
 
@@ -13,40 +29,167 @@ except Exception as e:
     print('ERROR: failed to import environ:', e)
     raise SystemExit(1)
 
-env = environ.Env()
-environ_path = BASE_DIR / 'misite' / 'environ.env'
-if not environ_path.exists():
-    print('ERROR: .env file not found at', environ_path)
+try:
+    import psycopg
+    from psycopg_pool import ConnectionPool, PoolTimeout
+except Exception as e:
+    print('ERROR: failed to import psycopg / psycopg_pool:', e)
+    print('Instala psycopg[binary,pool] (requirements.txt)')
     raise SystemExit(1)
 
-environ.Env.read_env(env_file=environ_path)
 
-# Read Postgres settings
-PG = {
-    'host': env('POSTGRESQL_HOST', default='localhost'),
-    'port': env('POSTGRESQL_PORT', default='5432'),
-    'dbname': env('POSTGRESQL_NAME', default='postgres'),
-    'user': env('POSTGRESQL_USER', default='postgres'),
-    'password': env('POSTGRESQL_PASS', default=''),
-}
+def parametros_conexion():
+    """Cadena de conexión desde DATABASE_URL o POSTGRESQL_* de environ.env"""
+    env = environ.Env()
+    environ_path = BASE_DIR / 'misite' / 'environ.env'
+    if environ_path.exists():
+        environ.Env.read_env(env_file=environ_path)
 
-print('Attempting to connect to Postgres with:')
-print(' host=', PG['host'], ' port=', PG['port'], ' dbname=', PG['dbname'], ' user=', PG['user'])
+    url = env('DATABASE_URL', default='')
+    if url.startswith(('postgres://', 'postgresql://')):
+        return url
+    return psycopg.conninfo.make_conninfo(
+        host=env('POSTGRESQL_HOST', default='localhost'),
+        port=env('POSTGRESQL_PORT', default='5432'),
+        dbname=env('POSTGRESQL_NAME', default='postgres'),
+        user=env('POSTGRESQL_USER', default='postgres'),
+        password=env('POSTGRESQL_PASS', default=''),
+    )
 
-try:
-    import psycopg2
-except Exception as e:
-    print('ERROR: failed to import psycopg2:', e)
-    raise SystemExit(1)
 
-try:
-    conn = psycopg2.connect(host=PG['host'], port=PG['port'], dbname=PG['dbname'], user=PG['user'], password=PG['password'])
-    cur = conn.cursor()
-    cur.execute('SELECT version();')
-    ver = cur.fetchone()
-    print('Conecion exitosa')
-    cur.close()
-    conn.close()
-except Exception as e:
-    print('ERROR: connection failed:', repr(e))
-    raise SystemExit(1)
+def percentiles(muestras):
+    """p50/p95/p99 y máximo en milisegundos"""
+    ordenadas = sorted(muestras)
+    if not ordenadas:
+        return 'sin muestras'
+
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000
+
+    return f'p50={p(0.50):.2f}ms p95={p(0.95):.2f}ms p99={p(0.99):.2f}ms max={ordenadas[-1] * 1000:.2f}ms'
+
+
+def medir_conexion(conninfo, veces):
+    """Abre y cierra `veces` conexiones nuevas (lo que el pool evita por petición)"""
+    tiempos = []
+    for _ in range(veces):
+        inicio = time.perf_counter()
+        conexion = psycopg.connect(conninfo)
+        tiempos.append(time.perf_counter() - inicio)
+        conexion.close()
+    return tiempos
+
+
+def medir_ida_vuelta(conninfo, veces):
+    """Latencia de SELECT 1 sobre una conexión ya abierta"""
+    tiempos = []
+    with psycopg.connect(conninfo, autocommit=True) as conexion:
+        version = conexion.execute('SELECT version()').fetchone()[0]
+        for _ in range(veces):
+            inicio = time.perf_counter()
+            conexion.execute('SELECT 1').fetchone()
+            tiempos.append(time.perf_counter() - inicio)
+    return version, tiempos
+
+
+def medir_pool(conninfo, hilos, consultas, minimo, maximo, retencion, espera):
+    """
+    `hilos` hilos piden `consultas` conexiones cada uno a un pool de
+    `minimo`..`maximo` y retienen cada conexión `retencion` segundos, como
+    una petición que hace su trabajo. Devuelve esperas, errores y estadísticas.
+    """
+    esperas = []
+    errores = []
+    candado = threading.Lock()
+
+    def trabajar():
+        for _ in range(consultas):
+            inicio = time.perf_counter()
+            try:
+                with pool.connection() as conexion:
+                    espera_conexion = time.perf_counter() - inicio
+                    conexion.execute('SELECT pg_sleep(%s)', (retencion,))
+            except PoolTimeout:
+                with candado:
+                    errores.append('timeout')
+                continue
+            except psycopg.Error as e:
+                with candado:
+                    errores.append(type(e).__name__)
+                continue
+            with candado:
+                esperas.append(espera_conexion)
+
+    with ConnectionPool(
+        conninfo, min_size=minimo, max_size=maximo, timeout=espera,
+        check=ConnectionPool.check_connection, open=False,
+    ) as pool:
+        pool.open(wait=True)
+        inicio = time.perf_counter()
+        trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+        for t in trabajadores:
+            t.start()
+        for t in trabajadores:
+            t.join()
+        duracion = time.perf_counter() - inicio
+        estadisticas = pool.get_stats()
+    return esperas, errores, duracion, estadisticas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Diagnóstico de conexión y pool de PostgreSQL')
+    parser.add_argument('--conexiones', type=int, default=20, help='Conexiones nuevas a medir')
+    parser.add_argument('--consultas', type=int, default=200, help='SELECT 1 a medir (y consultas por hilo en el pool)')
+    parser.add_argument('--hilos', type=int, default=16, help='Hilos concurrentes contra el pool')
+    parser.add_argument('--min', type=int, default=2, help='min_size del pool (DB_POOL_MIN)')
+    parser.add_argument('--max', type=int, default=10, help='max_size del pool (DB_POOL_MAX)')
+    parser.add_argument('--retencion', type=float, default=0.005, help='Segundos que cada hilo retiene la conexión')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Espera máxima por conexión (DB_POOL_TIMEOUT)')
+    opciones = parser.parse_args()
+
+    conninfo = parametros_conexion()
+    datos = psycopg.conninfo.conninfo_to_dict(conninfo)
+    print('Attempting to connect to Postgres with:')
+    print(' host=', datos.get('host'), ' port=', datos.get('port'), ' dbname=', datos.get('dbname'), ' user=', datos.get('user'))
+
+    try:
+        conexion = medir_conexion(conninfo, opciones.conexiones)
+        version, ida_vuelta = medir_ida_vuelta(conninfo, opciones.consultas)
+    except psycopg.Error as e:
+        print('ERROR: connection failed:', repr(e))
+        raise SystemExit(1)
+
+    print('Conexión exitosa:', version)
+    print(f'Conectar ({opciones.conexiones}):       {percentiles(conexion)}')
+    print(f'SELECT 1 ({opciones.consultas}):      {percentiles(ida_vuelta)}')
+
+    esperas, errores, duracion, estadisticas = medir_pool(
+        conninfo, opciones.hilos, opciones.consultas, opciones.min, opciones.max,
+        opciones.retencion, opciones.timeout,
+    )
+    total = len(esperas) + len(errores)
+    print(
+        f'\nPool {opciones.min}..{opciones.max} con {opciones.hilos} hilos, '
+        f'{total} préstamos en {duracion:.2f}s ({total / duracion:.0f}/s)'
+    )
+    print(f'Espera por conexión: {percentiles(esperas)}')
+    if esperas:
+        print(f'Media de espera: {statistics.mean(esperas) * 1000:.2f}ms')
+    encoladas = estadisticas.get('requests_queued', 0)
+    print(
+        f"Encoladas: {encoladas} de {estadisticas.get('requests_num', 0)} "
+        f"({100 * encoladas / max(1, estadisticas.get('requests_num', 0)):.0f}%), "
+        f"tamaño final {estadisticas.get('pool_size')}, errores {len(errores)}"
+    )
+    for clave in sorted(estadisticas):
+        print(f'  {clave} = {estadisticas[clave]}')
+
+    if errores:
+        print('AVISO: hubo peticiones sin conexión; sube --max/DB_POOL_MAX o revisa max_connections del servidor')
+        raise SystemExit(2)
+    if encoladas > estadisticas.get('requests_num', 0) / 2:
+        print('AVISO: más de la mitad de los préstamos esperaron: el pool está saturado con esta carga')
+
+
+if __name__ == '__main__':
+    main()